@@ -619,11 +619,37 @@
 #     app.run(debug=True, port=5000)
 
 # app.py
-from flask import Flask, render_template, jsonify, send_file, request, redirect, url_for, session, flash
+from flask import Flask, Response, stream_with_context, render_template, jsonify, send_file, request, redirect, url_for, session, flash, get_flashed_messages, g
+from markupsafe import Markup
 from pathlib import Path
 import os
+import json
+import hashlib
+import click
+import threading
+import time
 from datetime import datetime
-from models import db, User, Sound, Group, Playlist
+from models import db, User, Sound, Group, Playlist, ListeningEvent, SoundPlayCount, playlist_sound_association
+from segments import ensure_segments, MANIFEST_NAME, SegmentError
+from migrations import upgrade_schema
+from peaks import batch_version, encode_batch, peaks_version
+from zipstream import ZipEntry, archive_size, stream_zip
+from werkzeug.utils import secure_filename
+from precache import build_manifest
+from assets import load_manifest, make_template_helpers, manifest_version
+from deletion import OrphanSweeper, delete_groups, delete_playlists_where, delete_user, playlist_memberships, sweep_orphans, sweep_until_clean
+from catalog import get_catalog, get_group_summaries, invalidate_catalog, use_shared_cache, use_snapshot_file
+from breaker import CircuitBreaker, OPEN
+from sqlalchemy.exc import SQLAlchemyError
+from cache import VersionRegistry, from_url as cache_from_url
+import routing
+from routing import primary_only, replica_binds
+from search import get_search_index
+import recommendations
+from telemetry import EventBuffer, TelemetryError, MAX_BATCH_EVENTS, validate_event
+from sync import MixHub, SyncError, HEARTBEAT_SECONDS, format_event, validate_ops
+from popularity import PopularityCounters, RETENTION_SECONDS, WINDOWS, DEFAULT_WINDOW, bucket_start
+from pagination import PaginationError, decode_cursor, parse_fields, parse_limit, stream_array, stream_page
 
 app = Flask(__name__)
 app.secret_key = 'calmflow-secret-key-change-in-production'
@@ -634,9 +660,121 @@ DATABASE = 'calmflow_db'
 
 app.config['SQLALCHEMY_DATABASE_URI'] = f'mssql+pyodbc://@{SERVER}/{DATABASE}?driver=ODBC+Driver+18+for+SQL+Server&Trusted_Connection=yes&TrustServerCertificate=yes'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Comma-separated read replica URLs; GET routes read from one of them
+app.config['SQLALCHEMY_BINDS'] = replica_binds(os.environ.get('CALMFLOW_REPLICA_URLS', ''))
+# How long a user's reads stay on the primary after they write
+app.config['PRIMARY_PIN_SECONDS'] = 10
+
+# 'dynamic' renders / per user; 'shell' serves one cacheable page for everyone
+# and script.js fills in the per-user parts from /api/session
+app.config['INDEX_MODE'] = os.environ.get('CALMFLOW_INDEX_MODE', 'dynamic')
+# Reuse rendered sound grid / group card HTML until the catalog changes
+app.config['FRAGMENT_CACHE'] = os.environ.get('CALMFLOW_FRAGMENT_CACHE', '1') != '0'
+# Default-group sounds announced in Link preload headers / 103 Early Hints
+app.config['PRELOAD_SOUND_COUNT'] = 3
+# 'memory://' for a single process; 'redis://host:port/db' when several
+# workers must see each other's catalog and playlist invalidations
+app.config['CACHE_URL'] = os.environ.get('CALMFLOW_CACHE_URL', 'memory://')
+# Last good catalog, served at startup and while the database is down
+app.config['CATALOG_SNAPSHOT_PATH'] = os.environ.get('CALMFLOW_CATALOG_SNAPSHOT',
+                                                     os.path.join(app.instance_path, 'catalog.snapshot'))
+# Seconds between background sweeps of orphaned playlist / group rows; 0 disables
+app.config['ORPHAN_SWEEP_SECONDS'] = int(os.environ.get('CALMFLOW_ORPHAN_SWEEP_SECONDS', '3600'))
+
+cache_backend = cache_from_url(app.config['CACHE_URL'])
+versions = VersionRegistry(cache_backend)
+use_shared_cache(cache_backend, versions)
+
+db_breaker = CircuitBreaker('Database')
+use_snapshot_file(app.config['CATALOG_SNAPSHOT_PATH'], db_breaker)
+
+def bump_playlist_version(user_id):
+    """Tell every worker that this user's playlists changed"""
+    versions.bump(f'playlists:{user_id}')
+
+def playlist_etag(user_id):
+    """Validator for a user's playlist listing, or None if the cache is down"""
+    everyone, user = versions.current('playlists', f'playlists:{user_id}')
+    if not versions.available:
+        return None
+    query = hashlib.sha1(request.query_string).hexdigest()[:8]
+    # The user id keeps two accounts that share tokens from sharing validators
+    return f'{user_id}.{everyone}.{user}.{query}'
+
+def write_listening_events(rows):
+    """Bulk insert a flushed telemetry batch (runs on the flusher thread)"""
+    with app.app_context():
+        db.session.execute(db.insert(ListeningEvent), rows)
+        db.session.commit()
+
+telemetry_buffer = EventBuffer(write_listening_events)
+
+popularity_counters = PopularityCounters()
+
+mix_hub = MixHub()
+
+def client_origin():
+    """Id a browser tab sends so it can ignore its own sync events"""
+    return request.headers.get('X-Client-Id', '')[:64] or None
+
+def flush_popularity():
+    """Add this worker's pending plays to sound_play_counts, then reload every worker's totals"""
+    pending = popularity_counters.take_pending()
+    with app.app_context():
+        try:
+            for (sound_id, bucket), plays in pending.items():
+                result = db.session.execute(
+                    db.update(SoundPlayCount)
+                    .where(SoundPlayCount.sound_id == sound_id, SoundPlayCount.bucket_start == bucket)
+                    .values(plays=SoundPlayCount.plays + plays)
+                )
+                if not result.rowcount:
+                    db.session.add(SoundPlayCount(sound_id=sound_id, bucket_start=bucket, plays=plays))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            popularity_counters.restore_pending(pending)
+            raise
+        
+        cutoff = bucket_start(time.time() - RETENTION_SECONDS)
+        db.session.execute(db.delete(SoundPlayCount).where(SoundPlayCount.bucket_start < cutoff))
+        db.session.commit()
+        rows = db.session.execute(
+            db.select(SoundPlayCount.sound_id, SoundPlayCount.bucket_start, SoundPlayCount.plays)
+            .where(SoundPlayCount.bucket_start >= cutoff)
+        ).all()
+    popularity_counters.load(rows)
+
+def get_popularity():
+    popularity_counters.ensure_started(flush_popularity)
+    return popularity_counters
+
+orphan_sweeper = OrphanSweeper(app.config['ORPHAN_SWEEP_SECONDS'])
+
+def sweep_orphan_batch():
+    """Delete one batch of each kind of orphaned row (runs on the sweeper thread)"""
+    with app.app_context():
+        counts = sweep_orphans(db.session)
+        db.session.commit()
+    return counts
+
+@app.before_request
+def start_orphan_sweeper():
+    if app.config['ORPHAN_SWEEP_SECONDS'] > 0:
+        orphan_sweeper.ensure_started(sweep_orphan_batch)
+
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
 
 # Initialize database
 db.init_app(app)
+routing.init_app(app, db, cache_backend)
+
+# Sprite and srcset helpers for templates (see `flask build-assets`)
+app.jinja_env.globals.update(make_template_helpers(
+    os.path.join(app.root_path, 'static'),
+    lambda filename, **query: url_for('static', filename=filename, **query),
+))
 
 # --- HELPER FUNCTIONS ---
 
@@ -644,45 +782,227 @@ def get_user_playlist_or_403(playlist_id, user_id):
     """Get playlist if it belongs to user, otherwise return None (for 403)"""
     return Playlist.query.filter_by(id=playlist_id, user_id=user_id).first()
 
+def binary_peaks_response(body, version):
+    """Serve peaks data; versioned URLs are cached forever, others revalidate"""
+    response = app.response_class(body, mimetype='application/octet-stream')
+    response.set_etag(version)
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def get_precache_manifest():
+    """Service worker manifest for the current static tree and catalog"""
+    if 'precache_manifest' in g:
+        return g.precache_manifest
+    
+    sound_urls = []
+    for sound in get_catalog().sounds:
+        sound_urls.append(sound['file_path'])
+        if sound['loop_path']:
+            sound_urls.append(sound['loop_path'])
+    g.precache_manifest = build_manifest(os.path.join(app.root_path, 'static'), sound_urls)
+    return g.precache_manifest
+
+# Rendered fragments, preload links and the index shell, shared by request threads
+_render_cache_lock = threading.Lock()
+
+_fragment_cache = {}
+
+def get_catalog_fragments(tier):
+    """Rendered group cards and sound grid for an access tier.
+    
+    tier is 'guest', 'member' or 'shell' (guest markup that carries the data
+    script.js needs to unlock premium sounds). Fragments are cached per
+    (catalog version, tier, built-asset version).
+    """
+    catalog = get_catalog()
+    assets_version = manifest_version(os.path.join(app.root_path, 'static'))
+    key = (catalog.version, tier, assets_version)
+    
+    fragments = None
+    if app.config['FRAGMENT_CACHE']:
+        with _render_cache_lock:
+            fragments = _fragment_cache.get(key)
+    if fragments is None:
+        logged_in = tier == 'member'
+        sounds = [dict(sound, user_can_access=logged_in or not sound['is_premium'])
+                  for sound in catalog.sounds]
+        fragments = {
+            'group_cards': Markup(render_template('_group_cards.html', groups=catalog.groups)),
+            'sound_grid': Markup(render_template('_sound_grid.html',
+                                                 sounds=sounds,
+                                                 logged_in=logged_in,
+                                                 shell=tier == 'shell')),
+        }
+        # Fragments for older catalog or asset versions can never be served again
+        with _render_cache_lock:
+            for stale in [k for k in _fragment_cache if k[0] != catalog.version or k[2] != assets_version]:
+                del _fragment_cache[stale]
+            _fragment_cache[key] = fragments
+    return fragments
+
+PLAYLIST_SUMMARY_FIELDS = ('id', 'name', 'icon', 'sound_count')
+
+def iter_playlist_summaries(user_id, after=None, limit=None, batch_size=100):
+    """Id, name, icon and sound count of a user's playlists in id order.
+    
+    Rows come from one keyset query on ix_playlists_user_id_id, with the
+    sound count as a correlated count over playlist_sound's primary key, and
+    are fetched in batches rather than all at once.
+    """
+    sound_count = (db.select(db.func.count())
+                   .select_from(playlist_sound_association)
+                   .where(playlist_sound_association.c.playlist_id == Playlist.id)
+                   .scalar_subquery())
+    query = (db.session.query(Playlist.id, Playlist.name, Playlist.playlist_icon, sound_count)
+             .filter(Playlist.user_id == user_id))
+    if after is not None:
+        query = query.filter(Playlist.id > after)
+    query = query.order_by(Playlist.id)
+    if limit is not None:
+        query = query.limit(limit)
+    
+    for playlist_id, name, icon, count in query.yield_per(batch_size):
+        yield {'id': playlist_id, 'name': name, 'icon': icon, 'sound_count': count}
+
+def get_playlist_summaries(user_id):
+    """Id, name, icon and sound count of every playlist a user owns"""
+    return list(iter_playlist_summaries(user_id))
+
+_index_shell_cache = {}
+
+_preload_cache = {}
+
+def get_preload_links(tier):
+    """Link header values for the index page's critical assets.
+    
+    Covers the stylesheet, script, sprite sheet, the catalog request script.js
+    makes on load, and the first few playable sounds of the default group.
+    Computed once per (catalog version, tier, built-asset version).
+    """
+    catalog = get_catalog()
+    static_root = os.path.join(app.root_path, 'static')
+    key = (catalog.version, tier, manifest_version(static_root))
+    with _render_cache_lock:
+        links = _preload_cache.get(key)
+    if links is not None:
+        return links
+    
+    links = [
+        f"<{url_for('static', filename='style.css')}>; rel=preload; as=style",
+        f"<{url_for('static', filename='script.js')}>; rel=preload; as=script",
+    ]
+    sprite = load_manifest(static_root).get('sprite')
+    if sprite:
+        name, version = sprite['webp']
+        links.append(f"<{url_for('static', filename=name, v=version)}>; rel=preload; as=image; type=image/webp")
+    links.append(f"<{url_for('get_sounds')}>; rel=preload; as=fetch; crossorigin")
+    
+    if catalog.groups:
+        # The audio engine fetch()es sounds, so as=fetch lets it reuse the preload
+        default_group = catalog.groups[0]['id']
+        playable = [sound for sound in catalog.sounds
+                    if default_group in sound['groups'] and (tier == 'member' or not sound['is_premium'])]
+        for sound in playable[:app.config['PRELOAD_SOUND_COUNT']]:
+            links.append(f"<{sound['loop_path'] or sound['file_path']}>; rel=preload; as=fetch; crossorigin")
+    
+    with _render_cache_lock:
+        for stale in [k for k in _preload_cache if k[0] != catalog.version]:
+            del _preload_cache[stale]
+        _preload_cache[key] = links
+    return links
+
+def send_early_hints(links):
+    """Send a 103 response when the WSGI server supports it (e.g. gunicorn)"""
+    early_hints = request.environ.get('wsgi.early_hints')
+    if early_hints is None:
+        return
+    try:
+        early_hints([('Link', link) for link in links])
+    except Exception as e:
+        print(f"⚠ Could not send early hints: {e}")
+
+def add_preload_headers(response, links):
+    for link in links:
+        response.headers.add('Link', link)
+    return response
+
+def render_index_shell():
+    """User-independent index page, rendered once per catalog and asset version"""
+    catalog = get_catalog()
+    fingerprint = hashlib.sha256(
+        f"{catalog.version}:{get_precache_manifest()['version']}".encode('utf-8')
+    ).hexdigest()[:16]
+    
+    with _render_cache_lock:
+        html = _index_shell_cache.get(fingerprint)
+    if html is None:
+        # Guests see premium sounds locked; script.js unlocks them after hydration
+        html = render_template('index.html',
+                               user=None,
+                               shell=True,
+                               **get_catalog_fragments('shell'))
+        with _render_cache_lock:
+            _index_shell_cache.clear()
+            _index_shell_cache[fingerprint] = html
+    
+    response = app.response_class(html, mimetype='text/html')
+    response.set_etag(fingerprint)
+    response.headers['Cache-Control'] = 'public, max-age=0, s-maxage=300, must-revalidate'
+    return response.make_conditional(request)
+
+@app.context_processor
+def inject_precache_version():
+    """Expose the manifest version so pages register the matching service worker"""
+    try:
+        return {'precache_version': get_precache_manifest()['version']}
+    except Exception as e:
+        print(f"⚠ Could not build precache manifest: {e}")
+        return {'precache_version': ''}
+
 # --- ROUTES ---
 
 @app.route('/')
 def index():
-    # Get all sounds
-    sounds = Sound.query.all()
+    if app.config['INDEX_MODE'] == 'shell':
+        # Never read the session here: that would add Vary: Cookie to the shared shell
+        preload_links = get_preload_links('shell')
+        send_early_hints(preload_links)
+        return add_preload_headers(render_index_shell(), preload_links)
     
-    # Get ONLY the 5 groups we want: Nature, Sleep, Focus, Relax, City
-    allowed_groups = ['Nature', 'Sleep', 'Focus', 'Relax', 'City']
-    groups = Group.query.filter(Group.name.in_(allowed_groups)).order_by(Group.id).all()
+    # Hint the critical assets before doing any page work
+    preload_links = get_preload_links('member' if 'user_id' in session else 'guest')
+    send_early_hints(preload_links)
     
     # Debug output - shows what's actually being sent to template
+    sounds_by_id = get_catalog().sounds_by_id
     print("\n" + "="*50)
     print("DEBUG: Groups being sent to template:")
-    for group in groups:
-        sound_names = [s.display_name for s in group.sounds[:3]]
-        premium_count = sum(1 for s in group.sounds if s.is_premium)
-        free_count = len(group.sounds) - premium_count
-        print(f"  {group.id}. {group.name}: {len(group.sounds)} sounds ({free_count} free, {premium_count} premium)")
-        if group.sounds:
-            print(f"     Example sounds: {', '.join(sound_names)}" + ("..." if len(group.sounds) > 3 else ""))
+    for group in get_group_summaries():
+        sound_names = [sounds_by_id[sound_id]['display_name']
+                       for sound_id in group['sound_ids'][:3] if sound_id in sounds_by_id]
+        print(f"  {group['id']}. {group['name']}: {group['total']} sounds ({group['free']} free, {group['premium']} premium)")
+        if group['total']:
+            print(f"     Example sounds: {', '.join(sound_names)}" + ("..." if group['total'] > 3 else ""))
     print("="*50 + "\n")
     
     # Check if user is logged in
     user = None
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-    
-    # Prepare sound data with access permissions
-    sound_dicts = []
-    for sound in sounds:
-        sound_dict = sound.to_dict()
-        sound_dict['user_can_access'] = (user is not None) or (not sound.is_premium)
-        sound_dicts.append(sound_dict)
-    
-    return render_template('index.html', 
-                         sounds=sound_dicts, 
-                         groups=groups,
-                         user=user)
+    if 'user_id' in session and db_breaker.state != OPEN:
+        try:
+            user = User.query.get(session['user_id'])
+        except SQLAlchemyError as e:
+            # Still serve the catalog, as a guest page, while the database is down
+            db.session.rollback()
+            db_breaker.record_failure(e)
+    
+    # Sound grid and group cards come pre-rendered for the user's access tier
+    fragments = get_catalog_fragments('member' if user else 'guest')
+    
+    response = app.make_response(render_template('index.html', user=user, **fragments))
+    return add_preload_headers(response, preload_links)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -768,13 +1088,14 @@ def delete_account():
         return redirect(url_for('user_profile'))
     
     try:
-        # First, delete all playlists owned by this user
-        # This prevents foreign key constraint issues
-        Playlist.query.filter_by(user_id=user.id).delete()
-        
-        # Now delete the user
-        db.session.delete(user)
+        user_id = user.id
+        memberships = playlist_memberships(db.session, Playlist.user_id == user_id)
+        # Set-based: playlist_sound rows, playlists, then the user, without loading them
+        delete_user(db.session, user_id)
         db.session.commit()
+        bump_playlist_version(user_id)
+        for sound_ids in memberships.values():
+            recommendations.record_playlist_deleted(sound_ids)
         
         session.pop('user_id', None)
         flash('Your account has been deleted successfully', 'success')
@@ -784,20 +1105,200 @@ def delete_account():
         flash(f'Error deleting account: {str(e)}', 'error')
         return redirect(url_for('user_profile'))
 
-@app.route('/api/sounds')
-def get_sounds():
+@app.route('/api/session')
+def get_session_state():
+    """Per-user state that the cacheable index shell hydrates from"""
     user = None
     if 'user_id' in session:
         user = User.query.get(session['user_id'])
     
-    sounds = Sound.query.all()
-    sound_list = []
-    for sound in sounds:
-        sound_dict = sound.to_dict()
-        sound_dict['user_can_access'] = (user is not None) or (not sound.is_premium)
-        sound_list.append(sound_dict)
+    response = jsonify({
+        'logged_in': user is not None,
+        'user': {
+            'username': user.username,
+            'email': user.email,
+            'is_premium': user.is_premium
+        } if user else None,
+        'links': {
+            'login': url_for('login'),
+            'logout': url_for('logout'),
+            'profile': url_for('user_profile')
+        },
+        'flashes': [{'category': category, 'message': message}
+                    for category, message in get_flashed_messages(with_categories=True)],
+        'playlists': get_playlist_summaries(user.id) if user else []
+    })
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+@app.route('/api/sounds')
+def get_sounds():
+    member = False
+    if 'user_id' in session:
+        # While the database is down the catalog comes from the snapshot and
+        # the session's login stands in for the user lookup
+        member = True
+        if db_breaker.state != OPEN:
+            try:
+                member = User.query.get(session['user_id']) is not None
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                db_breaker.record_failure(e)
+    
+    catalog = get_catalog()
+    allowed_fields = set(catalog.sounds[0]) | {'user_can_access'} if catalog.sounds else {'id'}
+    order = request.args.get('order', 'id')
+    if order not in ('id', 'popular'):
+        return jsonify({'error': 'order must be id or popular'}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'), allowed_fields)
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args.get('cursor'))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def accessible(sounds):
+        for sound in sounds:
+            yield dict(sound, user_can_access=member or not sound['is_premium'])
+    
+    if order == 'popular':
+        # Ranked from the in-memory aggregate; keyset cursors only exist for id order
+        if after is not None:
+            return jsonify({'error': 'cursor is only supported with order=id'}), 400
+        ranking = get_popularity().ranking()
+        sounds = sorted(catalog.sounds, key=lambda sound: (-ranking.get(sound['id'], 0.0), sound['id']))
+        if limit is not None:
+            sounds = sounds[:limit]
+        return Response(stream_array(accessible(sounds), fields), mimetype='application/json')
+    
+    sounds = catalog.sounds_after(after)
+    if limit is None and after is None:
+        # Unpaginated requests keep the original plain-list shape
+        return Response(stream_array(accessible(sounds), fields), mimetype='application/json')
+    
+    # Keyset page over the id-ordered snapshot; one extra item signals a next page
+    page = sounds if limit is None else sounds[:limit + 1]
+    return Response(stream_page('sounds', accessible(page), limit, fields), mimetype='application/json')
+
+@app.route('/api/sounds/trending')
+def get_trending_sounds():
+    """Most played sounds over a decayed hour, day or week window"""
+    window = request.args.get('window', DEFAULT_WINDOW)
+    if window not in WINDOWS:
+        return jsonify({'error': f"window must be one of {', '.join(WINDOWS)}"}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 0), 100)
+    
+    catalog = get_catalog()
+    logged_in = 'user_id' in session
+    sounds = []
+    for sound_id, score in get_popularity().top(window, limit + 5):
+        sound = catalog.sounds_by_id.get(sound_id)
+        if sound is None:
+            continue
+        sounds.append(dict(sound, user_can_access=logged_in or not sound['is_premium'], score=round(score, 3)))
+        if len(sounds) == limit:
+            break
+    
+    return jsonify(window=window, sounds=sounds)
+
+@app.route('/api/sounds/search')
+def search_sounds():
+    """Filter the catalog by text, group, category and premium flag"""
+    group = request.args.get('group', type=int)
+    premium = request.args.get('premium')
+    if premium not in (None, 'true', 'false'):
+        return jsonify({'error': 'premium must be true or false'}), 400
+    limit = min(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), SEARCH_MAX_LIMIT)
+    
+    index = get_search_index(get_catalog())
+    sounds, total = index.search(query=request.args.get('q', ''),
+                                 group=group,
+                                 category=request.args.get('category'),
+                                 premium=None if premium is None else premium == 'true',
+                                 limit=max(limit, 0))
+    
+    logged_in = 'user_id' in session
+    return jsonify({
+        'total': total,
+        'sounds': [dict(sound, user_can_access=logged_in or not sound['is_premium']) for sound in sounds],
+    })
+
+@app.route('/api/telemetry/events', methods=['POST'])
+def ingest_listening_events():
+    """Accept a batch of play / stop / volume events for buffered writing"""
+    data = request.get_json(silent=True)
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'events list required'}), 400
+    if len(events) > MAX_BATCH_EVENTS:
+        return jsonify({'error': f'At most {MAX_BATCH_EVENTS} events per batch'}), 413
+    
+    known_ids = get_catalog().sounds_by_id
+    user_id = session.get('user_id')
+    rows, errors = [], []
+    for position, event in enumerate(events):
+        try:
+            rows.append(validate_event(event, known_ids, user_id))
+        except TelemetryError as e:
+            errors.append({'index': position, 'error': str(e)})
+    if not rows:
+        return jsonify({'error': 'No valid events', 'rejected': errors}), 400
+    
+    if not telemetry_buffer.offer(rows):
+        # Buffer full: refuse the whole batch so the client can retry it later
+        response = jsonify({'error': 'Telemetry buffer full', 'dropped': len(rows)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    counters = get_popularity()
+    for row in rows:
+        if row['event_type'] == 'play':
+            counters.record(row['sound_id'])
+    
+    return jsonify({'accepted': len(rows), 'rejected': errors}), 202
+
+@app.route('/api/telemetry/stats')
+def telemetry_stats():
+    """Buffer depth and accepted / dropped / written counters for this worker"""
+    return jsonify(telemetry_buffer.snapshot())
+
+def load_playlist_pairs():
+    """(playlist_ids, sound_ids) arrays for every playlist_sound row"""
+    import numpy as np
+    
+    rows = db.session.execute(db.select(playlist_sound_association.c.playlist_id,
+                                        playlist_sound_association.c.sound_id)).all()
+    pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+@app.route('/api/sounds/<int:sound_id>/recommendations')
+def get_sound_recommendations(sound_id):
+    """Sounds most often mixed with this one in users' playlists"""
+    catalog = get_catalog()
+    if sound_id not in catalog.sounds_by_id:
+        return jsonify({'error': 'Sound not found'}), 404
+    limit = max(1, min(request.args.get('limit', recommendations.DEFAULT_TOP_K, type=int), 50))
+    
+    logged_in = 'user_id' in session
+    results = []
+    # Ask for extra in case some ids have since left the catalog
+    for other_id, count, score in recommendations.top_k(sound_id, limit + 5, load_playlist_pairs):
+        other = catalog.sounds_by_id.get(other_id)
+        if other is None:
+            continue
+        results.append({
+            'id': other_id,
+            'name': other['name'],
+            'display_name': other['display_name'],
+            'icon_url': other['icon_url'],
+            'user_can_access': logged_in or not other['is_premium'],
+            'playlists': count,
+            'score': score,
+        })
+        if len(results) == limit:
+            break
     
-    return jsonify(sound_list)
+    return jsonify(sound_id=sound_id, recommendations=results)
 
 @app.route('/sounds/<path:filename>')
 def serve_sound(filename):
@@ -807,7 +1308,97 @@ def serve_sound(filename):
     except FileNotFoundError:
         return jsonify({'error': 'Sound file not found'}), 404
 
+@app.route('/sounds/<int:sound_id>/segments/index.m3u8')
+def serve_sound_manifest(sound_id):
+    """HLS playlist for a sound, segmenting the file on first request"""
+    sound = Sound.query.get_or_404(sound_id)
+    try:
+        directory = ensure_segments(os.path.join(app.root_path, 'static'), sound.file_path)
+    except FileNotFoundError:
+        return jsonify({'error': 'Sound file not found'}), 404
+    except SegmentError as e:
+        return jsonify({'error': str(e)}), 500
+
+    return send_file(os.path.join(directory, MANIFEST_NAME),
+                     mimetype='application/vnd.apple.mpegurl')
+
+@app.route('/sounds/<int:sound_id>/segments/<int:index>.mp3')
+def serve_sound_segment(sound_id, index):
+    """Serve one frame-aligned segment of a sound"""
+    sound = Sound.query.get_or_404(sound_id)
+    try:
+        directory = ensure_segments(os.path.join(app.root_path, 'static'), sound.file_path)
+    except FileNotFoundError:
+        return jsonify({'error': 'Sound file not found'}), 404
+    except SegmentError as e:
+        return jsonify({'error': str(e)}), 500
+
+    segment_path = os.path.join(directory, f'{index}.mp3')
+    if not os.path.exists(segment_path):
+        return jsonify({'error': 'Segment not found'}), 404
+    return send_file(segment_path, mimetype='audio/mpeg', max_age=86400)
+
+@app.route('/api/sounds/<int:sound_id>/peaks')
+def get_sound_peaks(sound_id):
+    """Waveform peaks blob for one sound"""
+    sound = Sound.query.get_or_404(sound_id)
+    if not sound.peaks:
+        return jsonify({'error': 'Peaks not generated for this sound'}), 404
+    return binary_peaks_response(sound.peaks, sound.peaks_version)
+
+def group_peaks_url(group, sounds_by_id):
+    """Versioned (immutable) URL of a group's batched peaks, or None if none are built"""
+    versions = []
+    for sound_id in sorted(group['sound_ids']):
+        version = sounds_by_id.get(sound_id, {}).get('peaks_version')
+        if version:
+            versions.append((sound_id, version))
+    if not versions:
+        return None
+    return url_for('get_group_peaks', group_id=group['id'], v=batch_version(versions))
+
+@app.route('/api/groups')
+def get_groups():
+    """Default groups with sound counts and member ids"""
+    sounds_by_id = get_catalog().sounds_by_id
+    groups = [dict(group, peaks_url=group_peaks_url(group, sounds_by_id)) for group in get_group_summaries()]
+    response = jsonify(groups=groups)
+    response.set_etag(get_catalog().version)
+    response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response.make_conditional(request)
+
+@app.route('/api/groups/<int:group_id>/peaks')
+def get_group_peaks(group_id):
+    """Peaks blobs for every sound in a group, in one batched response"""
+    Group.query.get_or_404(group_id)
+    sounds = (Sound.query.options(db.undefer(Sound.peaks))
+              .join(Sound.groups)
+              .filter(Group.id == group_id, Sound.peaks.isnot(None))
+              .order_by(Sound.id).all())
+    items = [(sound.id, sound.peaks) for sound in sounds]
+    version = batch_version((sound.id, sound.peaks_version) for sound in sounds)
+    return binary_peaks_response(encode_batch(items), version)
+
+@app.route('/sw.js')
+def service_worker():
+    """Serve the service worker from the site root so it controls every page"""
+    response = send_file(os.path.join(app.root_path, 'static', 'sw.js'),
+                         mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+@app.route('/precache-manifest.json')
+def precache_manifest():
+    """Versioned list of shell assets and sounds for the service worker"""
+    manifest = get_precache_manifest()
+    response = jsonify(manifest)
+    response.set_etag(manifest['version'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/reset-db')
+@primary_only
 def reset_db_route():
     """Development only: Reset the database"""
     if not app.debug:
@@ -853,6 +1444,9 @@ def reset_db_route():
             
             # Now seed fresh data with ONLY 5 groups
             seed_fresh_data()
+            invalidate_catalog()
+            # User and playlist ids restart from 1, so retire every playlist token
+            versions.bump('playlists')
         
         return "Database reset successfully with 5 playlists! <a href='/'>Go to homepage</a>"
     except Exception as e:
@@ -866,19 +1460,29 @@ def get_user_playlists():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    user = User.query.get(session['user_id'])
-    playlists = Playlist.query.filter_by(user_id=user.id).all()
-    
-    playlist_list = []
-    for playlist in playlists:
-        playlist_list.append({
-            'id': playlist.id,
-            'name': playlist.name,
-            'icon': playlist.playlist_icon,
-            'sound_count': len(playlist.sounds)
-        })
+    try:
+        fields = parse_fields(request.args.get('fields'), PLAYLIST_SUMMARY_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args.get('cursor'))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Answered from the shared version token without touching the database
+    etag = playlist_etag(session['user_id'])
+    if etag is not None and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
     
-    return jsonify(playlists=playlist_list)
+    user = User.query.get(session['user_id'])
+    summaries = iter_playlist_summaries(user.id, after=after,
+                                        limit=None if limit is None else limit + 1)
+    response = Response(stream_with_context(stream_page('playlists', summaries, limit, fields)),
+                        mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/api/playlists/create', methods=['POST'])
 def create_playlist():
@@ -910,6 +1514,13 @@ def create_playlist():
     
     db.session.add(new_playlist)
     db.session.commit()
+    bump_playlist_version(user.id)
+    mix_hub.publish(user.id, 'playlist.created', {
+        'playlist_id': new_playlist.id,
+        'name': new_playlist.name,
+        'icon': new_playlist.playlist_icon,
+        'origin': client_origin(),
+    })
     
     return jsonify({
         'success': True,
@@ -968,8 +1579,13 @@ def add_sound_to_playlist(playlist_id):
         return jsonify({'error': 'Sound already in playlist'}), 400
     
     # Add sound to playlist
+    other_ids = [other.id for other in playlist.sounds]
     playlist.sounds.append(sound)
     db.session.commit()
+    bump_playlist_version(user.id)
+    recommendations.record_added(sound.id, other_ids)
+    mix_hub.publish(user.id, 'playlist.sound_added',
+                    {'playlist_id': playlist.id, 'sound_id': sound.id, 'origin': client_origin()})
     
     return jsonify({
         'success': True,
@@ -998,6 +1614,10 @@ def remove_sound_from_playlist(playlist_id):
     if sound in playlist.sounds:
         playlist.sounds.remove(sound)
         db.session.commit()
+        bump_playlist_version(user.id)
+        recommendations.record_removed(sound.id, [other.id for other in playlist.sounds])
+        mix_hub.publish(user.id, 'playlist.sound_removed',
+                        {'playlist_id': playlist.id, 'sound_id': sound.id, 'origin': client_origin()})
         return jsonify({
             'success': True,
             'message': f'Removed {sound.display_name} from {playlist.name}'
@@ -1005,9 +1625,9 @@ def remove_sound_from_playlist(playlist_id):
     
     return jsonify({'error': 'Sound not in playlist'}), 404
 
-@app.route('/api/playlists/<int:playlist_id>/delete', methods=['DELETE'])
-def delete_playlist(playlist_id):
-    """Delete a playlist"""
+@app.route('/api/playlists/<int:playlist_id>/download', methods=['GET'])
+def download_playlist(playlist_id):
+    """Stream a ZIP of the playlist's sound files plus a JSON manifest"""
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
@@ -1017,41 +1637,139 @@ def delete_playlist(playlist_id):
     if not playlist:
         return jsonify({'error': 'Playlist not found or unauthorized'}), 404
     
-    db.session.delete(playlist)
+    sounds_root = os.path.join(app.root_path, 'static', 'sounds')
+    entries = []
+    manifest_sounds = []
+    for sound in playlist.sounds:
+        user_can_access = (user is not None) or (not sound.is_premium)
+        sound_path = os.path.join(sounds_root, sound.file_path)
+        if not user_can_access or not os.path.isfile(sound_path):
+            continue
+        arcname = f'sounds/{os.path.basename(sound.file_path)}'
+        entries.append(ZipEntry(arcname, path=sound_path))
+        manifest_sounds.append({
+            'id': sound.id,
+            'name': sound.name,
+            'display_name': sound.display_name,
+            'file': arcname,
+            'volume': sound.default_volume,
+        })
+    
+    manifest = {'name': playlist.name, 'sounds': manifest_sounds}
+    entries.insert(0, ZipEntry('manifest.json', data=json.dumps(manifest, indent=2).encode('utf-8')))
+    
+    filename = secure_filename(playlist.name) or f'playlist-{playlist.id}'
+    return Response(
+        stream_zip(entries),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}.zip"',
+            'Content-Length': str(archive_size(entries)),
+        },
+    )
+
+@app.route('/api/playlists/<int:playlist_id>/delete', methods=['DELETE'])
+def delete_playlist(playlist_id):
+    """Delete a playlist"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    user_id = session['user_id']
+    owned = (Playlist.id == playlist_id, Playlist.user_id == user_id)
+    name = db.session.scalar(db.select(Playlist.name).where(*owned))
+    
+    if name is None:
+        return jsonify({'error': 'Playlist not found or unauthorized'}), 404
+    
+    sound_ids = playlist_memberships(db.session, *owned).get(playlist_id, [])
+    if not delete_playlists_where(db.session, *owned):
+        db.session.rollback()
+        return jsonify({'error': 'Playlist not found or unauthorized'}), 404
     db.session.commit()
+    bump_playlist_version(user_id)
+    recommendations.record_playlist_deleted(sound_ids)
+    mix_hub.publish(user_id, 'playlist.deleted', {'playlist_id': playlist_id, 'origin': client_origin()})
     
     return jsonify({
         'success': True,
-        'message': f'Playlist "{playlist.name}" deleted'
+        'message': f'Playlist "{name}" deleted'
+    })
+
+# --- MIX SYNC ROUTES ---
+
+@app.route('/api/mix', methods=['GET'])
+def get_mix_state():
+    """Current mix (sounds with volume and playing flag) for the user's devices"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    return jsonify(mix_hub.get_mix(session['user_id']))
+
+@app.route('/api/mix', methods=['POST'])
+def update_mix_state():
+    """Apply play / pause / volume ops and push them to the user's other devices"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        ops = validate_ops(data.get('ops'), get_catalog().sounds_by_id)
+    except SyncError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    events = mix_hub.apply(session['user_id'], ops, origin=client_origin())
+    return jsonify({'success': True, 'applied': len(events),
+                    'seq': events[-1]['id'] if events else None})
+
+@app.route('/api/mix/events')
+def mix_events():
+    """Server-Sent Events stream of the user's mix and playlist changes"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    user_id = session['user_id']
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscriber = mix_hub.subscribe(user_id, last_event_id)
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                # A comment line every HEARTBEAT_SECONDS keeps proxies from closing the stream
+                if not subscriber.ready.wait(HEARTBEAT_SECONDS):
+                    yield ': ping\n\n'
+                    continue
+                for event in mix_hub.drain(user_id, subscriber):
+                    yield format_event(event)
+        finally:
+            mix_hub.unsubscribe(user_id, subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
     })
 
 @app.route('/cleanup-unwanted-groups')
+@primary_only
 def cleanup_unwanted_groups():
     """Remove unwanted groups from existing database"""
     if not app.debug:
         return "Cleanup only allowed in debug mode", 403
     
     try:
-        from sqlalchemy import text
-        
         # Groups to remove
         unwanted_groups = ['Transport', 'Animals', 'Ambient', 'Objects']
         
         with app.app_context():
-            # First, remove relationships
-            for group_name in unwanted_groups:
-                group = Group.query.filter_by(name=group_name).first()
-                if group:
-                    # Delete sound-group relationships
-                    db.session.execute(
-                        text("DELETE FROM sound_group WHERE group_id = :group_id"),
-                        {"group_id": group.id}
-                    )
-                    # Delete the group
-                    db.session.delete(group)
-                    print(f"Removed group: {group_name}")
-            
+            # sound_group rows and groups in two statements
+            removed = delete_groups(db.session, unwanted_groups)
             db.session.commit()
+            print(f"Removed {removed} groups")
+            invalidate_catalog()
             
         return "Unwanted groups removed successfully! <a href='/'>Go to homepage</a>"
     except Exception as e:
@@ -1220,11 +1938,290 @@ def seed_fresh_data():
 def cleanup_existing_unwanted_groups():
     """Clean up any unwanted groups in existing database"""
     unwanted_groups = ['Transport', 'Animals', 'Ambient', 'Objects']
-    for group_name in unwanted_groups:
-        group = Group.query.filter_by(name=group_name).first()
-        if group:
-            print(f"⚠ Warning: Found unwanted group '{group_name}' in database")
-            print("You can remove it by visiting: http://localhost:5000/cleanup-unwanted-groups")
+    for group in Group.query.filter(Group.name.in_(unwanted_groups)).all():
+        print(f"⚠ Warning: Found unwanted group '{group.name}' in database")
+        print("You can remove it by visiting: http://localhost:5000/cleanup-unwanted-groups")
+
+# --- CLI COMMANDS ---
+
+@app.cli.command('build-segments')
+def build_segments_command():
+    """Pre-generate segment caches for every sound in the catalog"""
+    static_root = os.path.join(app.root_path, 'static')
+    for sound in Sound.query.all():
+        try:
+            ensure_segments(static_root, sound.file_path)
+            print(f"✓ Segmented {sound.name}")
+        except (FileNotFoundError, SegmentError) as e:
+            print(f"⚠ Skipped {sound.name}: {e}")
+
+@app.cli.command('analyze-loops')
+def analyze_loops_command():
+    """Find seamless loops in every sound and export crossfaded loop assets"""
+    from audio import AudioToolError
+    from loops import extract_loop
+
+    sounds_root = os.path.join(app.root_path, 'static', 'sounds')
+    for sound in Sound.query.all():
+        try:
+            sound.loop_path = extract_loop(sounds_root, sound.file_path)
+        except (FileNotFoundError, AudioToolError) as e:
+            print(f"⚠ Skipped {sound.name}: {e}")
+            continue
+        if sound.loop_path:
+            print(f"✓ {sound.name}: loop exported to {sound.loop_path}")
+        else:
+            print(f"- {sound.name}: no seamless loop found")
+    db.session.commit()
+    invalidate_catalog()
+
+@app.cli.command('analyze-loudness')
+@click.option('--workers', type=int, default=None, help='Analysis processes (default: CPU count)')
+@click.option('--force', is_flag=True, help='Re-analyse files even if unchanged')
+def analyze_loudness_command(workers, force):
+    """Measure loudness and peak per sound and derive normalised default volumes"""
+    from audio import AudioToolError
+    from loudness import analyze_sounds
+
+    sounds_root = os.path.join(app.root_path, 'static', 'sounds')
+    sounds = [s for s in Sound.query.all()
+              if os.path.exists(os.path.join(sounds_root, s.file_path))]
+    try:
+        updated = analyze_sounds(sounds_root, sounds, workers=workers, force=force)
+    except AudioToolError as e:
+        print(f"⚠ Loudness analysis failed: {e}")
+        return
+    db.session.commit()
+    invalidate_catalog()
+
+    for sound in updated:
+        print(f"✓ {sound.name}: {sound.loudness_lufs} LUFS, peak {sound.peak_dbfs} dBFS "
+              f"-> default volume {sound.default_volume}")
+    print(f"Analysed {len(updated)} sounds, {len(sounds) - len(updated)} unchanged")
+
+@app.cli.command('build-peaks')
+@click.option('--force', is_flag=True, help='Rebuild peaks even if the file is unchanged')
+def build_peaks_command(force):
+    """Precompute waveform peaks for every sound whose file changed"""
+    from audio import AudioToolError
+    from loudness import file_hash
+    from peaks import peaks_for_file
+
+    sounds_root = os.path.join(app.root_path, 'static', 'sounds')
+    for sound in Sound.query.all():
+        path = os.path.join(sounds_root, sound.file_path)
+        try:
+            digest = file_hash(path)
+            if sound.peaks_version and sound.peaks_hash == digest and not force:
+                continue
+            sound.peaks = peaks_for_file(path)
+        except (FileNotFoundError, AudioToolError) as e:
+            print(f"⚠ Skipped {sound.name}: {e}")
+            continue
+        sound.peaks_version = peaks_version(sound.peaks)
+        sound.peaks_hash = digest
+        print(f"✓ {sound.name}: {len(sound.peaks)} bytes")
+    db.session.commit()
+    invalidate_catalog()
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Pack catalog icons into sprite sheets and write resized WebP variants"""
+    from assets import build_assets
+
+    static_root = os.path.join(app.root_path, 'static')
+    sprite_icons = [sound.icon for sound in Sound.query.all()]
+    sprite_icons += [group.playlist_icon for group in Group.query.all() if group.playlist_icon]
+
+    icon_root = os.path.join(static_root, 'icons')
+    icon_images = [f'icons/{name}' for name in os.listdir(icon_root) if name.lower().endswith('.png')]
+    photo_images = [f'icons/{name}' for name in os.listdir(icon_root)
+                    if name.lower().endswith(('.jpg', '.jpeg'))]
+
+    try:
+        manifest = build_assets(static_root, sprite_icons, icon_images, photo_images)
+    except ImportError:
+        print("⚠ Pillow is required for building assets: pip install Pillow")
+        return
+    sprite = manifest['sprite']
+    if sprite:
+        print(f"✓ Sprite: {len(sprite['icons'])} icons in {sprite['columns']}x{sprite['rows']} cells")
+    print(f"✓ WebP variants for {len(manifest['variants'])} images")
+
+def sync_sound_files():
+    """Insert or update Sound rows to match static/sounds; returns the plan applied"""
+    from soundsync import plan_changes, scan_sound_files
+
+    static_root = os.path.join(app.root_path, 'static')
+    files, icons, errors = scan_sound_files(static_root)
+    sounds = Sound.query.options(db.selectinload(Sound.groups)).all()
+    rows = {sound.file_path: {
+        'name': sound.name,
+        'display_name': sound.display_name,
+        'icon': sound.icon,
+        'category': sound.category,
+        'is_premium': sound.is_premium,
+        'default_volume': sound.default_volume,
+        'groups': sorted(group.name for group in sound.groups),
+    } for sound in sounds}
+    plan = plan_changes(files, rows, icons)
+    plan['skipped'] += errors
+    
+    groups_by_name = {group.name: group for group in Group.query.all()}
+    sounds_by_path = {sound.file_path: sound for sound in sounds}
+    
+    def apply(sound, fields):
+        for field, value in fields.items():
+            if field == 'groups':
+                sound.groups = [groups_by_name[name] for name in value if name in groups_by_name]
+            else:
+                setattr(sound, field, value)
+    
+    for fields in plan['add']:
+        sound = Sound(file_path=fields['file_path'])
+        apply(sound, {field: value for field, value in fields.items() if field != 'file_path'})
+        db.session.add(sound)
+    for file_path, changed in plan['update']:
+        apply(sounds_by_path[file_path], changed)
+    
+    if plan['add'] or plan['update']:
+        db.session.commit()
+        invalidate_catalog()
+    return plan
+
+def print_sound_sync(plan):
+    for fields in plan['add']:
+        print(f"✓ Added {fields['name']} ({fields['file_path']})")
+    for file_path, changed in plan['update']:
+        print(f"✓ Updated {file_path}: {', '.join(sorted(changed))}")
+    for reason in plan['skipped']:
+        print(f"⚠ Skipped {reason}")
+    for file_path in plan['missing']:
+        print(f"⚠ {file_path} is in the catalog but missing from static/sounds")
+
+@app.cli.command('sync-sounds')
+def sync_sounds_command():
+    """Add or update Sound rows for the files in static/sounds"""
+    plan = sync_sound_files()
+    print_sound_sync(plan)
+    print(f"Synced sounds: {len(plan['add'])} added, {len(plan['update'])} updated")
+
+@app.cli.command('sweep-orphans')
+def sweep_orphans_command():
+    """Delete playlist and group rows whose parent no longer exists, in batches"""
+    totals = sweep_until_clean(sweep_orphan_batch, pause=0)
+    for kind, deleted in totals.items():
+        print(f"{'✓' if deleted else ' '} {kind}: {deleted} removed")
+
+@app.cli.command('watch-sounds')
+@click.option('--poll', is_flag=True, help='Poll directory listings instead of using inotify')
+def watch_sounds_command(poll):
+    """Keep Sound rows in sync while files in static/sounds or static/icons change"""
+    from soundsync import DirectoryWatcher
+
+    def on_change():
+        plan = sync_sound_files()
+        print_sound_sync(plan)
+        db.session.remove()
+    
+    static_root = os.path.join(app.root_path, 'static')
+    watcher = DirectoryWatcher([os.path.join(static_root, 'sounds'), os.path.join(static_root, 'icons')],
+                               on_change, use_inotify=not poll)
+    on_change()
+    print(f"Watching static/sounds and static/icons ({watcher.mode}); Ctrl+C to stop")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('export-data')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+def export_data_command(path):
+    """Stream users, playlists and playlist sounds to an NDJSON file ('-' for stdout)"""
+    from transfer import export_ndjson
+
+    if path == '-':
+        counts = export_ndjson(db.session, click.get_binary_stream('stdout'))
+    else:
+        with open(path, 'wb') as out:
+            counts = export_ndjson(db.session, out)
+    click.echo(f"✓ Exported {counts['users']} users, {counts['playlists']} playlists, "
+               f"{counts['playlist_sound']} playlist sounds", err=True)
+
+@app.cli.command('import-data')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--checkpoint', default=None, help='Progress file for resuming (default: PATH.checkpoint)')
+@click.option('--chunk-size', default=1000, help='Rows per INSERT batch and commit')
+def import_data_command(path, checkpoint, chunk_size):
+    """Import an export-data file, resuming where an interrupted import stopped"""
+    from transfer import TransferError, import_ndjson, read_checkpoint
+
+    checkpoint = checkpoint or f'{path}.checkpoint'
+    if read_checkpoint(checkpoint) is not None:
+        print(f"Resuming from {checkpoint}")
+    
+    def progress(counts):
+        inserted = counts['inserted']
+        print(f"  {inserted['users']} users, {inserted['playlists']} playlists, "
+              f"{inserted['playlist_sound']} playlist sounds", end='\r', flush=True)
+    
+    try:
+        counts = import_ndjson(db.session, path, checkpoint, chunk_size=chunk_size, progress=progress)
+    except TransferError as e:
+        print(f"⚠ {e}")
+        return
+    print()
+    for table, inserted in counts['inserted'].items():
+        skipped = counts['skipped'][table]
+        print(f"✓ {table}: {inserted} imported" + (f", {skipped} skipped (already present or unknown sound)" if skipped else ""))
+
+@app.cli.command('bench-index')
+@click.option('--requests', 'count', default=200, help='Requests per configuration')
+def bench_index_command(count):
+    """Time GET / with the fragment cache off and on"""
+    import contextlib
+    import io
+    import statistics
+    import time
+    
+    client = app.test_client()
+    original = app.config['FRAGMENT_CACHE']
+    try:
+        for enabled in (False, True):
+            app.config['FRAGMENT_CACHE'] = enabled
+            with _render_cache_lock:
+                _fragment_cache.clear()
+            timings = []
+            # index() prints debug output on every request; keep it out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                client.get('/')
+                for _ in range(count):
+                    started = time.perf_counter()
+                    client.get('/')
+                    timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            label = 'on ' if enabled else 'off'
+            print(f"Fragment cache {label}: median {statistics.median(timings):.2f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms over {count} requests")
+    finally:
+        app.config['FRAGMENT_CACHE'] = original
+
+@app.cli.command('bench-async')
+@click.option('--clients', default=2000, help='Concurrent slow audio clients')
+@click.option('--seconds', default=10, help='How long each client keeps streaming')
+def bench_async_command(clients, seconds):
+    """Hold many slow audio downloads against one ASGI worker"""
+    try:
+        from asgi import run_slow_client_benchmark
+    except ImportError:
+        print("⚠ The async mode needs uvicorn and asgiref: pip install uvicorn asgiref")
+        return
+    
+    stats = run_slow_client_benchmark(clients=clients, seconds=seconds)
+    print(f"Peak concurrent streams: {stats['peak']} of {clients} "
+          f"({stats['completed']} completed, {stats['failed']} failed)")
+    print(f"Threads in process mid-run: {stats['threads']}")
+    print(f"Received {stats['bytes'] / 1e6:.1f} MB in {stats['elapsed']:.1f} s")
 
 # --- INITIALIZATION ---
 
@@ -1233,6 +2230,7 @@ def initialize_database():
     with app.app_context():
         # Create tables if they don't exist
         db.create_all()
+        upgrade_schema()
         
         # Check if we need to seed data
         if Group.query.count() == 0:
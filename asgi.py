@@ -0,0 +1,293 @@
+# asgi.py
+"""Async serving mode: `uvicorn asgi:application`.
+
+Under sync workers every audio download and every open /api/mix/events
+stream pins a thread for its whole lifetime. Here those two endpoints run
+natively on the event loop (one coroutine per connection, file reads done
+in short executor calls, writes paced by the server's flow control), while
+every other route runs unchanged through the Flask app in asgiref's thread
+pool, so SQLAlchemy work never blocks the loop. Routing uses Flask's own
+URL map, so both modes agree on what each path means.
+"""
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs
+from zlib import adler32
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date, parse_cookie, parse_etags, parse_range_header, quote_etag
+from werkzeug.security import safe_join
+
+from app import app, initialize_database, mix_hub
+from sync import HEARTBEAT_SECONDS, format_event
+
+CHUNK_SIZE = 64 * 1024
+
+SOUNDS_ROOT = os.path.join(app.root_path, 'static', 'sounds')
+
+flask_application = WsgiToAsgi(app)
+
+
+# --- HELPERS ---
+
+def _headers(scope):
+    return Headers([(key.decode('latin-1'), value.decode('latin-1')) for key, value in scope['headers']])
+
+
+def _encode(headers):
+    return [(key.lower().encode('latin-1'), str(value).encode('latin-1')) for key, value in headers]
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': _encode([('Content-Type', 'application/json'), ('Content-Length', len(body))])})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def session_user_id(headers):
+    """user_id from Flask's signed session cookie, or None"""
+    cookie = parse_cookie(headers.get('Cookie', '')).get(app.config['SESSION_COOKIE_NAME'])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if not cookie or serializer is None:
+        return None
+    try:
+        data = serializer.loads(cookie, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return None
+    return data.get('user_id')
+
+
+class Disconnect:
+    """Watches receive() so long responses stop as soon as the client leaves"""
+
+    def __init__(self, receive, on_disconnect=None):
+        self.happened = False
+        self._on_disconnect = on_disconnect
+        self._task = asyncio.ensure_future(self._watch(receive))
+
+    async def _watch(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                self.happened = True
+                if self._on_disconnect is not None:
+                    self._on_disconnect()
+                return
+
+    def cancel(self):
+        self._task.cancel()
+
+
+# --- NATIVE ROUTES ---
+
+async def serve_sound(scope, receive, send, filename):
+    """Async equivalent of app.serve_sound: conditional and single-range GETs"""
+    path = safe_join(SOUNDS_ROOT, filename)
+    if path is None or not os.path.isfile(path):
+        return await _send_json(send, 404, {'error': 'Sound file not found'})
+
+    stat = os.stat(path)
+    size = stat.st_size
+    # Same validator as Flask's send_file, so caches survive switching modes
+    etag = f'{stat.st_mtime}-{size}-{adler32(os.path.abspath(path).encode()) & 0xFFFFFFFF}'
+    request_headers = _headers(scope)
+    headers = [
+        ('Content-Type', 'audio/mpeg'),
+        ('Accept-Ranges', 'bytes'),
+        ('ETag', quote_etag(etag)),
+        ('Last-Modified', http_date(stat.st_mtime)),
+        ('Cache-Control', 'no-cache'),
+    ]
+
+    if parse_etags(request_headers.get('If-None-Match')).contains_weak(etag):
+        await send({'type': 'http.response.start', 'status': 304, 'headers': _encode(headers)})
+        return await send({'type': 'http.response.body', 'body': b''})
+
+    status, start, stop = 200, 0, size
+    range_header = request_headers.get('Range')
+    if range_header:
+        byte_range = parse_range_header(range_header)
+        bounds = byte_range.range_for_length(size) if byte_range else None
+        if bounds is None:
+            headers.append(('Content-Range', f'bytes */{size}'))
+            await send({'type': 'http.response.start', 'status': 416, 'headers': _encode(headers)})
+            return await send({'type': 'http.response.body', 'body': b''})
+        status, (start, stop) = 206, bounds
+        headers.append(('Content-Range', f'bytes {start}-{stop - 1}/{size}'))
+    headers.append(('Content-Length', stop - start))
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': _encode(headers)})
+    if scope['method'] == 'HEAD':
+        return await send({'type': 'http.response.body', 'body': b''})
+
+    loop = asyncio.get_running_loop()
+    disconnect = Disconnect(receive)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        offset = start
+        while offset < stop and not disconnect.happened:
+            chunk = await loop.run_in_executor(None, os.pread, fd, min(CHUNK_SIZE, stop - offset), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            # Returns only once the transport has room, so slow clients cost no buffering
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': offset < stop})
+        if offset < stop and not disconnect.happened:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        os.close(fd)
+        disconnect.cancel()
+
+
+async def mix_events(scope, receive, send):
+    """Async equivalent of app.mix_events"""
+    request_headers = _headers(scope)
+    user_id = session_user_id(request_headers)
+    if user_id is None:
+        return await _send_json(send, 401, {'error': 'Not authenticated'})
+
+    last_event_id = request_headers.get('Last-Event-ID')
+    if not last_event_id:
+        last_event_id = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('last_event_id', [None])[0]
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    subscriber = mix_hub.subscribe(user_id, last_event_id)
+    subscriber.waker = lambda: loop.call_soon_threadsafe(wake.set)
+    if subscriber.ready.is_set():
+        wake.set()
+    disconnect = Disconnect(receive, on_disconnect=wake.set)
+
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': _encode([
+            ('Content-Type', 'text/event-stream'),
+            ('Cache-Control', 'no-cache'),
+            ('X-Accel-Buffering', 'no'),
+        ])})
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        while not disconnect.happened:
+            try:
+                await asyncio.wait_for(wake.wait(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                continue
+            wake.clear()
+            events = mix_hub.drain(user_id, subscriber)
+            if events and not disconnect.happened:
+                body = ''.join(format_event(event) for event in events).encode('utf-8')
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        mix_hub.unsubscribe(user_id, subscriber)
+        disconnect.cancel()
+
+
+NATIVE_ROUTES = {
+    'serve_sound': serve_sound,
+    'mix_events': mix_events,
+}
+
+
+# --- APPLICATION ---
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.to_thread(initialize_database)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        adapter = app.url_map.bind('localhost')
+        try:
+            endpoint, args = adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            endpoint = None
+        handler = NATIVE_ROUTES.get(endpoint)
+        if handler is not None:
+            return await handler(scope, receive, send, **args)
+
+    return await flask_application(scope, receive, send)
+
+
+# --- BENCHMARK ---
+
+async def _slow_client(port, path, seconds, bytes_per_second, stats):
+    import socket
+
+    sock = socket.socket()
+    # A tiny receive window makes the server wait on us, like a slow mobile listener
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+        reader, writer = await asyncio.open_connection(sock=sock)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('ascii'))
+        head = await reader.readuntil(b'\r\n\r\n')
+        if b' 200 ' not in head.split(b'\r\n', 1)[0]:
+            stats['failed'] += 1
+            return
+        stats['streaming'] += 1
+        stats['peak'] = max(stats['peak'], stats['streaming'])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + seconds
+        while loop.time() < deadline:
+            chunk = await reader.read(bytes_per_second)
+            if not chunk:
+                break
+            stats['bytes'] += len(chunk)
+            await asyncio.sleep(1)
+        stats['streaming'] -= 1
+        stats['completed'] += 1
+        writer.close()
+    except (OSError, asyncio.IncompleteReadError):
+        stats['failed'] += 1
+        sock.close()
+
+
+def run_slow_client_benchmark(clients=2000, seconds=10, path='/sounds/Forest.mp3',
+                              bytes_per_second=16 * 1024, port=8765):
+    """Hold `clients` slow downloads against one in-process uvicorn worker"""
+    import threading
+    import time
+
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=port,
+                                           lifespan='off', log_level='warning',
+                                           backlog=clients, limit_concurrency=None))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    stats = {'streaming': 0, 'peak': 0, 'completed': 0, 'failed': 0, 'bytes': 0, 'threads': 0}
+
+    async def load():
+        tasks = [asyncio.ensure_future(_slow_client(port, path, seconds, bytes_per_second, stats))
+                 for _ in range(clients)]
+        await asyncio.sleep(seconds / 2)
+        stats['threads'] = threading.active_count()
+        await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    asyncio.run(load())
+    stats['elapsed'] = time.perf_counter() - started
+    server.should_exit = True
+    thread.join()
+    return stats
@@ -0,0 +1,190 @@
+# assets.py
+"""Build-time image pipeline: icon sprite sheets and resized WebP variants.
+
+`flask build-assets` packs the catalog's sound and group icons into one
+sprite sheet (WebP, with a PNG fallback) and writes resized WebP variants of
+the remaining images. Everything lands in static/build/ together with
+assets.json, which the Jinja helpers below read to emit sprite styles and
+srcset attributes. When nothing has been built the helpers return empty
+values and templates fall back to the original images.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+
+from markupsafe import Markup
+
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'assets.json'
+
+SPRITE_CELL = 130           # 2x the largest rendered icon (65px)
+SPRITE_COLUMNS = 8
+ICON_VARIANT_WIDTHS = (32, 64, 128)      # 1x-4x for icons shown at 28-65px
+PHOTO_VARIANT_WIDTHS = (320, 640, 960)
+WEBP_QUALITY = 85
+
+_manifest = {'mtime': None, 'data': None}
+_lock = threading.Lock()
+
+
+def _static_relative(path):
+    """Normalise 'static/icons/x.png' or 'icons/x.png' to 'icons/x.png'."""
+    return path.split('static/', 1)[1] if 'static/' in path else path
+
+
+def _fingerprint(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+
+def build_sprite(static_root, icon_paths, output_dir):
+    """Pack icons into sprite sheets; returns the sprite section of the manifest."""
+    from PIL import Image
+
+    icons = sorted({_static_relative(path) for path in icon_paths
+                    if os.path.isfile(os.path.join(static_root, _static_relative(path)))})
+    if not icons:
+        return None
+
+    columns = min(SPRITE_COLUMNS, len(icons))
+    rows = math.ceil(len(icons) / columns)
+    sheet = Image.new('RGBA', (columns * SPRITE_CELL, rows * SPRITE_CELL), (0, 0, 0, 0))
+
+    positions = {}
+    for index, icon in enumerate(icons):
+        column, row = index % columns, index // columns
+        with Image.open(os.path.join(static_root, icon)) as image:
+            image = image.convert('RGBA')
+            image.thumbnail((SPRITE_CELL, SPRITE_CELL), Image.LANCZOS)
+            x = column * SPRITE_CELL + (SPRITE_CELL - image.width) // 2
+            y = row * SPRITE_CELL + (SPRITE_CELL - image.height) // 2
+            sheet.paste(image, (x, y))
+        positions[icon] = [column, row]
+
+    webp_path = os.path.join(output_dir, 'icons-sprite.webp')
+    png_path = os.path.join(output_dir, 'icons-sprite.png')
+    sheet.save(webp_path, 'WEBP', quality=WEBP_QUALITY)
+    sheet.save(png_path, 'PNG', optimize=True)
+
+    return {
+        'webp': [f'{BUILD_DIR}/icons-sprite.webp', _fingerprint(webp_path)],
+        'png': [f'{BUILD_DIR}/icons-sprite.png', _fingerprint(png_path)],
+        'columns': columns,
+        'rows': rows,
+        'icons': positions,
+    }
+
+
+def build_variants(static_root, image_paths, output_dir, widths):
+    """Write resized WebP copies; returns {image: [[width, file, version], ...]}."""
+    from PIL import Image
+
+    variants = {}
+    for path in sorted({_static_relative(p) for p in image_paths}):
+        source = os.path.join(static_root, path)
+        if not os.path.isfile(source):
+            continue
+        stem = os.path.splitext(path)[0].replace('/', '-')
+        with Image.open(source) as image:
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            entries = []
+            for width in widths:
+                if width > image.width:
+                    break
+                height = round(image.height * width / image.width)
+                name = f'{stem}-{width}.webp'
+                target = os.path.join(output_dir, name)
+                image.resize((width, height), Image.LANCZOS).save(
+                    target, 'WEBP', quality=WEBP_QUALITY)
+                entries.append([width, f'{BUILD_DIR}/{name}', _fingerprint(target)])
+        if entries:
+            variants[path] = entries
+    return variants
+
+
+def build_assets(static_root, sprite_icons, icon_images, photo_images):
+    """Run the whole pipeline and write static/build/assets.json."""
+    output_dir = os.path.join(static_root, BUILD_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {
+        'sprite': build_sprite(static_root, sprite_icons, output_dir),
+        'variants': {
+            **build_variants(static_root, icon_images, output_dir, ICON_VARIANT_WIDTHS),
+            **build_variants(static_root, photo_images, output_dir, PHOTO_VARIANT_WIDTHS),
+        },
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_root):
+    """assets.json contents, reloaded when the file changes; {} if not built."""
+    path = os.path.join(static_root, BUILD_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _lock:
+        if _manifest['mtime'] != mtime:
+            with open(path, encoding='utf-8') as f:
+                _manifest['data'] = json.load(f)
+            _manifest['mtime'] = mtime
+        return _manifest['data']
+
+
+def manifest_version(static_root):
+    """Changes whenever assets.json is rebuilt; None if nothing is built."""
+    try:
+        return os.path.getmtime(os.path.join(static_root, BUILD_DIR, MANIFEST_NAME))
+    except OSError:
+        return None
+
+
+# --- JINJA HELPERS ---
+
+def make_template_helpers(static_root, static_url):
+    """Template globals bound to a static folder and a static_url(filename, **query) builder."""
+
+    def sprite_style(icon):
+        """Inline background style for an icon in the sprite, or '' if absent."""
+        sprite = load_manifest(static_root).get('sprite')
+        position = sprite and sprite['icons'].get(_static_relative(icon))
+        if not position:
+            return ''
+        column, row = position
+        x = column * 100 / max(sprite['columns'] - 1, 1)
+        y = row * 100 / max(sprite['rows'] - 1, 1)
+        return f'background-position: {x:.4f}% {y:.4f}%'
+
+    def sprite_stylesheet():
+        """<style> block defining .sprite-icon for the current sheet."""
+        sprite = load_manifest(static_root).get('sprite')
+        if not sprite:
+            return ''
+        webp, png = (static_url(name, v=version) for name, version in (sprite['webp'], sprite['png']))
+        return Markup(
+            '<style>.sprite-icon{display:inline-block;background-repeat:no-repeat;'
+            f'background-image:url("{png}");'
+            f'background-image:image-set(url("{webp}") type("image/webp"),url("{png}") type("image/png"));'
+            f'background-size:{sprite["columns"] * 100}% {sprite["rows"] * 100}%;'
+            'aspect-ratio:1/1}</style>'
+        )
+
+    def srcset(image):
+        """srcset attribute value listing the WebP variants of an image."""
+        entries = load_manifest(static_root).get('variants', {}).get(_static_relative(image), [])
+        return ', '.join(f'{static_url(name, v=version)} {width}w' for width, name, version in entries)
+
+    def static_image(image):
+        """URL of an image stored as 'static/...' or relative to static/."""
+        return static_url(_static_relative(image))
+
+    return {
+        'sprite_style': sprite_style,
+        'sprite_stylesheet': sprite_stylesheet,
+        'srcset': srcset,
+        'static_image': static_image,
+    }
@@ -0,0 +1,57 @@
+# audio.py
+"""Decode and encode PCM audio through the ffmpeg command-line tool.
+
+The analysis stages work on NumPy arrays of float32 samples. ffmpeg does the
+MP3 decoding and encoding so we don't need a compiled codec binding.
+"""
+import shutil
+import subprocess
+
+import numpy as np
+
+ANALYSIS_RATE = 22050
+EXPORT_RATE = 44100
+
+
+class AudioToolError(Exception):
+    """Raised when ffmpeg is missing or fails on a file."""
+
+
+def _ffmpeg():
+    binary = shutil.which('ffmpeg')
+    if binary is None:
+        raise AudioToolError('ffmpeg is required for audio analysis but was not found on PATH')
+    return binary
+
+
+def decode(path, sample_rate=ANALYSIS_RATE, channels=1):
+    """Decode a file to float32 samples shaped (frames, channels)."""
+    command = [
+        _ffmpeg(), '-v', 'error', '-i', path,
+        '-f', 'f32le', '-acodec', 'pcm_f32le',
+        '-ac', str(channels), '-ar', str(sample_rate), 'pipe:1',
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise AudioToolError(result.stderr.decode('utf-8', 'replace').strip())
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    return samples.reshape(-1, channels)
+
+
+def decode_mono(path, sample_rate=ANALYSIS_RATE):
+    """Decode a file to a 1-D float32 array of mono samples."""
+    return decode(path, sample_rate, channels=1)[:, 0]
+
+
+def encode_mp3(samples, path, sample_rate=EXPORT_RATE, bitrate='128k'):
+    """Encode float32 samples shaped (frames, channels) to an MP3 file."""
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    channels = samples.shape[1] if samples.ndim == 2 else 1
+    command = [
+        _ffmpeg(), '-v', 'error', '-y',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        '-codec:a', 'libmp3lame', '-b:a', bitrate, path,
+    ]
+    result = subprocess.run(command, input=samples.tobytes(), capture_output=True)
+    if result.returncode != 0:
+        raise AudioToolError(result.stderr.decode('utf-8', 'replace').strip())
@@ -0,0 +1,71 @@
+# breaker.py
+"""Circuit breaker for calls to the database.
+
+After FAILURE_THRESHOLD consecutive failures the breaker opens and callers
+skip the database (serving a fallback instead) for RESET_SECONDS. Then it
+lets one trial call through (half-open); success closes it again, failure
+re-opens it for another RESET_SECONDS.
+"""
+import threading
+import time
+
+FAILURE_THRESHOLD = 3
+RESET_SECONDS = 30
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker, safe to share between threads"""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self):
+        """Whether a call may go through now"""
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial:
+                # Exactly one caller gets to probe the recovering service
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"✓ {self.name} reachable again, circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"⚠ {self.name} failing ({error}), circuit open for {self.reset_seconds}s")
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'name': self.name, 'state': self.state, 'failures': self.failures}
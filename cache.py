@@ -0,0 +1,293 @@
+# cache.py
+"""Pluggable cache backend shared by every worker process.
+
+Two backends implement the same small interface (get / get_many / set /
+delete / publish / subscribe):
+
+- MemoryCache: a dict in this process; the default and what tests use.
+- RedisCache: any server speaking the Redis protocol (RESP), reached with
+  a plain socket client, so every worker sees the same keys.
+
+On top of it, VersionRegistry keeps named version tokens such as
+'catalog' or 'playlists:42'. A writer bumps a name (stores a fresh random
+token and publishes it on INVALIDATION_CHANNEL); readers compare the
+current token with the one their local copy was built from. Each worker
+mirrors the tokens locally, updated at once by the broadcast and re-read
+at most every CHECK_SECONDS, so a missed message only delays invalidation
+briefly. While the backend is unreachable the registry stops asking it,
+backing off from CHECK_SECONDS up to MAX_BACKOFF_SECONDS between attempts,
+so an outage costs one short connect timeout per attempt rather than one
+per request. Random tokens rather than counters mean a restarted or flushed
+backend can never hand out a token that an old copy was built from: a name
+that was never bumped reads as the registry's own random epoch, not a
+constant, and a name whose key disappears keeps the last token seen.
+"""
+import json
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+INVALIDATION_CHANNEL = 'calmflow:invalidate'
+KEY_PREFIX = 'calmflow:'
+CHECK_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 30.0
+CONNECT_TIMEOUT = 0.25
+SOCKET_TIMEOUT = 1.0
+
+
+class CacheError(Exception):
+    """The cache backend could not be reached or answered with an error"""
+
+
+# --- IN-PROCESS BACKEND ---
+
+class MemoryCache:
+    """Per-process backend with the same interface as RedisCache"""
+
+    def __init__(self):
+        self._data = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (None, None))
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def publish(self, channel, message):
+        for subscribed, callback in list(self._subscribers):
+            if subscribed == channel:
+                callback(message)
+
+    def subscribe(self, channel, callback):
+        self._subscribers.append((channel, callback))
+
+
+# --- NETWORKED BACKEND ---
+
+def _encode_command(*args):
+    parts = [f'*{len(args)}\r\n'.encode('ascii')]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+def _read_reply(stream):
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionResetError('Connection closed by cache server')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode('utf-8')
+    if kind == b'-':
+        raise CacheError(payload.decode('utf-8'))
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2].decode('utf-8')
+    if kind == b'*':
+        count = int(payload)
+        return None if count < 0 else [_read_reply(stream) for _ in range(count)]
+    raise CacheError(f'Unexpected reply from cache server: {line!r}')
+
+
+class RedisCache:
+    """Minimal RESP client; one connection per backend, guarded by a lock"""
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self._sock = None
+        self._stream = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+        sock.settimeout(SOCKET_TIMEOUT)
+        stream = sock.makefile('rb')
+        if self.db:
+            sock.sendall(_encode_command('SELECT', self.db))
+            _read_reply(stream)
+        return sock, stream
+
+    def execute(self, *args):
+        with self._lock:
+            while True:
+                reused = self._sock is not None
+                try:
+                    if not reused:
+                        self._sock, self._stream = self._connect()
+                    self._sock.sendall(_encode_command(*args))
+                    return _read_reply(self._stream)
+                except (OSError, CacheError) as e:
+                    self._close()
+                    # Reconnect once for a connection the server dropped while idle;
+                    # timeouts and failed connects are not worth waiting on twice
+                    if not (reused and isinstance(e, ConnectionError)):
+                        raise CacheError(str(e) or type(e).__name__) from e
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._stream = None
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def get_many(self, keys):
+        return self.execute('MGET', *keys) if keys else []
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.execute('SET', key, value, 'EX', int(ttl))
+        else:
+            self.execute('SET', key, value)
+
+    def delete(self, key):
+        self.execute('DEL', key)
+
+    def publish(self, channel, message):
+        self.execute('PUBLISH', channel, message)
+
+    def subscribe(self, channel, callback):
+        """Call callback(message) for every publish, from a daemon thread"""
+
+        def listen():
+            delay = 0.5
+            while True:
+                try:
+                    sock, stream = self._connect()
+                    sock.settimeout(None)
+                    sock.sendall(_encode_command('SUBSCRIBE', channel))
+                    delay = 0.5
+                    while True:
+                        reply = _read_reply(stream)
+                        if isinstance(reply, list) and reply[0] == 'message':
+                            callback(reply[2])
+                except (OSError, CacheError) as e:
+                    print(f"⚠ Cache subscription lost ({e}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30)
+
+        threading.Thread(target=listen, name=f'cache-subscriber-{channel}', daemon=True).start()
+
+
+def from_url(url):
+    """Backend for 'memory://' or 'redis://host:port/db'"""
+    if not url or url.startswith('memory://'):
+        return MemoryCache()
+    parsed = urlparse(url)
+    if parsed.scheme != 'redis':
+        raise ValueError(f'Unsupported cache URL: {url}')
+    db = int(parsed.path.lstrip('/') or 0)
+    return RedisCache(parsed.hostname or '127.0.0.1', parsed.port or 6379, db)
+
+
+# --- VERSION KEYS ---
+
+class VersionRegistry:
+    """Named version tokens shared through a backend"""
+
+    def __init__(self, backend, check_seconds=CHECK_SECONDS):
+        self.backend = backend
+        self.check_seconds = check_seconds
+        self.available = True
+        # Token for names never bumped; new with every process, like the tokens
+        self.epoch = uuid.uuid4().hex[:12]
+        self._retry_at = float('-inf')
+        self._backoff = check_seconds
+        self._local = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+        backend.subscribe(INVALIDATION_CHANNEL, self._on_message)
+
+    def _key(self, name):
+        return f'{KEY_PREFIX}version:{name}'
+
+    def _remember(self, name, token, at=None):
+        self._local[name] = token
+        self._checked[name] = time.monotonic() if at is None else at
+
+    def _on_message(self, message):
+        try:
+            name, token = json.loads(message)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._remember(name, token)
+
+    def current(self, *names):
+        """Latest known token for each name (epoch if never bumped); one round trip"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [name for name in names
+                     if now - self._checked.get(name, float('-inf')) >= self.check_seconds]
+        if stale and now >= self._retry_at:
+            try:
+                tokens = self.backend.get_many([self._key(name) for name in stale])
+                self._mark(True)
+            except CacheError as e:
+                self._mark(False, e)
+            else:
+                with self._lock:
+                    for name, token in zip(stale, tokens):
+                        self._remember(name, token or self._local.get(name, self.epoch), now)
+        with self._lock:
+            found = [self._local.get(name, self.epoch) for name in names]
+        return found[0] if len(names) == 1 else found
+
+    def bump(self, name):
+        """Give name a new token everywhere; returns it"""
+        token = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._remember(name, token)
+        if time.monotonic() < self._retry_at:
+            return token
+        try:
+            self.backend.set(self._key(name), token)
+            self.backend.publish(INVALIDATION_CHANNEL, json.dumps([name, token]))
+            self._mark(True)
+        except CacheError as e:
+            # Other workers fall back to their TTLs until the backend returns
+            self._mark(False, e)
+        return token
+
+    def _mark(self, available, error=None):
+        if self.available and not available:
+            print(f"⚠ Cache backend unavailable, using local versions: {error}")
+        elif available and not self.available:
+            print("✓ Cache backend reachable again")
+        self.available = available
+        if available:
+            self._retry_at = float('-inf')
+            self._backoff = self.check_seconds
+        else:
+            # Leave the backend alone for a while instead of timing out on every call
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF_SECONDS)
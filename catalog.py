@@ -0,0 +1,377 @@
+# catalog.py
+"""In-memory snapshot of the sound catalog.
+
+The catalog (sounds and the default groups) only changes when the database
+is reseeded or an analysis command rewrites sound rows, yet every page view
+used to query and serialise it again. get_catalog() builds one immutable
+snapshot and reuses it until invalidate_catalog() is called or the snapshot
+is older than CATALOG_TTL_SECONDS. The version is a content hash, so every
+worker derives the same version from the same data.
+
+With a shared cache (see use_shared_cache and cache.py), invalidation is
+broadcast: invalidate_catalog() bumps the 'catalog' version token and every
+worker rebuilds once it sees a token other than the one its snapshot was
+built under. Group summaries are stored in the shared cache too, so only
+one worker runs the GROUP BY per catalog version.
+
+Every snapshot built from the database is also written to a versioned file
+(see use_snapshot_file). A starting worker memory-maps that file and serves
+it at once while the first database build runs in the background, and
+while the database circuit breaker is open, reads fall back to the last
+good snapshot instead of failing.
+"""
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import String, case, cast, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+
+from breaker import OPEN
+from cache import CacheError
+from models import db, Sound, Group, sound_group_association
+from routing import primary_reads
+
+ALLOWED_GROUPS = ['Nature', 'Sleep', 'Focus', 'Relax', 'City']
+CATALOG_TTL_SECONDS = 300
+
+# magic, file format, catalog version, payload length; then the JSON payload
+SNAPSHOT_MAGIC = b'CFCAT'
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_HEADER = struct.Struct('<5sB16sI')
+
+_state = {'snapshot': None, 'group_summaries': None, 'backend': None, 'versions': None,
+          'snapshot_path': None, 'persisted_version': None, 'breaker': None, 'refreshing': False}
+_lock = threading.Lock()
+# Held by the one thread building from the database; never while holding _lock
+_build_lock = threading.Lock()
+
+
+class CatalogUnavailable(RuntimeError):
+    """Neither the database nor a snapshot file can provide the catalog"""
+
+
+class CatalogSnapshot:
+    """Serialised sounds and default groups plus a content version"""
+
+    def __init__(self, sounds, groups, generation=None, source='db'):
+        self.sounds = sounds
+        self.groups = groups
+        self.sounds_by_id = {sound['id']: sound for sound in sounds}
+        self.sound_ids = [sound['id'] for sound in sounds]
+        self.built_at = time.monotonic()
+        # Shared 'catalog' token current when the build started
+        self.generation = generation
+        # 'db' or 'disk' (loaded from the snapshot file)
+        self.source = source
+        payload = json.dumps([sounds, groups], sort_keys=True, default=str)
+        self.version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def sounds_after(self, last_id):
+        """Sounds with an id greater than last_id, in id order"""
+        start = 0 if last_id is None else bisect.bisect_right(self.sound_ids, last_id)
+        return self.sounds[start:]
+
+    def is_expired(self):
+        return time.monotonic() - self.built_at > CATALOG_TTL_SECONDS
+
+    def is_current(self, generation):
+        return not self.is_expired() and self.generation == generation
+
+
+def write_snapshot_file(snapshot, path):
+    """Atomically replace path with snapshot's sounds and groups"""
+    payload = json.dumps({'sounds': snapshot.sounds, 'groups': snapshot.groups},
+                         separators=(',', ':'), default=str).encode('utf-8')
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT,
+                                  snapshot.version.encode('ascii'), len(payload))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(temporary, path)
+
+
+def read_snapshot_file(path, generation=None):
+    """CatalogSnapshot from a file written by write_snapshot_file, or None"""
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if len(mapped) < SNAPSHOT_HEADER.size:
+                return None
+            magic, file_format, version, length = SNAPSHOT_HEADER.unpack_from(mapped)
+            end = SNAPSHOT_HEADER.size + length
+            if magic != SNAPSHOT_MAGIC or file_format != SNAPSHOT_FORMAT or len(mapped) < end:
+                return None
+            data = json.loads(mapped[SNAPSHOT_HEADER.size:end])
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"⚠ Ignoring unreadable catalog snapshot {path}: {e}")
+        return None
+    snapshot = CatalogSnapshot(data['sounds'], data['groups'], generation, source='disk')
+    # The content hash doubles as a checksum over the payload
+    return snapshot if snapshot.version == version.decode('ascii') else None
+
+
+def static_icon_url(icon):
+    """URL for an icon stored as 'static/icons/x.png' or 'icons/x.png'"""
+    relative = icon.split('static/', 1)[1] if 'static/' in icon else icon
+    return f'{current_app.static_url_path}/{relative}'
+
+
+def _sound_entry(sound):
+    entry = sound.to_dict()
+    # Precomputed for the templates so rendering does no string work per icon
+    entry['icon_url'] = static_icon_url(sound.icon)
+    entry['group_attr'] = ' '.join(str(group_id) for group_id in entry['groups'])
+    entry['volume_percent'] = round(sound.default_volume * 100) if sound.default_volume else 50
+    return entry
+
+
+def use_shared_cache(backend, versions):
+    """Share invalidations and group summaries through a cache backend"""
+    with _lock:
+        _state['backend'] = backend
+        _state['versions'] = versions
+        _state['snapshot'] = None
+        _state['group_summaries'] = None
+
+
+def use_snapshot_file(path, breaker):
+    """Persist snapshots to path and serve from it while breaker is open.
+
+    Loads the file straight away so a starting worker can serve before its
+    first database query.
+    """
+    snapshot = read_snapshot_file(path, _generation())
+    with _lock:
+        _state['snapshot_path'] = path
+        _state['breaker'] = breaker
+        if snapshot is not None and _state['snapshot'] is None:
+            _state['snapshot'] = snapshot
+            _state['persisted_version'] = snapshot.version
+            print(f"✓ Loaded catalog snapshot {snapshot.version} from {path}")
+
+
+def _generation():
+    versions = _state['versions']
+    return versions.current('catalog') if versions is not None else None
+
+
+def build_catalog(generation=None):
+    """Query the database and build a fresh snapshot"""
+    # From the primary: a lagging replica would be cached under the new version
+    with primary_reads():
+        sounds = Sound.query.options(selectinload(Sound.groups)).order_by(Sound.id).all()
+        groups = Group.query.filter(Group.name.in_(ALLOWED_GROUPS)).order_by(Group.id).all()
+    return CatalogSnapshot(
+        [_sound_entry(sound) for sound in sounds],
+        [{'id': group.id, 'name': group.name, 'playlist_icon': group.playlist_icon,
+          'icon_url': static_icon_url(group.playlist_icon) if group.playlist_icon else None}
+         for group in groups],
+        generation,
+    )
+
+
+def get_catalog():
+    """Current snapshot, rebuilding it if invalidated or expired"""
+    generation = _generation()
+    snapshot = _state['snapshot']
+    if snapshot is not None and snapshot.is_current(generation):
+        breaker = _state['breaker']
+        if snapshot.source == 'disk' and (breaker is None or breaker.state != OPEN):
+            _refresh_in_background()
+        return snapshot
+    breaker = _state['breaker']
+    if snapshot is not None and breaker is not None and breaker.state == OPEN:
+        return snapshot
+    return _rebuild(generation)
+
+
+def _rebuild(generation):
+    """Build from the database, or fall back to the last good snapshot.
+
+    One thread builds at a time. While it does, the others serve the last
+    snapshot instead of waiting on a database that may take its whole
+    connect timeout to fail; only a worker with no snapshot at all waits.
+    """
+    breaker = _state['breaker']
+    snapshot = _state['snapshot']
+    if not _build_lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        snapshot = _state['snapshot']
+        if snapshot is not None and snapshot.source == 'db' and snapshot.is_current(generation):
+            return snapshot
+        if breaker is not None and not breaker.allow():
+            return _fallback(snapshot, CatalogUnavailable('Database circuit is open'))
+        try:
+            fresh = build_catalog(generation)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            if breaker is None:
+                raise
+            breaker.record_failure(e)
+            return _fallback(snapshot, e)
+        if breaker is not None:
+            breaker.record_success()
+        with _lock:
+            _state['snapshot'] = fresh
+        _persist(fresh)
+        return fresh
+    finally:
+        _build_lock.release()
+
+
+def _fallback(snapshot, error):
+    if snapshot is None and _state['snapshot_path']:
+        snapshot = read_snapshot_file(_state['snapshot_path'], _generation())
+        _state['snapshot'] = snapshot
+    if snapshot is None:
+        raise CatalogUnavailable('No catalog snapshot to fall back to') from error
+    return snapshot
+
+
+def _persist(snapshot):
+    path = _state['snapshot_path']
+    if path is None or _state['persisted_version'] == snapshot.version:
+        return
+    try:
+        write_snapshot_file(snapshot, path)
+        _state['persisted_version'] = snapshot.version
+    except OSError as e:
+        print(f"⚠ Could not write catalog snapshot {path}: {e}")
+
+
+def _refresh_in_background():
+    """Replace a snapshot loaded from disk with a database build, off the request path"""
+    with _lock:
+        if _state['refreshing']:
+            return
+        _state['refreshing'] = True
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                _rebuild(_generation())
+        except CatalogUnavailable:
+            pass
+        finally:
+            _state['refreshing'] = False
+
+    threading.Thread(target=run, name='catalog-refresh', daemon=True).start()
+
+
+def build_group_summaries():
+    """Per-group counts and member ids from one GROUP BY over sound_group"""
+    member_ids = func.aggregate_strings(cast(Sound.id, String), ',')
+    premium = func.sum(case((Sound.is_premium == True, 1), else_=0))  # noqa: E712
+    query = (
+        select(Group.id, Group.name, Group.playlist_icon, func.count(Sound.id), premium, member_ids)
+        .select_from(Group)
+        .outerjoin(sound_group_association, sound_group_association.c.group_id == Group.id)
+        .outerjoin(Sound, Sound.id == sound_group_association.c.sound_id)
+        .where(Group.name.in_(ALLOWED_GROUPS))
+        .group_by(Group.id, Group.name, Group.playlist_icon)
+        .order_by(Group.id)
+    )
+    summaries = []
+    with primary_reads():
+        rows = db.session.execute(query).all()
+    for group_id, name, icon, total, premium_count, ids in rows:
+        premium_count = premium_count or 0
+        summaries.append({
+            'id': group_id,
+            'name': name,
+            'icon': icon,
+            'total': total,
+            'free': total - premium_count,
+            'premium': premium_count,
+            'sound_ids': sorted(int(sound_id) for sound_id in ids.split(',')) if ids else [],
+        })
+    return summaries
+
+
+def get_group_summaries():
+    """Group summaries for the current catalog version"""
+    version = get_catalog().version
+    cached = _state['group_summaries']
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    backend = _state['backend']
+    key = f'calmflow:groups:{version}'
+    summaries = None
+    if backend is not None:
+        try:
+            shared = backend.get(key)
+            summaries = json.loads(shared) if shared else None
+        except CacheError as e:
+            print(f"⚠ Shared group summaries unavailable: {e}")
+            backend = None
+    if summaries is None:
+        summaries = _group_summaries_or_fallback()
+        if backend is not None and summaries is not None:
+            try:
+                backend.set(key, json.dumps(summaries), ttl=CATALOG_TTL_SECONDS)
+            except CacheError as e:
+                print(f"⚠ Could not share group summaries: {e}")
+    if summaries is None:
+        # Database unavailable: derive them from the snapshot, without caching
+        return summaries_from_snapshot(get_catalog())
+    with _lock:
+        _state['group_summaries'] = (version, summaries)
+    return summaries
+
+
+def _group_summaries_or_fallback():
+    breaker = _state['breaker']
+    if breaker is None:
+        return build_group_summaries()
+    if not breaker.allow():
+        return None
+    try:
+        summaries = build_group_summaries()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        breaker.record_failure(e)
+        return None
+    breaker.record_success()
+    return summaries
+
+
+def summaries_from_snapshot(snapshot):
+    """Same shape as build_group_summaries, computed from a snapshot"""
+    summaries = []
+    for group in snapshot.groups:
+        members = [sound for sound in snapshot.sounds if group['id'] in sound['groups']]
+        premium_count = sum(1 for sound in members if sound['is_premium'])
+        summaries.append({
+            'id': group['id'],
+            'name': group['name'],
+            'icon': group['playlist_icon'],
+            'total': len(members),
+            'free': len(members) - premium_count,
+            'premium': premium_count,
+            'sound_ids': [sound['id'] for sound in members],
+        })
+    return summaries
+
+
+def invalidate_catalog():
+    """Drop the snapshot after the sounds or groups tables change, in every worker"""
+    # After any build in flight, which would otherwise store the old data
+    with _build_lock, _lock:
+        _state['snapshot'] = None
+        _state['group_summaries'] = None
+        versions = _state['versions']
+    if versions is not None:
+        versions.bump('catalog')
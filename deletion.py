@@ -0,0 +1,130 @@
+# deletion.py
+"""Set-based deletes for accounts, playlists and groups, and an orphan sweeper.
+
+Deleting through the ORM loads every playlist and its sounds just to
+remove them, and Query.delete() skips the playlist_sound rows. These
+helpers issue a few DELETE statements whose WHERE clauses select the
+children of whatever is being removed, so the cost does not depend on how
+much a user owns. The database's ON DELETE CASCADE foreign keys (added by
+migrations.upgrade_schema) back this up for any other delete path.
+
+Rows orphaned before the cascades existed are removed by sweep_orphans(),
+ORPHAN_BATCH_SIZE parent ids per check per call, so no single sweep holds
+locks for long. OrphanSweeper runs it periodically on a daemon thread.
+None of the helpers commit; callers do.
+"""
+import threading
+import time
+
+from sqlalchemy import delete, select, update
+
+from models import Group, ListeningEvent, Playlist, Sound, User, playlist_sound_association, sound_group_association
+
+ORPHAN_BATCH_SIZE = 500
+SWEEP_SECONDS = 3600
+BATCH_PAUSE_SECONDS = 0.1
+
+# (table, foreign key column, referenced primary key)
+LINK_REFERENCES = [
+    (playlist_sound_association, playlist_sound_association.c.playlist_id, Playlist.id),
+    (playlist_sound_association, playlist_sound_association.c.sound_id, Sound.id),
+    (sound_group_association, sound_group_association.c.group_id, Group.id),
+    (sound_group_association, sound_group_association.c.sound_id, Sound.id),
+]
+
+
+def playlist_memberships(session, *criteria):
+    """{playlist_id: [sound_id]} for playlists matching criteria"""
+    link = playlist_sound_association
+    playlist_ids = select(Playlist.id).where(*criteria)
+    memberships = {}
+    for playlist_id, sound_id in session.execute(
+            select(link.c.playlist_id, link.c.sound_id).where(link.c.playlist_id.in_(playlist_ids))):
+        memberships.setdefault(playlist_id, []).append(sound_id)
+    return memberships
+
+
+def delete_playlists_where(session, *criteria):
+    """Delete matching playlists and their playlist_sound rows; returns the playlist count"""
+    link = playlist_sound_association
+    playlist_ids = select(Playlist.id).where(*criteria)
+    session.execute(delete(link).where(link.c.playlist_id.in_(playlist_ids)))
+    return session.execute(delete(Playlist).where(*criteria)).rowcount
+
+
+def delete_user(session, user_id):
+    """Delete a user, their playlists and memberships; keeps their listening events anonymised"""
+    delete_playlists_where(session, Playlist.user_id == user_id)
+    session.execute(update(ListeningEvent).where(ListeningEvent.user_id == user_id).values(user_id=None))
+    return session.execute(delete(User).where(User.id == user_id)).rowcount
+
+
+def delete_groups(session, names):
+    """Delete groups by name with their sound_group rows; returns the group count"""
+    link = sound_group_association
+    group_ids = select(Group.id).where(Group.name.in_(names))
+    session.execute(delete(link).where(link.c.group_id.in_(group_ids)))
+    return session.execute(delete(Group).where(Group.name.in_(names))).rowcount
+
+
+def sweep_orphans(session, batch_size=ORPHAN_BATCH_SIZE):
+    """Delete one batch of each kind of orphan; returns {kind: rows deleted}"""
+    counts = {}
+    for table, column, referenced in LINK_REFERENCES:
+        missing = (select(column).distinct()
+                   .where(~select(referenced).where(referenced == column).exists())
+                   .limit(batch_size))
+        ids = session.scalars(missing).all()
+        deleted = session.execute(delete(table).where(column.in_(ids))).rowcount if ids else 0
+        counts[f'{table.name}.{column.name}'] = deleted
+
+    ownerless = (select(Playlist.id)
+                 .where(Playlist.user_id.is_not(None),
+                        ~select(User.id).where(User.id == Playlist.user_id).exists())
+                 .limit(batch_size))
+    ids = session.scalars(ownerless).all()
+    counts['playlists.user_id'] = delete_playlists_where(session, Playlist.id.in_(ids)) if ids else 0
+    return counts
+
+
+def sweep_until_clean(sweep, pause=BATCH_PAUSE_SECONDS):
+    """Call sweep() until a batch deletes nothing; returns the summed counts"""
+    totals = {}
+    while True:
+        counts = sweep()
+        for kind, deleted in counts.items():
+            totals[kind] = totals.get(kind, 0) + deleted
+        if not any(counts.values()):
+            return totals
+        time.sleep(pause)
+
+
+class OrphanSweeper:
+    """Runs sweep() every interval seconds on a daemon thread"""
+
+    def __init__(self, interval=SWEEP_SECONDS):
+        self.interval = interval
+        self.last_counts = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self, sweep):
+        """sweep() deletes one batch per kind and returns the counts"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    totals = sweep_until_clean(sweep)
+                    self.last_counts = totals
+                    if any(totals.values()):
+                        print(f"✓ Swept orphans: {', '.join(f'{kind} {n}' for kind, n in totals.items() if n)}")
+                except Exception as e:
+                    print(f"⚠ Orphan sweep failed: {e}")
+                time.sleep(self.interval)
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=run, name='orphan-sweeper', daemon=True)
+                self._thread.start()
@@ -0,0 +1,164 @@
+# loops.py
+"""Find short seamless loops in long ambient recordings.
+
+Many ambient sounds are long recordings of a signal that repeats or is
+statistically stationary (fans, white noise, washing machines). For those we
+export a much shorter loop whose seam is already crossfaded, so clients loop
+a few seconds of audio instead of downloading the whole recording.
+"""
+import os
+
+import numpy as np
+
+from audio import ANALYSIS_RATE, EXPORT_RATE, decode, decode_mono, encode_mp3
+
+LOOPS_DIR_NAME = 'loops'
+
+MIN_LOOP_SECONDS = 4.0
+MAX_LOOP_SECONDS = 15.0
+CROSSFADE_SECONDS = 0.25
+SEAM_SEARCH_SECONDS = 2.0
+
+# Normalised autocorrelation needed to treat a lag as a true repetition
+REPEAT_THRESHOLD = 0.8
+# Spread (dB) allowed between block spectra for a sound to count as stationary
+STATIONARY_DB = 3.0
+STATIONARY_BLOCK_SECONDS = 0.5
+STATIONARY_BANDS = 16
+
+
+def normalised_autocorrelation(x, max_lag):
+    """Autocorrelation of x for lags 0..max_lag, normalised by overlap energy."""
+    n = len(x)
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(x, size)
+    raw = np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+
+    energy = np.concatenate(([0.0], np.cumsum(x.astype(np.float64) ** 2)))
+    lags = np.arange(max_lag + 1)
+    head = energy[n - lags]               # energy of x[0:n-lag]
+    tail = energy[n] - energy[lags]       # energy of x[lag:n]
+    return raw / np.maximum(np.sqrt(head * tail), 1e-12)
+
+
+def find_repeat_period(x, sample_rate=ANALYSIS_RATE):
+    """Shortest lag (in samples) at which x repeats itself, or None."""
+    min_lag = int(MIN_LOOP_SECONDS * sample_rate)
+    max_lag = min(int(MAX_LOOP_SECONDS * sample_rate), len(x) // 2)
+    if max_lag <= min_lag:
+        return None
+
+    scores = normalised_autocorrelation(x, max_lag)
+    window = scores[min_lag:max_lag + 1]
+    candidates = np.flatnonzero(window >= REPEAT_THRESHOLD)
+    if candidates.size == 0:
+        return None
+
+    # Walk from the first qualifying lag to the top of its peak
+    lag = candidates[0]
+    while lag + 1 < window.size and window[lag + 1] > window[lag]:
+        lag += 1
+    return int(min_lag + lag)
+
+
+def is_stationary(x, sample_rate=ANALYSIS_RATE):
+    """True if the band spectrum of x barely changes over time."""
+    block = int(STATIONARY_BLOCK_SECONDS * sample_rate)
+    count = len(x) // block
+    if count < 4:
+        return False
+
+    blocks = x[:count * block].reshape(count, block) * np.hanning(block)
+    power = np.abs(np.fft.rfft(blocks, axis=1)) ** 2
+    edges = np.unique(np.geomspace(32, power.shape[1], STATIONARY_BANDS + 1).astype(int))
+    bands = np.add.reduceat(power, edges[:-1], axis=1)
+    levels = 10 * np.log10(bands + 1e-12)
+    spread = levels - np.median(levels, axis=0)
+    return bool(np.percentile(np.abs(spread), 95) <= STATIONARY_DB)
+
+
+def find_seam(x, loop_length, sample_rate=ANALYSIS_RATE):
+    """Best loop start for a fixed loop length.
+
+    Scores every start in the search window by the normalised correlation
+    between the crossfade region at the start and the one a loop later, so
+    the crossfade blends two near-identical stretches of audio.
+    """
+    fade = int(CROSSFADE_SECONDS * sample_rate)
+    search = min(int(SEAM_SEARCH_SECONDS * sample_rate), len(x) - loop_length - fade)
+    if search <= 0:
+        return None
+
+    a = x[:search + fade].astype(np.float64)
+    b = x[loop_length:loop_length + search + fade].astype(np.float64)
+
+    def sliding_sum(values):
+        total = np.concatenate(([0.0], np.cumsum(values)))
+        return total[fade:fade + search] - total[:search]
+
+    score = sliding_sum(a * b) / np.maximum(np.sqrt(sliding_sum(a * a) * sliding_sum(b * b)), 1e-12)
+    return int(np.argmax(score))
+
+
+def find_loop(x, sample_rate=ANALYSIS_RATE):
+    """Return (start, length) in samples of a seamless loop in x, or None."""
+    length = find_repeat_period(x, sample_rate)
+    if length is None and is_stationary(x, sample_rate):
+        length = int(MIN_LOOP_SECONDS * sample_rate)
+    if length is None:
+        return None
+
+    start = find_seam(x, length, sample_rate)
+    if start is None:
+        return None
+    return start, length
+
+
+def crossfade_loop(samples, start, length, fade):
+    """Cut samples[start:start+length] with its seam pre-crossfaded.
+
+    The head of the loop is blended with the audio that follows the loop
+    end, so playing the result end-to-end never jumps in level or phase.
+    Works on arrays shaped (frames,) or (frames, channels).
+    """
+    loop = samples[start:start + length].copy()
+    after = samples[start + length:start + length + fade]
+    t = np.linspace(0.0, np.pi / 2, fade, dtype=np.float32)
+    fade_in, fade_out = np.sin(t), np.cos(t)
+    if loop.ndim == 2:
+        fade_in, fade_out = fade_in[:, None], fade_out[:, None]
+    loop[:fade] = loop[:fade] * fade_in + after * fade_out
+    return loop
+
+
+def loop_asset_path(file_path):
+    """Path, relative to static/sounds, of the loop asset for a sound file."""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return f'{LOOPS_DIR_NAME}/{stem}.mp3'
+
+
+def extract_loop(sounds_root, file_path):
+    """Analyse one sound file and export its loop.
+
+    Returns the loop asset path relative to sounds_root, or None when the
+    sound has no seamless loop shorter than the recording.
+    """
+    source = os.path.join(sounds_root, file_path)
+    found = find_loop(decode_mono(source, ANALYSIS_RATE), ANALYSIS_RATE)
+    if found is None:
+        return None
+
+    scale = EXPORT_RATE / ANALYSIS_RATE
+    start, length = int(found[0] * scale), int(found[1] * scale)
+    fade = int(CROSSFADE_SECONDS * EXPORT_RATE)
+
+    samples = decode(source, EXPORT_RATE, channels=2)
+    if start + length + fade > len(samples):
+        return None
+    loop = crossfade_loop(samples, start, length, fade)
+
+    relative = loop_asset_path(file_path)
+    destination = os.path.join(sounds_root, relative)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    encode_mp3(loop, destination, EXPORT_RATE)
+    return relative
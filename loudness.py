@@ -0,0 +1,138 @@
+# loudness.py
+"""Measure integrated loudness and peak level of sound files.
+
+Loudness follows ITU-R BS.1770: K-weighted mean square over 400 ms blocks
+with 75% overlap, then absolute (-70 LUFS) and relative (-10 LU) gating.
+The K-weighting filter is applied in the frequency domain so every block of
+a file is processed in one vectorised pass.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio import decode_mono
+
+LOUDNESS_RATE = 48000
+BLOCK_SECONDS = 0.4
+HOP_SECONDS = 0.1
+BLOCKS_PER_CHUNK = 64
+
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# A sound measuring REFERENCE_LUFS plays at BASE_VOLUME; others are scaled to match
+REFERENCE_LUFS = -23.0
+BASE_VOLUME = 0.5
+MIN_VOLUME = 0.05
+MAX_VOLUME = 1.0
+
+# BS.1770 K-weighting biquads at 48 kHz: high-shelf then high-pass
+_SHELF_B = (1.53512485958697, -2.69169618940638, 1.19839281085285)
+_SHELF_A = (1.0, -1.69065929318241, 0.73248077421585)
+_HIGHPASS_B = (1.0, -2.0, 1.0)
+_HIGHPASS_A = (1.0, -1.99004745483398, 0.99007225036621)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file, used to tell when a cached analysis is stale."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _biquad_power(b, a, z):
+    numerator = b[0] + b[1] / z + b[2] / z ** 2
+    denominator = a[0] + a[1] / z + a[2] / z ** 2
+    return np.abs(numerator / denominator) ** 2
+
+
+def k_weighting_power(block_size):
+    """Squared magnitude of the K-weighting filter at each rfft bin."""
+    z = np.exp(2j * np.pi * np.fft.rfftfreq(block_size))
+    return _biquad_power(_SHELF_B, _SHELF_A, z) * _biquad_power(_HIGHPASS_B, _HIGHPASS_A, z)
+
+
+def block_mean_squares(samples, sample_rate=LOUDNESS_RATE):
+    """K-weighted mean square of every gating block in samples."""
+    block = int(BLOCK_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    if len(samples) < block:
+        samples = np.pad(samples, (0, block - len(samples)))
+
+    blocks = np.lib.stride_tricks.sliding_window_view(samples, block)[::hop]
+    weights = k_weighting_power(block)
+    # Parseval for a one-sided spectrum: every bin except DC and Nyquist counts twice
+    weights[1:len(weights) - (1 - block % 2)] *= 2
+
+    result = np.empty(len(blocks))
+    for start in range(0, len(blocks), BLOCKS_PER_CHUNK):
+        spectra = np.fft.rfft(blocks[start:start + BLOCKS_PER_CHUNK], axis=1)
+        power = np.abs(spectra) ** 2
+        result[start:start + BLOCKS_PER_CHUNK] = power @ weights / block ** 2
+    return result
+
+
+def integrated_loudness(samples, sample_rate=LOUDNESS_RATE):
+    """Gated integrated loudness of mono samples, in LUFS."""
+    mean_squares = block_mean_squares(samples, sample_rate)
+    loudness = -0.691 + 10 * np.log10(np.maximum(mean_squares, 1e-20))
+
+    gated = mean_squares[loudness > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return ABSOLUTE_GATE_LUFS
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = mean_squares[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def peak_dbfs(samples):
+    """Sample peak of samples in dBFS."""
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    return 20 * np.log10(max(peak, 1e-10))
+
+
+def normalised_volume(loudness_lufs):
+    """Default volume that brings a sound to the reference loudness."""
+    volume = BASE_VOLUME * 10 ** ((REFERENCE_LUFS - loudness_lufs) / 20)
+    return round(min(MAX_VOLUME, max(MIN_VOLUME, volume)), 3)
+
+
+def analyze_file(path):
+    """Decode a file and return its loudness and peak measurements."""
+    samples = decode_mono(path, LOUDNESS_RATE)
+    return {
+        'loudness_lufs': round(integrated_loudness(samples), 2),
+        'peak_dbfs': round(peak_dbfs(samples), 2),
+    }
+
+
+def analyze_sounds(sounds_root, sounds, workers=None, force=False):
+    """Measure every sound whose file changed since its last analysis.
+
+    Files are hashed in this process; the decoding and measuring runs on a
+    process pool. Results are written onto the Sound rows, which the caller
+    commits. Returns the list of sounds that were re-analysed.
+    """
+    pending = {}
+    for sound in sounds:
+        digest = file_hash(os.path.join(sounds_root, sound.file_path))
+        if force or sound.analysis_hash != digest or sound.loudness_lufs is None:
+            pending[sound] = digest
+
+    if not pending:
+        return []
+
+    paths = [os.path.join(sounds_root, sound.file_path) for sound in pending]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(analyze_file, paths))
+
+    for (sound, digest), measured in zip(pending.items(), results):
+        sound.loudness_lufs = measured['loudness_lufs']
+        sound.peak_dbfs = measured['peak_dbfs']
+        sound.analysis_hash = digest
+        sound.default_volume = normalised_volume(measured['loudness_lufs'])
+    return list(pending)
@@ -0,0 +1,103 @@
+# migrations.py
+"""Bring an existing database up to date with the models.
+
+db.create_all() only creates missing tables, so columns added to a model
+after a deployment never reach the live tables. upgrade_schema() adds them,
+along with any indexes declared on the models that the tables lack, and
+recreates foreign keys whose ON DELETE action differs from the model's
+(after sweeping the orphans that would stop the new constraint validating).
+SQLite cannot alter constraints in place, so there they are only reported.
+"""
+from sqlalchemy import inspect, text
+
+from deletion import sweep_orphans, sweep_until_clean
+from models import db
+
+
+def _missing_columns(inspector, table):
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    return [column for column in table.columns if column.name not in existing]
+
+
+def _ondelete(action):
+    return (action or 'NO ACTION').upper()
+
+
+def _stale_foreign_keys(inspector, table):
+    """(reflected name, model ForeignKeyConstraint) pairs whose ON DELETE differs"""
+    reflected = {(tuple(fk['constrained_columns']), fk['referred_table']): fk
+                 for fk in inspector.get_foreign_keys(table.name)}
+    stale = []
+    for constraint in table.foreign_key_constraints:
+        fk = reflected.get((tuple(constraint.column_keys), constraint.referred_table.name))
+        if fk is not None and _ondelete(fk.get('options', {}).get('ondelete')) != _ondelete(constraint.ondelete):
+            stale.append((fk['name'], constraint))
+    return stale
+
+
+def _sweep_batch():
+    counts = sweep_orphans(db.session)
+    db.session.commit()
+    return counts
+
+
+def upgrade_foreign_keys(inspector):
+    """Recreate foreign keys whose ON DELETE action differs from the models"""
+    stale = [(table, name, constraint) for table in db.metadata.sorted_tables
+             if inspector.has_table(table.name)
+             for name, constraint in _stale_foreign_keys(inspector, table)]
+    if not stale:
+        return []
+    if db.engine.dialect.name == 'sqlite' or any(name is None for _, name, _ in stale):
+        print(f"⚠ Cannot alter foreign keys here: {', '.join(f'{t.name}.{c.column_keys[0]}' for t, _, c in stale)}")
+        return []
+
+    sweep_until_clean(_sweep_batch, pause=0)
+    upgraded = []
+    for table, name, constraint in stale:
+        columns = ', '.join(constraint.column_keys)
+        referred = ', '.join(element.column.name for element in constraint.elements)
+        new_name = f'fk_{table.name}_{constraint.column_keys[0]}'
+        db.session.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT {name}'))
+        db.session.execute(text(
+            f'ALTER TABLE {table.name} ADD CONSTRAINT {new_name} FOREIGN KEY ({columns}) '
+            f'REFERENCES {constraint.referred_table.name} ({referred}) ON DELETE {_ondelete(constraint.ondelete)}'))
+        upgraded.append(new_name)
+    db.session.commit()
+    print(f"✓ Recreated foreign keys: {', '.join(upgraded)}")
+    return upgraded
+
+
+def upgrade_schema():
+    """Add model columns that are missing from existing tables"""
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        for column in _missing_columns(inspector, table):
+            if not column.nullable and column.server_default is None:
+                print(f"⚠ Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD {column.name} {column.type.compile(dialect=dialect)}'
+            db.session.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+
+    if added:
+        db.session.commit()
+        print(f"✓ Added columns: {', '.join(added)}")
+
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    if created:
+        print(f"✓ Created indexes: {', '.join(created)}")
+    return added + created + upgrade_foreign_keys(inspector)
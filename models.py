@@ -2,18 +2,20 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # --- DATA MODELS ---
 
 playlist_sound_association = db.Table('playlist_sound',
-    db.Column('playlist_id', db.Integer, db.ForeignKey('playlists.id'), primary_key=True),
-    db.Column('sound_id', db.Integer, db.ForeignKey('sounds.id'), primary_key=True)
+    db.Column('playlist_id', db.Integer, db.ForeignKey('playlists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('sound_id', db.Integer, db.ForeignKey('sounds.id', ondelete='CASCADE'), primary_key=True)
 )
 
 sound_group_association = db.Table('sound_group',
-    db.Column('sound_id', db.Integer, db.ForeignKey('sounds.id'), primary_key=True),
-    db.Column('group_id', db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    db.Column('sound_id', db.Integer, db.ForeignKey('sounds.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('group_id', db.Integer, db.ForeignKey('groups.id', ondelete='CASCADE'), primary_key=True)
 )
 
 class User(db.Model):
@@ -41,6 +43,17 @@ class Sound(db.Model):
     default_volume = db.Column(db.Float, default=0.5)
     category = db.Column(db.String(50))
     is_premium = db.Column(db.Boolean, default=False)
+    # Pre-crossfaded loop asset relative to static/sounds, set by `flask analyze-loops`
+    loop_path = db.Column(db.String(255), nullable=True)
+    # Loudness analysis from `flask analyze-loudness`, reused until the file hash changes
+    loudness_lufs = db.Column(db.Float, nullable=True)
+    peak_dbfs = db.Column(db.Float, nullable=True)
+    analysis_hash = db.Column(db.String(64), nullable=True)
+    # Encoded min/max peaks from `flask build-peaks`; deferred so listings never load it
+    peaks = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    peaks_version = db.Column(db.String(16), nullable=True)
+    # File hash the peaks were built from, so they are rebuilt when the audio changes
+    peaks_hash = db.Column(db.String(64), nullable=True)
     
     groups = db.relationship("Group", secondary=sound_group_association, back_populates="sounds")
     playlists = db.relationship("Playlist", secondary=playlist_sound_association, back_populates="sounds")
@@ -52,7 +65,13 @@ class Sound(db.Model):
             'display_name': self.display_name,
             'icon': self.icon,
             'file_path': f'/sounds/{self.file_path}',
+            'segments_url': f'/sounds/{self.id}/segments/index.m3u8',
+            'loop_path': f'/sounds/{self.loop_path}' if self.loop_path else None,
             'default_volume': self.default_volume,
+            'loudness_lufs': self.loudness_lufs,
+            'peak_dbfs': self.peak_dbfs,
+            'peaks_version': self.peaks_version,
+            'peaks_url': f'/api/sounds/{self.id}/peaks?v={self.peaks_version}' if self.peaks_version else None,
             'category': self.category,
             'is_premium': self.is_premium,
             'groups': [group.id for group in self.groups]
@@ -69,9 +88,34 @@ class Playlist(db.Model):
     __tablename__ = 'playlists'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'))
     playlist_icon = db.Column(db.String(255))
     sounds = db.relationship("Sound", secondary=playlist_sound_association, back_populates="playlists")
     
     # Add this relationship
-    user = db.relationship("User", backref="playlists")
\ No newline at end of file
+    user = db.relationship("User", backref="playlists")
+
+    # Keyset pagination of a user's playlists: WHERE user_id = ? AND id > ? ORDER BY id
+    __table_args__ = (db.Index('ix_playlists_user_id_id', 'user_id', 'id'),)
+
+
+class ListeningEvent(db.Model):
+    """Client play / stop / volume events, bulk-inserted by telemetry.EventBuffer"""
+    __tablename__ = 'listening_events'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    sound_id = db.Column(db.Integer, db.ForeignKey('sounds.id'), nullable=False)
+    event_type = db.Column(db.String(10), nullable=False)
+    # Volume (0-1) for volume events, seconds listened for stop events
+    value = db.Column(db.Float, nullable=True)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    received_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    __table_args__ = (db.Index('ix_listening_events_sound_id_occurred_at', 'sound_id', 'occurred_at'),)
+
+class SoundPlayCount(db.Model):
+    """Plays per sound per popularity.BUCKET_SECONDS bucket, summed across workers"""
+    __tablename__ = 'sound_play_counts'
+    sound_id = db.Column(db.Integer, db.ForeignKey('sounds.id'), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    plays = db.Column(db.Integer, nullable=False, default=0)
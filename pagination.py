@@ -0,0 +1,85 @@
+# pagination.py
+"""Keyset cursors, field projection and streamed JSON pages for list APIs.
+
+A cursor is the opaque, URL-safe encoding of the last id a client has seen;
+the next page is simply `id > cursor ORDER BY id`, which the primary key
+(or a composite index ending in id) answers without an OFFSET scan. Pages
+are written out item by item, so no full result list is ever built.
+"""
+import base64
+import json
+
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    """Bad cursor, limit or fields parameter"""
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Last id encoded in a cursor, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii'))
+    except (ValueError, UnicodeError):
+        raise PaginationError('Invalid cursor')
+
+
+def parse_limit(value, default=None):
+    """Page size from a query string value, capped at MAX_PAGE_SIZE."""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(value, allowed):
+    """Requested field names (id always included), or None for everything."""
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [name for name in fields if name != 'id']
+
+
+def project(item, fields):
+    return item if fields is None else {name: item[name] for name in fields}
+
+
+def stream_array(items, fields=None):
+    """Yield a JSON array of items one at a time."""
+    yield '['
+    for count, item in enumerate(items):
+        yield (',' if count else '') + json.dumps(project(item, fields))
+    yield ']'
+
+
+def stream_page(key, items, limit, fields=None):
+    """Yield '{"<key>": [...], "next_cursor": ...}' one item at a time.
+
+    items should yield up to limit + 1 dicts ordered by id; the extra one
+    only signals that another page exists.
+    """
+    yield '{"%s":[' % key
+    next_cursor = None
+    last_id = None
+    for count, item in enumerate(items):
+        if limit is not None and count == limit:
+            next_cursor = encode_cursor(last_id)
+            break
+        yield (',' if count else '') + json.dumps(project(item, fields))
+        last_id = item['id']
+    yield '],"next_cursor":%s}' % json.dumps(next_cursor)
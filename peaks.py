@@ -0,0 +1,94 @@
+# peaks.py
+"""Reduce sounds to fixed-resolution min/max peaks for waveform drawing.
+
+Each sound becomes a small self-describing blob:
+
+    b'P' | bits (uint8: 8 or 16) | resolution (uint16 LE) | min/max pairs
+
+The pairs are interleaved (min0, max0, min1, max1, ...) signed integers
+scaled to the full range of the sample type, so a whole group of sounds
+fits in a few kilobytes.
+"""
+import hashlib
+import struct
+
+import numpy as np
+
+from audio import decode_mono
+
+PEAKS_RESOLUTION = 512
+PEAKS_BITS = 8
+HEADER = struct.Struct('<cBH')
+BATCH_RECORD = struct.Struct('<IH')
+
+_DTYPES = {8: np.int8, 16: np.int16}
+
+
+def compute_peaks(samples, resolution=PEAKS_RESOLUTION, bits=PEAKS_BITS):
+    """Min/max pairs for `resolution` equal slices of samples, as a numpy array."""
+    dtype = _DTYPES[bits]
+    scale = np.iinfo(dtype).max
+    if len(samples) == 0:
+        return np.zeros(resolution * 2, dtype=dtype)
+
+    per_bucket = -(-len(samples) // resolution)
+    padded = np.pad(samples, (0, per_bucket * resolution - len(samples)), mode='edge')
+    buckets = padded.reshape(resolution, per_bucket)
+
+    pairs = np.empty((resolution, 2), dtype=np.float32)
+    pairs[:, 0] = buckets.min(axis=1)
+    pairs[:, 1] = buckets.max(axis=1)
+    return np.clip(np.round(pairs * scale), -scale, scale).astype(dtype).ravel()
+
+
+def encode_peaks(pairs, bits=PEAKS_BITS):
+    """Serialise a peaks array with its header."""
+    resolution = len(pairs) // 2
+    return HEADER.pack(b'P', bits, resolution) + pairs.astype(f'<i{bits // 8}').tobytes()
+
+
+def decode_peaks(blob):
+    """Parse a blob from encode_peaks back into a numpy array of pairs."""
+    marker, bits, resolution = HEADER.unpack_from(blob)
+    if marker != b'P' or bits not in _DTYPES:
+        raise ValueError('Not a peaks blob')
+    return np.frombuffer(blob, dtype=f'<i{bits // 8}', count=resolution * 2, offset=HEADER.size)
+
+
+def peaks_for_file(path, resolution=PEAKS_RESOLUTION, bits=PEAKS_BITS):
+    """Decode a sound file and return its encoded peaks blob."""
+    return encode_peaks(compute_peaks(decode_mono(path), resolution, bits), bits)
+
+
+def peaks_version(blob):
+    """Short content hash used to version peaks URLs."""
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def batch_version(versions):
+    """Version of a batched response from its (sound_id, peaks_version) pairs, in id order."""
+    return peaks_version(''.join(f'{sound_id}:{version}' for sound_id, version in versions).encode())
+
+
+def encode_batch(items):
+    """Concatenate (sound_id, blob) pairs into one response body.
+
+    Each record is uint32 sound id, uint16 blob length, then the blob.
+    """
+    parts = []
+    for sound_id, blob in items:
+        parts.append(BATCH_RECORD.pack(sound_id, len(blob)))
+        parts.append(blob)
+    return b''.join(parts)
+
+
+def decode_batch(body):
+    """Inverse of encode_batch, returning a dict of sound id to blob."""
+    result = {}
+    offset = 0
+    while offset < len(body):
+        sound_id, length = BATCH_RECORD.unpack_from(body, offset)
+        offset += BATCH_RECORD.size
+        result[sound_id] = body[offset:offset + length]
+        offset += length
+    return result
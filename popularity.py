@@ -0,0 +1,131 @@
+# popularity.py
+"""Per-sound play counters with decayed hour / day / week windows.
+
+Plays are counted in BUCKET_SECONDS buckets. Each worker adds its own plays
+to an in-memory aggregate straight away and keeps them as pending bucket
+increments; a background thread periodically adds those increments to the
+sound_play_counts table (so workers merge by plain addition) and reloads
+the aggregate from it. Window scores weight each bucket by
+exp(-age / tau), so the "hour" window is dominated by the last hour and so
+on. Scores are held relative to the load time; all of them decay by the
+same factor as time passes, so rankings never need recomputing per request.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+BUCKET_SECONDS = 600
+RETENTION_SECONDS = 8 * 24 * 3600
+FLUSH_SECONDS = 60
+WINDOWS = {'hour': 3600, 'day': 24 * 3600, 'week': 7 * 24 * 3600}
+DEFAULT_WINDOW = 'day'
+
+
+def bucket_start(timestamp):
+    """Naive UTC datetime of the bucket holding a Unix timestamp"""
+    start = timestamp - timestamp % BUCKET_SECONDS
+    return datetime.fromtimestamp(start, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(bucket):
+    return bucket.replace(tzinfo=timezone.utc).timestamp()
+
+
+class PopularityCounters:
+    """In-memory decayed scores plus increments not yet written to the DB."""
+
+    def __init__(self):
+        self.loaded_at = time.time()
+        self.scores = {window: {} for window in WINDOWS}
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        # Set once the first load has been attempted; scores are empty until then
+        self.ready = threading.Event()
+
+    def _add(self, sound_id, plays, at):
+        for window, tau in WINDOWS.items():
+            weight = plays * math.exp((at - self.loaded_at) / tau)
+            scores = self.scores[window]
+            scores[sound_id] = scores.get(sound_id, 0.0) + weight
+
+    def record(self, sound_id, at=None):
+        """Count one play now (or at a Unix timestamp)"""
+        at = time.time() if at is None else at
+        key = (sound_id, bucket_start(at))
+        with self._lock:
+            self.pending[key] = self.pending.get(key, 0) + 1
+            self._add(sound_id, 1, at)
+
+    def take_pending(self):
+        """Hand pending increments to a flush; {(sound_id, bucket): plays}"""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            return pending
+
+    def restore_pending(self, pending):
+        """Put back increments whose flush failed"""
+        with self._lock:
+            for key, plays in pending.items():
+                self.pending[key] = self.pending.get(key, 0) + plays
+
+    def load(self, rows, now=None):
+        """Replace the aggregate with (sound_id, bucket, plays) rows from the DB"""
+        now = time.time() if now is None else now
+        scores = {window: {} for window in WINDOWS}
+        for sound_id, bucket, plays in rows:
+            # Weight a bucket by its midpoint's age
+            age = now - (_timestamp(bucket) + BUCKET_SECONDS / 2)
+            for window, tau in WINDOWS.items():
+                window_scores = scores[window]
+                window_scores[sound_id] = window_scores.get(sound_id, 0.0) + plays * math.exp(-age / tau)
+        with self._lock:
+            self.loaded_at = now
+            self.scores = scores
+            # Plays recorded since the flush are not in the rows yet
+            for (sound_id, bucket), plays in self.pending.items():
+                self._add(sound_id, plays, _timestamp(bucket) + BUCKET_SECONDS / 2)
+
+    def score(self, sound_id, window=DEFAULT_WINDOW, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            raw = self.scores[window].get(sound_id, 0.0)
+            return raw * math.exp(-(now - self.loaded_at) / WINDOWS[window])
+
+    def top(self, window=DEFAULT_WINDOW, limit=10, now=None):
+        """[(sound_id, score)] highest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            decay = math.exp(-(now - self.loaded_at) / WINDOWS[window])
+            ranked = sorted(self.scores[window].items(), key=lambda item: (-item[1], item[0]))
+        return [(sound_id, raw * decay) for sound_id, raw in ranked[:limit] if raw > 0]
+
+    def ranking(self, window=DEFAULT_WINDOW):
+        """{sound_id: raw score}; comparable within one call only"""
+        with self._lock:
+            return dict(self.scores[window])
+
+    def ensure_started(self, flush, interval=FLUSH_SECONDS):
+        """Start a thread that loads via flush() at once, then every interval seconds.
+
+        Returns without waiting for the first load, so a request never
+        blocks on the database; until it lands, scores are empty.
+        """
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    flush()
+                except Exception as e:
+                    print(f"⚠ Popularity flush failed: {e}")
+                self.ready.set()
+                time.sleep(interval)
+
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=run, name='popularity-flusher', daemon=True)
+                self._thread.start()
@@ -0,0 +1,75 @@
+# precache.py
+"""Build the versioned precache manifest the service worker installs from.
+
+The manifest lists every shell asset (CSS, JS, icons, sprite sheets) with a
+content revision, plus the sound URLs the worker may cache on first play.
+Its version is a hash over all of that, so any changed asset or catalog
+entry makes clients drop their stale caches.
+"""
+import hashlib
+import json
+import os
+import threading
+
+SHELL_FILES = ['style.css', 'script.js']
+ICON_DIR = 'icons'
+BUILD_DIR = 'build'
+SPRITE_PREFIX = 'icons-sprite'
+ICON_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.svg')
+SOUND_CACHE_BYTES = 150 * 1024 * 1024
+
+_cache = {'signature': None, 'assets': None}
+_lock = threading.Lock()
+
+
+def _shell_paths(static_root):
+    paths = [name for name in SHELL_FILES if os.path.isfile(os.path.join(static_root, name))]
+    for directory, prefix in ((ICON_DIR, ''), (BUILD_DIR, SPRITE_PREFIX)):
+        root = os.path.join(static_root, directory)
+        if os.path.isdir(root):
+            for name in sorted(os.listdir(root)):
+                if name.startswith(prefix) and name.lower().endswith(ICON_EXTENSIONS):
+                    paths.append(f'{directory}/{name}')
+    return paths
+
+
+def _revision(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def shell_assets(static_root):
+    """(url, revision) for every shell asset, re-hashed only when files change."""
+    paths = _shell_paths(static_root)
+    signature = tuple(
+        (path, stat.st_mtime_ns, stat.st_size)
+        for path in paths
+        for stat in [os.stat(os.path.join(static_root, path))]
+    )
+    with _lock:
+        if _cache['signature'] == signature:
+            return _cache['assets']
+
+    assets = [(f'/static/{path}', _revision(os.path.join(static_root, path))) for path in paths]
+    with _lock:
+        _cache['signature'] = signature
+        _cache['assets'] = assets
+    return assets
+
+
+def build_manifest(static_root, sound_urls):
+    """Manifest dict for the service worker."""
+    precache = [{'url': url, 'revision': revision} for url, revision in shell_assets(static_root)]
+    sounds = sorted(set(sound_urls))
+    version = hashlib.sha256(
+        json.dumps([precache, sounds], sort_keys=True).encode('utf-8')
+    ).hexdigest()[:16]
+    return {
+        'version': version,
+        'precache': precache,
+        'sounds': sounds,
+        'sound_cache_bytes': SOUND_CACHE_BYTES,
+    }
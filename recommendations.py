@@ -0,0 +1,168 @@
+# recommendations.py
+""""Often mixed with" recommendations from playlist co-occurrence.
+
+A dense sound-by-sound matrix counts how many playlists contain each pair
+of sounds (the diagonal is each sound's playlist count). It is built once
+from playlist_sound with chunked NumPy matrix products and then kept up to
+date by the add-sound / remove-sound / delete-playlist routes, which only
+touch one row and column per change. Top-k lists are cached per sound and
+dropped when their row changes.
+
+Each worker process keeps its own copy, so the matrix is also rebuilt
+after REBUILD_SECONDS to pick up writes made by other workers.
+"""
+import threading
+import time
+
+import numpy as np
+
+REBUILD_SECONDS = 3600
+BUILD_CHUNK_PLAYLISTS = 4096
+DEFAULT_TOP_K = 5
+
+_state = {'matrix': None}
+_lock = threading.Lock()
+
+
+class CooccurrenceMatrix:
+    """Co-occurrence counts keyed by sound id."""
+
+    def __init__(self, sound_ids=()):
+        self.index = {}
+        self.ids = []
+        self.counts = np.zeros((0, 0), dtype=np.int32)
+        self.built_at = time.monotonic()
+        self._top = {}
+        self._ensure(sound_ids)
+
+    @classmethod
+    def from_pairs(cls, playlist_ids, sound_ids):
+        """Build from parallel arrays of playlist_sound rows."""
+        playlist_ids = np.asarray(playlist_ids, dtype=np.int64)
+        sound_ids = np.asarray(sound_ids, dtype=np.int64)
+        unique_sounds, columns = np.unique(sound_ids, return_inverse=True)
+        matrix = cls(unique_sounds.tolist())
+        if not len(sound_ids):
+            return matrix
+
+        _, rows = np.unique(playlist_ids, return_inverse=True)
+        n_playlists, n_sounds = rows.max() + 1, len(unique_sounds)
+        # Incidence blocks (playlists x sounds); counts = sum of block.T @ block
+        for start in range(0, n_playlists, BUILD_CHUNK_PLAYLISTS):
+            mask = (rows >= start) & (rows < start + BUILD_CHUNK_PLAYLISTS)
+            block = np.zeros((min(BUILD_CHUNK_PLAYLISTS, n_playlists - start), n_sounds), dtype=np.float32)
+            block[rows[mask] - start, columns[mask]] = 1.0
+            matrix.counts += (block.T @ block).astype(np.int32)
+        return matrix
+
+    def _ensure(self, sound_ids):
+        new = [sound_id for sound_id in sound_ids if sound_id not in self.index]
+        if not new:
+            return
+        for sound_id in new:
+            self.index[sound_id] = len(self.ids)
+            self.ids.append(sound_id)
+        grow = len(self.index) - self.counts.shape[0]
+        self.counts = np.pad(self.counts, ((0, grow), (0, grow)))
+
+    def _update(self, sound_id, other_ids, delta):
+        self._ensure([sound_id, *other_ids])
+        row = self.index[sound_id]
+        others = np.fromiter((self.index[other] for other in other_ids if other != sound_id), dtype=np.intp)
+        self.counts[row, others] += delta
+        self.counts[others, row] += delta
+        self.counts[row, row] += delta
+        # sound_id's playlist count feeds the score of every row it appears in
+        for changed in np.flatnonzero(self.counts[row]):
+            self._top.pop(self.ids[changed], None)
+        for changed in (sound_id, *other_ids):
+            self._top.pop(changed, None)
+
+    def add(self, sound_id, other_ids):
+        """sound_id was added to a playlist already holding other_ids."""
+        self._update(sound_id, list(other_ids), 1)
+
+    def remove(self, sound_id, other_ids):
+        """sound_id was removed from a playlist still holding other_ids."""
+        self._update(sound_id, list(other_ids), -1)
+
+    def remove_playlist(self, sound_ids):
+        """A playlist holding sound_ids was deleted."""
+        remaining = list(sound_ids)
+        while remaining:
+            sound_id = remaining.pop()
+            self.remove(sound_id, remaining)
+
+    def top_k(self, sound_id, k=DEFAULT_TOP_K):
+        """[(other_id, count, score)] most often mixed with sound_id.
+
+        score is the cosine of the two sounds' playlist vectors, so a
+        popular sound does not top every list just by being everywhere.
+        """
+        cached = self._top.get(sound_id)
+        if cached is not None and cached[0] >= k:
+            return cached[1][:k]
+        row = self.index.get(sound_id)
+        if row is None:
+            return []
+
+        counts = self.counts[row].astype(np.float64)
+        counts[row] = 0
+        candidates = np.flatnonzero(counts > 0)
+        if not len(candidates):
+            self._top[sound_id] = (k, [])
+            return []
+        diagonal = np.diag(self.counts).astype(np.float64)
+        scores = counts[candidates] / np.sqrt(diagonal[row] * diagonal[candidates])
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k)[:k]
+            candidates, scores = candidates[best], scores[best]
+        order = np.lexsort((-counts[candidates], -scores))
+
+        top = [(self.ids[candidates[i]], int(counts[candidates[i]]), round(float(scores[i]), 4)) for i in order]
+        self._top[sound_id] = (k, top)
+        return top
+
+    def is_expired(self):
+        return time.monotonic() - self.built_at > REBUILD_SECONDS
+
+
+# --- SHARED INSTANCE ---
+
+def get_matrix(load_pairs):
+    """Current matrix, building it from load_pairs() -> (playlist_ids, sound_ids)."""
+    matrix = _state['matrix']
+    if matrix is not None and not matrix.is_expired():
+        return matrix
+    with _lock:
+        matrix = _state['matrix']
+        if matrix is None or matrix.is_expired():
+            matrix = CooccurrenceMatrix.from_pairs(*load_pairs())
+            _state['matrix'] = matrix
+        return matrix
+
+
+def _apply(update):
+    # Without a loaded matrix there is nothing to patch; the next build reads the change
+    with _lock:
+        matrix = _state['matrix']
+        if matrix is not None:
+            update(matrix)
+
+
+def record_added(sound_id, other_ids):
+    _apply(lambda matrix: matrix.add(sound_id, other_ids))
+
+
+def record_removed(sound_id, other_ids):
+    _apply(lambda matrix: matrix.remove(sound_id, other_ids))
+
+
+def record_playlist_deleted(sound_ids):
+    _apply(lambda matrix: matrix.remove_playlist(sound_ids))
+
+
+def top_k(sound_id, k, load_pairs):
+    matrix = get_matrix(load_pairs)
+    with _lock:
+        return matrix.top_k(sound_id, k)
@@ -0,0 +1,126 @@
+# routing.py
+"""Read-replica routing for the Flask-SQLAlchemy session.
+
+Replicas are extra engine binds named replica_1, replica_2, ... (see
+replica_binds). When there are any, init_app's hook decides for each
+request where its reads go:
+
+- GET/HEAD requests read from one replica, picked per request so a page
+  sees a single consistent replica;
+- other methods, views marked @primary_only, and users who wrote within
+  the last PIN_SECONDS (so they see their own changes despite replica lag)
+  stay on the primary.
+
+Whatever the route, flushes and INSERT/UPDATE/DELETE statements always go
+to the primary, and once a request has written, its later reads do too.
+The pin lives in the shared cache (cache.py), so it holds across workers.
+Sessions outside a request (CLI commands, flusher threads) use the primary.
+"""
+import random
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from cache import CacheError
+
+REPLICA_PREFIX = 'replica_'
+PIN_SECONDS = 10
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of replica URLs"""
+    return {f'{REPLICA_PREFIX}{number}': url.strip()
+            for number, url in enumerate((url for url in urls.split(',') if url.strip()), start=1)}
+
+
+def _replica():
+    # Kept on g rather than session.info: a streamed response's generator may
+    # run after the request's session was removed and get a fresh one
+    return g.get('db_replica') if has_app_context() else None
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the request's replica, if it has one"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = _replica()
+            if self._flushing or isinstance(clause, UpdateBase):
+                if has_app_context():
+                    g.db_wrote = True
+            elif replica is not None and not g.get('db_wrote'):
+                engine = self._db.engines.get(replica)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def primary_only(view):
+    """Keep every query of a view on the primary (e.g. GET routes that write)"""
+    view.primary_only = True
+    return view
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside this block (e.g. to build shared caches)"""
+    replica = g.pop('db_replica', None) if has_app_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.db_replica = replica
+
+
+def _pin_key(user_id):
+    return f'calmflow:pin:{user_id}'
+
+
+def pin_to_primary(backend, user_id, seconds=PIN_SECONDS):
+    try:
+        backend.set(_pin_key(user_id), repr(time.time() + seconds), ttl=int(seconds) + 1)
+    except CacheError as e:
+        print(f"⚠ Could not pin user {user_id} to the primary: {e}")
+
+
+def is_pinned(backend, user_id):
+    try:
+        until = backend.get(_pin_key(user_id))
+    except CacheError:
+        # Without the shared pin, reading the primary is the safe choice
+        return True
+    return until is not None and float(until) > time.time()
+
+
+def init_app(app, db, backend):
+    """Register the per-request routing hooks, if any replicas are configured"""
+    replicas = sorted(key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith(REPLICA_PREFIX))
+    if not replicas:
+        # Nothing to route; leave the session untouched so responses don't Vary: Cookie
+        return
+
+    @app.before_request
+    def route_reads():
+        if request.method not in SAFE_METHODS:
+            return
+        view = app.view_functions.get(request.endpoint)
+        if getattr(view, 'primary_only', False):
+            return
+        user_id = flask_session.get('user_id')
+        if user_id is not None and is_pinned(backend, user_id):
+            return
+        g.db_replica = random.choice(replicas)
+
+    @app.after_request
+    def pin_writers(response):
+        wrote = request.method not in SAFE_METHODS or g.get('db_wrote')
+        if not wrote or response.status_code >= 400:
+            return response
+        user_id = flask_session.get('user_id')
+        if user_id is not None:
+            pin_to_primary(backend, user_id, app.config.get('PRIMARY_PIN_SECONDS', PIN_SECONDS))
+        return response
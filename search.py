@@ -0,0 +1,129 @@
+# search.py
+"""In-memory search and filter index over a catalog snapshot.
+
+Every sound gets a bit position (its index in the snapshot). Text search
+uses trigram postings for terms of three or more characters and word-prefix
+postings for shorter ones; groups, categories and the premium flag are
+membership bitsets. All postings are Python ints used as bitsets, so a
+query is a handful of ANDs and never touches the database.
+"""
+import re
+import threading
+
+PREFIX_LENGTHS = (1, 2)
+TERM_CACHE_SIZE = 1024
+SEARCH_FIELDS = ('name', 'display_name')
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+_cache = {'version': None, 'index': None}
+_lock = threading.Lock()
+
+
+def _normalise(text):
+    return ' '.join(_WORD.findall((text or '').lower()))
+
+
+def _trigrams(term):
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _bits(bitset):
+    """Positions of the set bits, lowest first."""
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class SearchIndex:
+    """Postings for one list of serialised sounds."""
+
+    def __init__(self, sounds):
+        self.sounds = sounds
+        self.all = (1 << len(sounds)) - 1
+        self.trigrams = {}
+        self.prefixes = {}
+        self.groups = {}
+        self.categories = {}
+        self.premium = 0
+        self.texts = []
+        self._term_cache = {}
+
+        for position, sound in enumerate(sounds):
+            bit = 1 << position
+            text = ' '.join(_normalise(sound.get(field)) for field in SEARCH_FIELDS)
+            self.texts.append(text)
+            for word in text.split():
+                for trigram in _trigrams(word):
+                    self.trigrams[trigram] = self.trigrams.get(trigram, 0) | bit
+                for length in PREFIX_LENGTHS:
+                    if len(word) >= length:
+                        prefix = word[:length]
+                        self.prefixes[prefix] = self.prefixes.get(prefix, 0) | bit
+            for group_id in sound['groups']:
+                self.groups[group_id] = self.groups.get(group_id, 0) | bit
+            category = (sound.get('category') or '').lower()
+            if category:
+                self.categories[category] = self.categories.get(category, 0) | bit
+            if sound['is_premium']:
+                self.premium |= bit
+
+    def _term_bits(self, term):
+        if len(term) <= max(PREFIX_LENGTHS):
+            return self.prefixes.get(term, 0)
+        if len(term) == 3:
+            return self.trigrams.get(term, 0)
+
+        matches = self._term_cache.get(term)
+        if matches is not None:
+            return matches
+        candidates = self.all
+        for trigram in _trigrams(term):
+            candidates &= self.trigrams.get(trigram, 0)
+            if not candidates:
+                break
+        # Trigrams can come from different parts of a word; confirm the substring
+        matches = 0
+        for position in _bits(candidates):
+            if term in self.texts[position]:
+                matches |= 1 << position
+        if len(self._term_cache) >= TERM_CACHE_SIZE:
+            self._term_cache.clear()
+        self._term_cache[term] = matches
+        return matches
+
+    def match(self, query=None, group=None, category=None, premium=None):
+        """Bitset of sounds matching every given filter."""
+        result = self.all
+        if group is not None:
+            result &= self.groups.get(group, 0)
+        if category:
+            result &= self.categories.get(category.lower(), 0)
+        if premium is not None:
+            result &= self.premium if premium else self.all & ~self.premium
+        for term in _normalise(query).split():
+            if not result:
+                break
+            result &= self._term_bits(term)
+        return result
+
+    def search(self, limit=None, **filters):
+        """Matching sounds in catalog order, and the total match count."""
+        result = self.match(**filters)
+        total = bin(result).count('1')
+        sounds = []
+        for position in _bits(result):
+            if limit is not None and len(sounds) >= limit:
+                break
+            sounds.append(self.sounds[position])
+        return sounds, total
+
+
+def get_search_index(catalog):
+    """Index for a catalog snapshot, rebuilt only when its version changes."""
+    with _lock:
+        if _cache['version'] != catalog.version:
+            _cache['index'] = SearchIndex(catalog.sounds)
+            _cache['version'] = catalog.version
+        return _cache['index']
@@ -0,0 +1,213 @@
+# segments.py
+"""Split sound files into frame-aligned MP3 segments plus an HLS playlist.
+
+Segments are cut on MPEG audio frame boundaries, so every chunk is a valid
+MP3 stream on its own and can be fetched and decoded independently. The
+first segment is kept short so playback can start after one small request.
+"""
+import os
+import shutil
+import threading
+
+SEGMENTS_DIR_NAME = 'segments'
+MANIFEST_NAME = 'index.m3u8'
+
+FIRST_SEGMENT_SECONDS = 1.0
+SEGMENT_SECONDS = 4.0
+
+# Bitrates in kbps, indexed by [version_is_mpeg1][layer][bitrate_index]
+_BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+
+# Sample rates in Hz, indexed by version bits (0 = MPEG2.5, 2 = MPEG2, 3 = MPEG1)
+_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class SegmentError(Exception):
+    """Raised when a file cannot be parsed as an MPEG audio stream."""
+
+
+def _parse_frame_header(data, pos):
+    """Return (frame_length, samples, sample_rate) for the header at pos, or None."""
+    if pos + 4 > len(data):
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[is_mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or is_mpeg1:
+        samples = 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    return length, samples, sample_rate
+
+
+def _skip_id3v2(data):
+    """Return the offset of the first byte after any leading ID3v2 tag."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_info_frame(data, pos, length):
+    """True if the frame is a Xing/Info/VBRI header frame rather than audio."""
+    frame = data[pos:pos + length]
+    return b'Xing' in frame[:64] or b'Info' in frame[:64] or b'VBRI' in frame[:64]
+
+
+def scan_frames(data):
+    """Return a list of (offset, length, duration_seconds) for each audio frame."""
+    pos = _skip_id3v2(data)
+    end = len(data)
+    if data[-128:-125] == b'TAG':
+        end -= 128
+
+    frames = []
+    while pos < end:
+        header = _parse_frame_header(data, pos)
+        if header is None or pos + header[0] > end:
+            # Resynchronise on the next candidate sync word
+            nxt = data.find(b'\xff', pos + 1, end)
+            if nxt == -1:
+                break
+            pos = nxt
+            continue
+
+        length, samples, sample_rate = header
+        if not frames and _is_info_frame(data, pos, length):
+            pos += length
+            continue
+        frames.append((pos, length, samples / sample_rate))
+        pos += length
+
+    if not frames:
+        raise SegmentError('No MPEG audio frames found')
+    return frames
+
+
+def plan_segments(frames, first_seconds=FIRST_SEGMENT_SECONDS, seconds=SEGMENT_SECONDS):
+    """Group frames into segments; returns a list of (start, end, duration) byte ranges."""
+    segments = []
+    start = frames[0][0]
+    duration = 0.0
+    target = first_seconds
+    for offset, length, frame_duration in frames:
+        duration += frame_duration
+        if duration >= target:
+            segments.append((start, offset + length, duration))
+            start = offset + length
+            duration = 0.0
+            target = seconds
+    if duration > 0:
+        segments.append((start, frames[-1][0] + frames[-1][1], duration))
+    return segments
+
+
+def render_manifest(durations, segment_url='{index}.mp3'):
+    """Build an HLS VOD playlist for segments with the given durations."""
+    target = max(1, int(max(durations) + 0.999))
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        f'#EXT-X-TARGETDURATION:{target}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+    ]
+    for index, duration in enumerate(durations):
+        lines.append(f'#EXTINF:{duration:.3f},')
+        lines.append(segment_url.format(index=index))
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def segment_dir(static_root, file_path):
+    """Directory holding the cached segments for a sound's file_path."""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(static_root, SEGMENTS_DIR_NAME, stem)
+
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def ensure_segments(static_root, file_path):
+    """Segment a sound once and return its cache directory.
+
+    The cache is rebuilt when the source file is newer than the manifest.
+    Segments are written to a scratch directory and swapped in, so readers
+    never see a half-written set.
+    """
+    source = os.path.join(static_root, 'sounds', file_path)
+    target = segment_dir(static_root, file_path)
+    manifest = os.path.join(target, MANIFEST_NAME)
+
+    def is_fresh():
+        return (os.path.exists(manifest)
+                and os.path.getmtime(manifest) >= os.path.getmtime(source))
+
+    if is_fresh():
+        return target
+
+    with _lock_for(target):
+        if is_fresh():
+            return target
+
+        with open(source, 'rb') as f:
+            data = f.read()
+        segments = plan_segments(scan_frames(data))
+
+        scratch = f'{target}.tmp-{os.getpid()}-{threading.get_ident()}'
+        shutil.rmtree(scratch, ignore_errors=True)
+        os.makedirs(scratch)
+        for index, (start, end, _) in enumerate(segments):
+            with open(os.path.join(scratch, f'{index}.mp3'), 'wb') as f:
+                f.write(data[start:end])
+        with open(os.path.join(scratch, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            f.write(render_manifest([duration for _, _, duration in segments]))
+
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(scratch, target)
+
+    return target
@@ -0,0 +1,243 @@
+# soundsync.py
+"""Keep the sounds table in step with the files in static/sounds.
+
+scan_sound_files() lists the audio files (top level only; loops/ and other
+generated folders are ignored) with the fields a Sound row for each should
+have. Fields come from an optional sidecar next to the audio file,
+<stem>.json, holding any of SIDECAR_FIELDS; anything it leaves out is
+derived from the file name. plan_changes() diffs that against the current
+rows: new files become inserts, and existing rows only change where a
+sidecar says so (or their icon file has gone and a matching one exists),
+so curated seed data is never overwritten by derived defaults.
+
+DirectoryWatcher calls back after files change, using inotify where the
+kernel provides it and polling directory listings otherwise.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import threading
+import time
+
+SOUND_EXTENSIONS = ('.mp3',)
+ICON_EXTENSIONS = ('.png', '.webp', '.jpg')
+DEFAULT_ICON = 'static/icons/volume.png'
+SIDECAR_FIELDS = ('name', 'display_name', 'icon', 'category', 'is_premium', 'default_volume', 'groups')
+NAME_LENGTH = 50
+
+DEBOUNCE_SECONDS = 1.0
+POLL_SECONDS = 2.0
+
+# inotify(7) event bits
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MODIFY
+
+
+class SidecarError(ValueError):
+    """A <stem>.json file that cannot be used"""
+
+
+def _list_files(directory, extensions):
+    try:
+        return sorted(entry.name for entry in os.scandir(directory)
+                      if entry.is_file() and entry.name.lower().endswith(extensions))
+    except FileNotFoundError:
+        return []
+
+
+def derived_fields(file_name, icons):
+    """Row fields for an audio file with no sidecar"""
+    stem = os.path.splitext(file_name)[0]
+    icon = next((f'static/icons/{candidate}' for candidate in icons
+                 if os.path.splitext(candidate)[0].lower() == stem.lower()), DEFAULT_ICON)
+    return {
+        'name': re.sub(r'[^a-z0-9]+', '_', stem.lower()).strip('_')[:NAME_LENGTH],
+        'display_name': re.sub(r'[_\-]+', ' ', stem).strip().title()[:NAME_LENGTH],
+        'icon': icon,
+        'file_path': file_name,
+        'category': None,
+        'is_premium': False,
+        'default_volume': 0.5,
+        'groups': [],
+    }
+
+
+def read_sidecar(path):
+    """Validated sidecar fields, {} if there is no sidecar"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        raise SidecarError(f'{os.path.basename(path)}: {e}') from e
+    if not isinstance(data, dict):
+        raise SidecarError(f'{os.path.basename(path)}: expected an object')
+
+    unknown = set(data) - set(SIDECAR_FIELDS)
+    if unknown:
+        raise SidecarError(f"{os.path.basename(path)}: unknown fields {', '.join(sorted(unknown))}")
+    for field in ('name', 'display_name', 'icon', 'category'):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, str) or not value or
+                                  (field != 'icon' and len(value) > NAME_LENGTH)):
+            raise SidecarError(f'{os.path.basename(path)}: invalid {field}')
+    if 'is_premium' in data and not isinstance(data['is_premium'], bool):
+        raise SidecarError(f'{os.path.basename(path)}: is_premium must be true or false')
+    volume = data.get('default_volume')
+    if volume is not None and (isinstance(volume, bool) or not isinstance(volume, (int, float))
+                               or not 0 <= volume <= 1):
+        raise SidecarError(f'{os.path.basename(path)}: default_volume must be between 0 and 1')
+    groups = data.get('groups')
+    if groups is not None:
+        if not isinstance(groups, list) or not all(isinstance(group, str) for group in groups):
+            raise SidecarError(f'{os.path.basename(path)}: groups must be a list of group names')
+        data['groups'] = sorted(set(groups))
+    return data
+
+
+def scan_sound_files(static_root):
+    """({file_path: {'fields': {...}, 'explicit': set of sidecar fields}}, icon names, errors)"""
+    sounds_dir = os.path.join(static_root, 'sounds')
+    icons = _list_files(os.path.join(static_root, 'icons'), ICON_EXTENSIONS)
+    files, errors = {}, []
+    for file_name in _list_files(sounds_dir, SOUND_EXTENSIONS):
+        try:
+            sidecar = read_sidecar(os.path.join(sounds_dir, os.path.splitext(file_name)[0] + '.json'))
+        except SidecarError as e:
+            errors.append(str(e))
+            continue
+        fields = dict(derived_fields(file_name, icons), **sidecar)
+        files[file_name] = {'fields': fields, 'explicit': set(sidecar)}
+    return files, set(icons), errors
+
+
+def plan_changes(files, rows, icons):
+    """Diff scanned files against existing rows.
+
+    rows maps file_path to that row's fields (groups as sorted names).
+    Returns {'add': [fields], 'update': [(file_path, changed fields)],
+    'missing': [file_path], 'skipped': [reason]}.
+    """
+    plan = {'add': [], 'update': [], 'missing': sorted(set(rows) - set(files)), 'skipped': []}
+    taken = {row['name']: file_path for file_path, row in rows.items()}
+
+    for file_path, scanned in files.items():
+        fields, explicit = scanned['fields'], scanned['explicit']
+        row = rows.get(file_path)
+        if row is None:
+            if fields['name'] in taken:
+                plan['skipped'].append(f"{file_path}: name '{fields['name']}' already used by {taken[fields['name']]}")
+                continue
+            taken[fields['name']] = file_path
+            plan['add'].append(fields)
+            continue
+
+        changed = {field: fields[field] for field in explicit if row.get(field) != fields[field]}
+        icon_name = row['icon'].rsplit('/', 1)[-1]
+        if 'icon' not in explicit and icon_name not in icons and fields['icon'] != DEFAULT_ICON:
+            changed['icon'] = fields['icon']
+        new_name = changed.get('name')
+        if new_name is not None and taken.get(new_name, file_path) != file_path:
+            plan['skipped'].append(f"{file_path}: name '{new_name}' already used by {taken[new_name]}")
+            continue
+        if changed:
+            plan['update'].append((file_path, changed))
+    return plan
+
+
+# --- WATCHER ---
+
+def _inotify_fd(paths):
+    """inotify descriptor watching paths, or None where unavailable"""
+    if not hasattr(os, 'O_CLOEXEC'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for path in paths:
+        if libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+
+class DirectoryWatcher:
+    """Calls on_change() once a burst of changes under paths has settled"""
+
+    def __init__(self, paths, on_change, debounce_seconds=DEBOUNCE_SECONDS,
+                 poll_seconds=POLL_SECONDS, use_inotify=True):
+        self.paths = [path for path in paths if os.path.isdir(path)]
+        self.on_change = on_change
+        self.debounce_seconds = debounce_seconds
+        self.poll_seconds = poll_seconds
+        self._fd = _inotify_fd(self.paths) if use_inotify else None
+        self.mode = 'inotify' if self._fd is not None else 'polling'
+        self._listing = self._list()
+
+    def _list(self):
+        listing = {}
+        for path in self.paths:
+            try:
+                for entry in os.scandir(path):
+                    if entry.is_file():
+                        stat = entry.stat()
+                        listing[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                pass
+        return listing
+
+    def _wait(self, timeout):
+        """True if anything changed within timeout seconds"""
+        if self._fd is not None:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if readable:
+                # Contents do not matter: any event means "rescan"
+                os.read(self._fd, 64 * 1024)
+                return True
+            return False
+        deadline = time.monotonic() + timeout
+        while True:
+            listing = self._list()
+            if listing != self._listing:
+                self._listing = listing
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_seconds, remaining))
+
+    def run(self, stop=None):
+        """Block, calling on_change after each settled burst, until stop is set"""
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                if not self._wait(1.0):
+                    continue
+                while not stop.is_set() and self._wait(self.debounce_seconds):
+                    pass
+                if not stop.is_set():
+                    try:
+                        self.on_change()
+                    except Exception as e:
+                        print(f"⚠ Sound sync failed: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -26,6 +26,26 @@ class SoundManager {
       "periwinkle.png",
     ];
 
+    // Shared Web Audio engine; falls back to one <audio> per sound when
+    // unsupported or when localStorage "audioEngine" is set to "element"
+    this.audioEngine = null;
+    try {
+      if (
+        AudioEngine.isSupported() &&
+        localStorage.getItem("audioEngine") !== "element"
+      ) {
+        this.audioEngine = new AudioEngine();
+      }
+    } catch (e) {
+      console.log("Web Audio unavailable, using audio elements:", e);
+    }
+
+    // Batched play / stop / volume events for /api/telemetry/events
+    this.telemetry = new ListeningTelemetry();
+    // Cross-device mix sync (logged-in users only); set up in init()
+    this.mixSync = null;
+    this.soundNamesById = new Map();
+
     // For delete confirmation modal
     this.pendingDeletePlaylistId = null;
     this.pendingDeletePlaylistName = null;
@@ -65,6 +85,11 @@ class SoundManager {
       this.loadUserPlaylists();
       this.setupCreatePlaylistButton();
 
+      // Mirror this mix on the user's other devices
+      if (this.isUserLoggedIn && window.EventSource) {
+        this.mixSync = new MixSync(this);
+      }
+
       console.log("✅ SoundManager initialized successfully");
 
       // Auto-scroll to show user playlists
@@ -908,11 +933,15 @@ class SoundManager {
     const soundContainer = button.closest(".sound-button-container");
     const soundName = soundInfo.name;
 
-    const audio = new Audio(soundInfo.file_path);
+    // Prefer the short pre-crossfaded loop when the server has one
+    const audio = this.audioEngine
+      ? this.audioEngine.createSound(soundInfo)
+      : new Audio(soundInfo.loop_path || soundInfo.file_path);
     audio.loop = true;
     audio.volume = soundInfo.default_volume || 0.5;
 
     this.sounds.set(soundName, audio);
+    this.soundNamesById.set(soundInfo.id, soundName);
 
     button.addEventListener("click", () => {
       if (
@@ -976,16 +1005,31 @@ class SoundManager {
         audio.volume = e.target.value / 100;
         this.updateAllVolumes();
       });
+      // "change" fires once when the user lets go, not on every step
+      volumeSlider.addEventListener("change", (e) => {
+        this.telemetry.record("volume", soundInfo.id, e.target.value / 100);
+        this.mixSync?.send("volume", soundInfo.id, e.target.value / 100);
+      });
       audio.volume = volumeSlider.value / 100;
     }
 
+    let playStartedAt = null;
     audio.addEventListener("play", () => {
+      playStartedAt = Date.now();
+      this.telemetry.record("play", soundInfo.id);
+      this.mixSync?.send("play", soundInfo.id, audio.volume);
       if (volumeControl) {
         volumeControl.classList.remove("hidden");
       }
     });
 
     audio.addEventListener("pause", () => {
+      if (playStartedAt !== null) {
+        const seconds = (Date.now() - playStartedAt) / 1000;
+        this.telemetry.record("stop", soundInfo.id, Math.round(seconds));
+        playStartedAt = null;
+      }
+      this.mixSync?.send("pause", soundInfo.id);
       if (volumeControl && !soundContainer.matches(":hover")) {
         volumeControl.classList.add("hidden");
       }
@@ -1556,16 +1600,24 @@ class SoundManager {
     if (!isLoggedIn) return;
 
     try {
-      const response = await fetch("/api/playlists");
-      if (!response.ok) {
-        if (response.status === 401) {
-          console.log("User not authenticated for playlists");
-          return;
+      let data;
+      const session = window.calmflowSession;
+      if (session && session.playlists) {
+        // Already fetched with /api/session while hydrating the page shell
+        data = { playlists: session.playlists };
+        session.playlists = null;
+      } else {
+        const response = await fetch("/api/playlists");
+        if (!response.ok) {
+          if (response.status === 401) {
+            console.log("User not authenticated for playlists");
+            return;
+          }
+          throw new Error(`Failed to load playlists: ${response.status}`);
         }
-        throw new Error(`Failed to load playlists: ${response.status}`);
+        data = await response.json();
       }
 
-      const data = await response.json();
       this.userPlaylists = data.playlists || [];
       this.renderUserPlaylists();
 
@@ -2091,6 +2143,360 @@ class SoundManager {
   }
 }
 
+// ==============================
+// LISTENING TELEMETRY
+// ==============================
+// Queues listening events and posts them in batches; the page-hide flush uses
+// sendBeacon so the last events survive navigation. When the server is busy
+// (503) the batch is kept and retried, up to a bounded backlog.
+class ListeningTelemetry {
+  constructor(url = "/api/telemetry/events") {
+    this.url = url;
+    this.queue = [];
+    this.batchSize = 50;
+    this.maxBacklog = 500;
+    this.retryAt = 0;
+    setInterval(() => this.flush(), 10000);
+    window.addEventListener("pagehide", () => this.flush(true));
+  }
+
+  record(type, soundId, value) {
+    const event = { type, sound_id: soundId, ts: Date.now() };
+    if (value !== undefined) event.value = value;
+    this.queue.push(event);
+    if (this.queue.length > this.maxBacklog) {
+      this.queue.splice(0, this.queue.length - this.maxBacklog);
+    }
+    if (this.queue.length >= this.batchSize) this.flush();
+  }
+
+  async flush(unloading = false) {
+    if (!this.queue.length || (!unloading && Date.now() < this.retryAt)) return;
+    const events = this.queue.splice(0, this.batchSize);
+    const body = JSON.stringify({ events });
+
+    if (unloading && navigator.sendBeacon) {
+      navigator.sendBeacon(this.url, new Blob([body], { type: "application/json" }));
+      return;
+    }
+    try {
+      const response = await fetch(this.url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body,
+        keepalive: unloading,
+      });
+      if (response.status === 503) {
+        const wait = parseInt(response.headers.get("Retry-After") || "5", 10);
+        this.retryAt = Date.now() + wait * 1000;
+        this.queue.unshift(...events);
+      }
+    } catch (error) {
+      this.queue.unshift(...events);
+    }
+  }
+}
+
+// ==============================
+// CROSS-DEVICE MIX SYNC
+// ==============================
+// Sends local play / pause / volume changes to /api/mix in small batches and
+// applies the deltas other devices publish on /api/mix/events. The server
+// ignores ops that change nothing, so a remote change echoed back is free.
+class MixSync {
+  constructor(soundManager) {
+    this.soundManager = soundManager;
+    this.clientId = Math.random().toString(36).slice(2, 12);
+    this.pending = new Map();
+    this.timer = null;
+    this.source = new EventSource("/api/mix/events");
+
+    ["mix.play", "mix.pause", "mix.volume"].forEach((type) => {
+      this.source.addEventListener(type, (e) => this.onMixEvent(type, e));
+    });
+    ["playlist.created", "playlist.deleted", "playlist.sound_added", "playlist.sound_removed"].forEach(
+      (type) => {
+        this.source.addEventListener(type, (e) => this.onPlaylistEvent(e));
+      }
+    );
+    this.source.addEventListener("resync", () => this.resync());
+
+    // Pick up the mix already running on another device
+    this.resync(false);
+  }
+
+  send(op, soundId, volume) {
+    const change = { op, sound_id: soundId };
+    if (volume !== undefined) change.volume = Math.round(volume * 1000) / 1000;
+    // Only the latest op per sound matters within one batch
+    this.pending.set(`${op === "volume" ? "volume" : "state"}:${soundId}`, change);
+    if (!this.timer) {
+      this.timer = setTimeout(() => this.flush(), 150);
+    }
+  }
+
+  async flush() {
+    this.timer = null;
+    const ops = Array.from(this.pending.values());
+    this.pending.clear();
+    if (!ops.length) return;
+    try {
+      await fetch("/api/mix", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "X-Client-Id": this.clientId },
+        body: JSON.stringify({ ops }),
+      });
+    } catch (error) {
+      console.error("❌ Mix sync failed:", error);
+    }
+  }
+
+  onMixEvent(type, e) {
+    const data = JSON.parse(e.data);
+    if (data.origin === this.clientId) return;
+    this.applySound(data.sound_id, type === "mix.pause" ? false : type === "mix.play" ? true : null, data.volume);
+  }
+
+  onPlaylistEvent(e) {
+    const data = JSON.parse(e.data);
+    if (data.origin === this.clientId) return;
+    // Coalesce bursts (e.g. several sounds added at once) into one reload
+    clearTimeout(this.playlistTimer);
+    this.playlistTimer = setTimeout(() => this.soundManager.loadUserPlaylists(), 300);
+  }
+
+  applySound(soundId, playing, volume) {
+    const manager = this.soundManager;
+    const soundName = manager.soundNamesById.get(soundId);
+    const audio = soundName && manager.sounds.get(soundName);
+    if (!audio) return;
+
+    if (typeof volume === "number") {
+      audio.volume = volume;
+      const slider = document.querySelector(
+        `[data-sound-name="${soundName}"] .volume-slider`
+      );
+      if (slider) slider.value = Math.round(volume * 100);
+    }
+    if (playing === true && audio.paused) {
+      // Autoplay rules may block this until the user interacts with the page
+      audio
+        .play()
+        .then(() => manager.updateButtonState(soundName, true))
+        .catch((error) => console.log(`Mix sync could not start ${soundName}:`, error));
+    } else if (playing === false && !audio.paused) {
+      audio.pause();
+      manager.updateButtonState(soundName, false);
+    }
+  }
+
+  async resync(reloadPlaylists = true) {
+    try {
+      const response = await fetch("/api/mix");
+      if (!response.ok) return;
+      const mix = await response.json();
+      Object.entries(mix.sounds).forEach(([soundId, state]) => {
+        this.applySound(parseInt(soundId), state.playing, state.volume);
+      });
+      if (reloadPlaylists) this.soundManager.loadUserPlaylists();
+    } catch (error) {
+      console.error("❌ Mix resync failed:", error);
+    }
+  }
+}
+
+// ==============================
+// WEB AUDIO ENGINE
+// ==============================
+// One AudioContext for every sound. Decoded buffers are cached by sound id
+// and evicted least-recently-used once they exceed the byte budget; sounds
+// that are playing are never evicted. Loops are sample-accurate because they
+// use AudioBufferSourceNode looping instead of element looping.
+class AudioEngine {
+  constructor(budgetBytes = 128 * 1024 * 1024) {
+    const Context = window.AudioContext || window.webkitAudioContext;
+    this.context = new Context();
+    this.master = this.context.createGain();
+    this.master.connect(this.context.destination);
+    this.budgetBytes = budgetBytes;
+    this.buffers = new Map(); // soundId -> { buffer, bytes }, in LRU order
+    this.pending = new Map(); // soundId -> Promise<AudioBuffer>
+    this.playing = new Set(); // soundIds that must stay cached
+    this.cachedBytes = 0;
+  }
+
+  static isSupported() {
+    return Boolean(window.AudioContext || window.webkitAudioContext);
+  }
+
+  createSound(soundInfo) {
+    return new WebAudioSound(this, soundInfo);
+  }
+
+  async resume() {
+    if (this.context.state === "suspended") {
+      await this.context.resume();
+    }
+  }
+
+  async getBuffer(soundId, url) {
+    const cached = this.buffers.get(soundId);
+    if (cached) {
+      // Re-insert to mark as most recently used
+      this.buffers.delete(soundId);
+      this.buffers.set(soundId, cached);
+      return cached.buffer;
+    }
+
+    if (!this.pending.has(soundId)) {
+      const load = fetch(url)
+        .then((response) => {
+          if (!response.ok) {
+            throw new Error(`Audio request failed with status ${response.status}`);
+          }
+          return response.arrayBuffer();
+        })
+        .then((data) => this.decode(data))
+        .then((buffer) => {
+          const bytes = buffer.length * buffer.numberOfChannels * 4;
+          this.buffers.set(soundId, { buffer, bytes });
+          this.cachedBytes += bytes;
+          this.evict();
+          return buffer;
+        })
+        .finally(() => this.pending.delete(soundId));
+      this.pending.set(soundId, load);
+    }
+    return this.pending.get(soundId);
+  }
+
+  decode(data) {
+    // Safari only supports the callback form of decodeAudioData
+    return new Promise((resolve, reject) => {
+      this.context.decodeAudioData(data, resolve, reject);
+    });
+  }
+
+  evict() {
+    for (const [soundId, entry] of this.buffers) {
+      if (this.cachedBytes <= this.budgetBytes) break;
+      if (this.playing.has(soundId)) continue;
+      this.buffers.delete(soundId);
+      this.cachedBytes -= entry.bytes;
+      console.log(`🧹 Evicted decoded buffer for sound ${soundId}`);
+    }
+  }
+}
+
+// Drop-in stand-in for the HTMLAudioElement properties SoundManager uses
+// (play, pause, paused, volume, currentTime, loop and play/pause events).
+class WebAudioSound extends EventTarget {
+  constructor(engine, soundInfo) {
+    super();
+    this.engine = engine;
+    this.soundId = soundInfo.id;
+    this.url = soundInfo.loop_path || soundInfo.file_path;
+    this.loop = true;
+    this.paused = true;
+    this.source = null;
+    this.startedAt = 0;
+    this.offset = 0;
+    this.playToken = 0;
+    this._volume = soundInfo.default_volume || 0.5;
+    this.gain = engine.context.createGain();
+    this.gain.gain.value = this._volume;
+    this.gain.connect(engine.master);
+  }
+
+  get volume() {
+    return this._volume;
+  }
+
+  set volume(value) {
+    this._volume = Math.min(1, Math.max(0, value));
+    // Short ramp avoids zipper noise while dragging a slider
+    this.gain.gain.setTargetAtTime(
+      this._volume,
+      this.engine.context.currentTime,
+      0.015
+    );
+  }
+
+  get currentTime() {
+    if (this.paused || !this.source) return this.offset;
+    const elapsed = this.engine.context.currentTime - this.startedAt;
+    const duration = this.source.buffer.duration;
+    return this.loop ? elapsed % duration : Math.min(elapsed, duration);
+  }
+
+  set currentTime(value) {
+    this.offset = value;
+    if (!this.paused && this.source) {
+      const buffer = this.source.buffer;
+      this.stopSource();
+      this.startSource(buffer);
+    }
+  }
+
+  async play() {
+    if (!this.paused) return;
+    const token = ++this.playToken;
+    this.paused = false;
+    this.engine.playing.add(this.soundId);
+
+    try {
+      await this.engine.resume();
+      const buffer = await this.engine.getBuffer(this.soundId, this.url);
+      // pause() was called while the buffer was loading, as <audio> does
+      if (token !== this.playToken || this.paused) {
+        throw new DOMException("play() was interrupted by pause()", "AbortError");
+      }
+      this.startSource(buffer);
+      this.dispatchEvent(new Event("play"));
+    } catch (error) {
+      if (token === this.playToken) {
+        this.paused = true;
+        this.engine.playing.delete(this.soundId);
+      }
+      throw error;
+    }
+  }
+
+  pause() {
+    if (this.paused) return;
+    this.playToken++;
+    this.offset = this.currentTime;
+    this.stopSource();
+    this.paused = true;
+    this.engine.playing.delete(this.soundId);
+    this.engine.evict();
+    this.dispatchEvent(new Event("pause"));
+  }
+
+  startSource(buffer) {
+    if (!buffer) return;
+    const source = this.engine.context.createBufferSource();
+    source.buffer = buffer;
+    source.loop = this.loop;
+    source.connect(this.gain);
+    const offset = this.offset % buffer.duration;
+    source.start(0, offset);
+    this.startedAt = this.engine.context.currentTime - offset;
+    this.source = source;
+  }
+
+  stopSource() {
+    if (!this.source) return;
+    try {
+      this.source.stop();
+    } catch (e) {
+      // Already stopped
+    }
+    this.source.disconnect();
+    this.source = null;
+  }
+}
+
 function setupToasts() {
   const toasts = document.querySelectorAll(".toast");
   toasts.forEach((toast) => {
@@ -2109,9 +2515,94 @@ function setupToasts() {
   });
 }
 
-document.addEventListener("DOMContentLoaded", () => {
+// The cacheable index shell is rendered for guests; fill in the per-user
+// parts (menu, premium access, add buttons, flash messages) before
+// SoundManager reads the page
+async function hydrateShell() {
+  const response = await fetch("/api/session", { cache: "no-store" });
+  if (!response.ok) {
+    throw new Error(`Session request failed with status ${response.status}`);
+  }
+  const session = await response.json();
+  window.calmflowSession = session;
+
+  const toastContainer = document.querySelector(".toast-container");
+  session.flashes.forEach(({ category, message }) => {
+    const toast = document.createElement("div");
+    toast.className = `toast toast-${category}`;
+    const text = document.createElement("p");
+    text.className = "toast-message";
+    text.textContent = message;
+    const close = document.createElement("button");
+    close.className = "toast-close";
+    close.innerHTML = "&times;";
+    toast.append(text, close);
+    toastContainer.appendChild(toast);
+  });
+
+  if (!session.logged_in) return;
+  document.body.dataset.userLoggedIn = "true";
+
+  const dropdown = document.getElementById("user-dropdown");
+  if (dropdown) {
+    dropdown.innerHTML = `
+      <a href="${session.links.profile}" class="dropdown-item">Profile</a>
+      <div class="dropdown-divider"></div>
+      <a href="${session.links.logout}" class="dropdown-item">Logout</a>`;
+  }
+
+  const createButton = document.getElementById("create-playlist-btn");
+  if (createButton) {
+    createButton.disabled = false;
+    createButton.classList.remove("disabled");
+    const wrapper = createButton.closest(".create-playlist-wrapper");
+    if (wrapper) wrapper.replaceWith(createButton);
+  }
+
+  document
+    .querySelectorAll(".sound-button-container.premium[data-sound-name]")
+    .forEach((container) => {
+      container.classList.remove("premium");
+      const slider = container.querySelector(".volume-slider");
+      if (slider && container.dataset.defaultVolume) {
+        slider.value = container.dataset.defaultVolume;
+      }
+    });
+
+  document
+    .querySelectorAll(".sound-button-container .add-to-playlist-btn.disabled")
+    .forEach((button) => {
+      button.classList.remove("disabled");
+      button.title = "Add to playlist";
+      const img = button.querySelector("img");
+      if (img) img.src = "/static/icons/add.png";
+    });
+}
+
+function registerServiceWorker() {
+  if (!("serviceWorker" in navigator)) return;
+  const version = document.body.dataset.swVersion;
+  if (!version) return;
+
+  // The version in the URL makes the browser install a new worker whenever
+  // the precache manifest changes
+  navigator.serviceWorker
+    .register(`/sw.js?v=${version}`, { scope: "/" })
+    .then(() => console.log("📦 Service worker registered:", version))
+    .catch((error) => console.error("❌ Service worker failed:", error));
+}
+
+document.addEventListener("DOMContentLoaded", async () => {
   console.log("🚀 Calm Flow initializing...");
+  if (document.body.dataset.shell === "true") {
+    try {
+      await hydrateShell();
+    } catch (error) {
+      console.error("❌ Error hydrating page:", error);
+    }
+  }
   window.soundManager = new SoundManager();
   setupToasts();
+  registerServiceWorker();
   console.log("🎉 Calm Flow ready!");
 });
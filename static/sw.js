@@ -0,0 +1,227 @@
+// Calm Flow service worker
+// Precaches the app shell and icons from /precache-manifest.json, caches
+// sounds the first time they are played (within a byte budget), and drops
+// stale entries whenever the manifest version changes.
+
+const MANIFEST_URL = "/precache-manifest.json";
+const SHELL_CACHE_PREFIX = "calmflow-shell-";
+const SOUND_CACHE = "calmflow-sounds";
+const DATA_CACHE = "calmflow-data";
+const META_CACHE = "calmflow-meta";
+const SOUND_INDEX_URL = "/__calmflow/sound-index";
+const MANIFEST_COPY_URL = "/__calmflow/manifest";
+
+// Pages and catalog data are fetched fresh when online, served from cache offline
+const NETWORK_FIRST_PATHS = ["/", "/api/sounds"];
+// Logging out, or submitting one of these forms, changes who is signed in,
+// so cached per-user data must go
+const SESSION_PATHS = ["/login", "/logout", "/signup", "/delete-account"];
+
+async function fetchManifest() {
+  const response = await fetch(MANIFEST_URL, { cache: "no-cache" });
+  if (!response.ok) {
+    throw new Error(`Manifest request failed with status ${response.status}`);
+  }
+  return response.json();
+}
+
+async function readJson(cacheName, url, fallback) {
+  const cache = await caches.open(cacheName);
+  const response = await cache.match(url);
+  return response ? response.json() : fallback;
+}
+
+async function writeJson(cacheName, url, value) {
+  const cache = await caches.open(cacheName);
+  await cache.put(
+    url,
+    new Response(JSON.stringify(value), {
+      headers: { "Content-Type": "application/json" },
+    })
+  );
+}
+
+async function getManifest() {
+  return readJson(META_CACHE, MANIFEST_COPY_URL, null);
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    (async () => {
+      const manifest = await fetchManifest();
+      const cache = await caches.open(SHELL_CACHE_PREFIX + manifest.version);
+      const urls = manifest.precache.map(
+        (entry) => `${entry.url}?v=${entry.revision}`
+      );
+      // Fetch by revision so a stale HTTP cache can never be precached
+      await Promise.all(
+        urls.map(async (url, i) => {
+          const response = await fetch(url, { cache: "no-cache" });
+          if (response.ok) {
+            await cache.put(manifest.precache[i].url, response);
+          }
+        })
+      );
+      await writeJson(META_CACHE, MANIFEST_COPY_URL, manifest);
+      await self.skipWaiting();
+    })()
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    (async () => {
+      const manifest = await getManifest();
+      const currentShell = manifest
+        ? SHELL_CACHE_PREFIX + manifest.version
+        : null;
+
+      for (const name of await caches.keys()) {
+        if (name.startsWith(SHELL_CACHE_PREFIX) && name !== currentShell) {
+          await caches.delete(name);
+        }
+      }
+
+      if (manifest) {
+        await pruneSounds(new Set(manifest.sounds), manifest.sound_cache_bytes);
+      }
+      await self.clients.claim();
+    })()
+  );
+});
+
+// Sound cache bookkeeping: [{ url, bytes, usedAt }] kept alongside the cache.
+// Every read-modify-write of the index runs on one promise chain, so sounds
+// loading at the same time cannot overwrite each other's entries.
+let soundIndexQueue = Promise.resolve();
+
+function updateSoundIndex(update) {
+  const run = soundIndexQueue.then(async () => {
+    const index = await readJson(META_CACHE, SOUND_INDEX_URL, []);
+    await writeJson(META_CACHE, SOUND_INDEX_URL, await update(index));
+  });
+  soundIndexQueue = run.catch(() => {});
+  return run;
+}
+
+function pruneSounds(allowed, budget) {
+  return updateSoundIndex(async (index) => {
+    const cache = await caches.open(SOUND_CACHE);
+    const keep = [];
+    for (const entry of index) {
+      if (allowed && !allowed.has(entry.url)) {
+        await cache.delete(entry.url);
+      } else {
+        keep.push(entry);
+      }
+    }
+
+    keep.sort((a, b) => a.usedAt - b.usedAt);
+    let total = keep.reduce((sum, entry) => sum + entry.bytes, 0);
+    while (total > budget && keep.length) {
+      const oldest = keep.shift();
+      total -= oldest.bytes;
+      await cache.delete(oldest.url);
+    }
+    return keep;
+  });
+}
+
+function touchSound(url, bytes) {
+  return updateSoundIndex((index) => {
+    const existing = index.find((entry) => entry.url === url);
+    if (existing) {
+      existing.usedAt = Date.now();
+      if (bytes !== undefined) existing.bytes = bytes;
+    } else {
+      index.push({ url, bytes: bytes || 0, usedAt: Date.now() });
+    }
+    return index;
+  });
+}
+
+async function handleSound(request, url) {
+  const cache = await caches.open(SOUND_CACHE);
+  const cached = await cache.match(url.pathname);
+  if (cached) {
+    touchSound(url.pathname).catch((error) => console.warn(error));
+    return cached;
+  }
+
+  const response = await fetch(request);
+  if (response.status === 200) {
+    const manifest = await getManifest();
+    if (!manifest || manifest.sounds.includes(url.pathname)) {
+      const body = await response.clone().arrayBuffer();
+      await cache.put(url.pathname, response.clone());
+      await touchSound(url.pathname, body.byteLength);
+      if (manifest) {
+        await pruneSounds(null, manifest.sound_cache_bytes);
+      }
+    }
+  }
+  return response;
+}
+
+async function handleShell(request, url) {
+  const manifest = await getManifest();
+  if (manifest) {
+    const cache = await caches.open(SHELL_CACHE_PREFIX + manifest.version);
+    const cached = await cache.match(url.pathname);
+    if (cached) return cached;
+  }
+  return fetch(request);
+}
+
+// Only user-independent HTML (the public index shell) is kept; a per-user
+// page must not outlive the session it was rendered for
+function isCacheable(response) {
+  const type = response.headers.get("Content-Type") || "";
+  const cacheControl = response.headers.get("Cache-Control") || "";
+  return (
+    response.ok &&
+    (!type.startsWith("text/html") || /\bpublic\b/.test(cacheControl))
+  );
+}
+
+async function handleNetworkFirst(request) {
+  const cache = await caches.open(DATA_CACHE);
+  try {
+    const response = await fetch(request);
+    if (isCacheable(response)) {
+      // Keyed by full URL: /api/sounds?cursor=... pages are separate entries
+      await cache.put(request.url, response.clone());
+    }
+    return response;
+  } catch (error) {
+    const cached = await cache.match(request.url);
+    if (cached) return cached;
+    throw error;
+  }
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  const changesSession =
+    SESSION_PATHS.includes(url.pathname) &&
+    (request.method !== "GET" || url.pathname === "/logout");
+  if (changesSession) {
+    // Signing in or out: forget the previous user's pages and catalog data
+    event.waitUntil(caches.delete(DATA_CACHE));
+    return;
+  }
+  if (request.method !== "GET") return;
+
+  if (url.pathname.startsWith("/sounds/")) {
+    // Range requests from <audio> go straight to the network
+    if (request.headers.has("range")) return;
+    event.respondWith(handleSound(request, url));
+  } else if (url.pathname.startsWith("/static/")) {
+    event.respondWith(handleShell(request, url));
+  } else if (NETWORK_FIRST_PATHS.includes(url.pathname)) {
+    event.respondWith(handleNetworkFirst(request));
+  }
+});
@@ -0,0 +1,222 @@
+# sync.py
+"""Per-user mix state and in-memory Server-Sent Events fan-out.
+
+Every change to a user's mix (a sound played, paused or re-levelled) or to
+their playlists is published as a small delta event with a per-user
+sequence number. Each open SSE connection has a Subscriber with a bounded
+queue; a client that falls too far behind gets a single "resync" event
+instead of an ever-growing backlog, and reconnecting clients replay missed
+events from a short per-user history via Last-Event-ID. Idle connections
+hold only an empty deque and an Event.
+
+A user's channel (history and mix state) lives while they have a
+connection open. Once the last one closes it is dropped straight away if
+it holds nothing, or otherwise HISTORY_SECONDS after its last event or
+disconnect, so memory follows the users online rather than every user
+ever seen. A recreated channel carries on from the highest sequence
+number dropped so far, and a Last-Event-ID from an older channel gets a
+resync.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+QUEUE_SIZE = 64
+HISTORY_SIZE = 128
+HISTORY_SECONDS = 300
+HEARTBEAT_SECONDS = 25
+MIX_OPS = ('play', 'pause', 'volume')
+
+
+class SyncError(ValueError):
+    """A mix change that cannot be applied"""
+
+
+def format_event(event):
+    """SSE wire format for one event dict"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def _resync(seq):
+    return {'id': seq, 'type': 'resync', 'data': {}}
+
+
+class Subscriber:
+    """One SSE connection's pending events"""
+    __slots__ = ('queue', 'ready', 'overflowed', 'waker')
+
+    def __init__(self):
+        self.queue = deque()
+        self.ready = threading.Event()
+        self.overflowed = False
+        # Extra wake-up hook for event-loop consumers (see asgi.py)
+        self.waker = None
+
+    def push(self, event):
+        if len(self.queue) >= QUEUE_SIZE:
+            # Too far behind: drop the backlog and tell the client to refetch
+            self.queue.clear()
+            self.overflowed = True
+        else:
+            self.queue.append(event)
+        self.ready.set()
+        if self.waker is not None:
+            self.waker()
+
+    def drain(self, seq):
+        """Events to send now (a lone resync after an overflow)"""
+        self.ready.clear()
+        if self.overflowed:
+            self.overflowed = False
+            self.queue.clear()
+            return [_resync(seq)]
+        events = []
+        while self.queue:
+            events.append(self.queue.popleft())
+        return events
+
+
+class _Channel:
+    __slots__ = ('seq', 'history', 'subscribers', 'mix', 'touched')
+
+    def __init__(self, seq=0):
+        self.seq = seq
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.subscribers = set()
+        self.mix = {}
+        self.touched = time.monotonic()
+
+    def is_empty(self):
+        return not self.subscribers and not self.history and not self.mix
+
+
+class MixHub:
+    """Mix state and subscribers for every user in this process"""
+
+    def __init__(self, history_seconds=HISTORY_SECONDS):
+        self.history_seconds = history_seconds
+        self._channels = {}
+        self._lock = threading.Lock()
+        # Highest seq of any dropped channel, so ids never repeat for a user
+        self._seq_floor = 0
+        self._next_sweep = time.monotonic() + history_seconds
+
+    def _drop(self, user_id, channel):
+        del self._channels[user_id]
+        self._seq_floor = max(self._seq_floor, channel.seq)
+
+    def _sweep(self, now):
+        """Drop channels nobody has listened to for history_seconds"""
+        idle = [(user_id, channel) for user_id, channel in self._channels.items()
+                if not channel.subscribers and now - channel.touched >= self.history_seconds]
+        for user_id, channel in idle:
+            self._drop(user_id, channel)
+        self._next_sweep = now + self.history_seconds
+
+    def _channel(self, user_id):
+        channel = self._channels.get(user_id)
+        if channel is None:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            channel = self._channels[user_id] = _Channel(self._seq_floor)
+        return channel
+
+    def _publish(self, channel, event_type, data):
+        channel.touched = time.monotonic()
+        channel.seq += 1
+        event = {'id': channel.seq, 'type': event_type, 'data': data}
+        channel.history.append(event)
+        for subscriber in channel.subscribers:
+            subscriber.push(event)
+        return event
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            return self._publish(self._channel(user_id), event_type, data)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Register a connection, replaying events after last_event_id"""
+        subscriber = Subscriber()
+        with self._lock:
+            channel = self._channel(user_id)
+            if last_event_id is not None and last_event_id > channel.seq:
+                # From a channel that has since been dropped
+                subscriber.push(_resync(channel.seq))
+            elif last_event_id is not None and last_event_id < channel.seq:
+                missed = [event for event in channel.history if event['id'] > last_event_id]
+                if missed and missed[0]['id'] == last_event_id + 1:
+                    for event in missed:
+                        subscriber.push(event)
+                else:
+                    subscriber.push(_resync(channel.seq))
+            channel.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            channel = self._channels.get(user_id)
+            if channel is not None:
+                channel.subscribers.discard(subscriber)
+                channel.touched = time.monotonic()
+                if channel.is_empty():
+                    self._drop(user_id, channel)
+
+    def drain(self, user_id, subscriber):
+        with self._lock:
+            return subscriber.drain(self._channel(user_id).seq)
+
+    def connections(self):
+        with self._lock:
+            return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    def get_mix(self, user_id):
+        """{'seq': n, 'sounds': {sound_id: {'volume', 'playing'}}}"""
+        with self._lock:
+            channel = self._channel(user_id)
+            return {'seq': channel.seq,
+                    'sounds': {sound_id: dict(state) for sound_id, state in channel.mix.items()}}
+
+    def apply(self, user_id, ops, origin=None):
+        """Apply validated mix ops and publish one delta event per change"""
+        events = []
+        with self._lock:
+            channel = self._channel(user_id)
+            for op in ops:
+                sound_id = op['sound_id']
+                state = channel.mix.get(sound_id, {'volume': 0.5, 'playing': False})
+                updated = dict(state, **{key: op[key] for key in ('volume',) if key in op})
+                if op['op'] != 'volume':
+                    updated['playing'] = op['op'] == 'play'
+                if updated == state and sound_id in channel.mix:
+                    continue
+                channel.mix[sound_id] = updated
+                data = {'sound_id': sound_id, 'volume': updated['volume'], 'origin': origin}
+                events.append(self._publish(channel, f"mix.{op['op']}", data))
+        return events
+
+
+def validate_ops(raw_ops, known_sound_ids):
+    """Normalised op dicts or SyncError"""
+    if not isinstance(raw_ops, list) or not raw_ops:
+        raise SyncError('ops list required')
+    if len(raw_ops) > QUEUE_SIZE:
+        raise SyncError(f'At most {QUEUE_SIZE} ops per request')
+    ops = []
+    for raw in raw_ops:
+        if not isinstance(raw, dict) or raw.get('op') not in MIX_OPS:
+            raise SyncError(f"op must be one of {', '.join(MIX_OPS)}")
+        sound_id = raw.get('sound_id')
+        if not isinstance(sound_id, int) or sound_id not in known_sound_ids:
+            raise SyncError('Unknown sound_id')
+        op = {'op': raw['op'], 'sound_id': sound_id}
+        volume = raw.get('volume')
+        if volume is not None:
+            if isinstance(volume, bool) or not isinstance(volume, (int, float)) or not 0 <= volume <= 1:
+                raise SyncError('volume must be between 0 and 1')
+            op['volume'] = round(float(volume), 3)
+        elif raw['op'] == 'volume':
+            raise SyncError('volume op needs a volume')
+        ops.append(op)
+    return ops
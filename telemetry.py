@@ -0,0 +1,156 @@
+# telemetry.py
+"""Buffered ingestion of client listening events.
+
+Play, stop and volume events arrive in batches from clients. Writing each
+one synchronously would cost a database round trip per event, so accepted
+events go into a bounded in-process buffer and a background thread
+bulk-inserts them when FLUSH_SIZE events are waiting or FLUSH_SECONDS have
+passed. When the buffer cannot take a whole batch the batch is refused
+(the endpoint answers 503 with Retry-After) and counted as dropped.
+"""
+import atexit
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+EVENT_TYPES = ('play', 'stop', 'volume')
+MAX_BATCH_EVENTS = 100
+BUFFER_CAPACITY = 10000
+FLUSH_SIZE = 500
+FLUSH_SECONDS = 2.0
+# Client timestamps further than this from server time are replaced
+MAX_CLOCK_SKEW_SECONDS = 24 * 3600
+
+
+class TelemetryError(ValueError):
+    """An event that cannot be accepted"""
+
+
+def _is_finite_number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        # An int too large for a float
+        return False
+
+
+def validate_event(event, known_sound_ids, user_id=None, now=None):
+    """Row dict for an incoming event, or TelemetryError."""
+    if not isinstance(event, dict):
+        raise TelemetryError('Event must be an object')
+    event_type = event.get('type')
+    if event_type not in EVENT_TYPES:
+        raise TelemetryError(f"type must be one of {', '.join(EVENT_TYPES)}")
+    sound_id = event.get('sound_id')
+    if not isinstance(sound_id, int) or sound_id not in known_sound_ids:
+        raise TelemetryError('Unknown sound_id')
+
+    value = event.get('value')
+    # NaN and Infinity would pass the range checks below and fail the whole batch insert
+    if value is not None and not _is_finite_number(value):
+        raise TelemetryError('value must be a finite number')
+    if event_type == 'volume' and (value is None or not 0 <= value <= 1):
+        raise TelemetryError('volume events need a value between 0 and 1')
+    if event_type == 'stop' and value is not None and value < 0:
+        raise TelemetryError('stop value is seconds listened and cannot be negative')
+
+    now = now or time.time()
+    occurred = event.get('ts')
+    if not _is_finite_number(occurred) or abs(occurred / 1000 - now) > MAX_CLOCK_SKEW_SECONDS:
+        occurred = now * 1000
+    return {
+        'user_id': user_id,
+        'sound_id': sound_id,
+        'event_type': event_type,
+        'value': None if value is None else float(value),
+        'occurred_at': datetime.fromtimestamp(occurred / 1000, tz=timezone.utc).replace(tzinfo=None),
+    }
+
+
+class EventBuffer:
+    """Bounded buffer drained in batches by a background flusher thread."""
+
+    def __init__(self, writer, capacity=BUFFER_CAPACITY, flush_size=FLUSH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.writer = writer
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.stats = {'accepted': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'flushes': 0}
+        self._events = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def offer(self, rows):
+        """Queue all rows, or none of them if they do not fit; returns success."""
+        with self._condition:
+            if len(self._events) + len(rows) > self.capacity:
+                self.stats['dropped'] += len(rows)
+                return False
+            self._events.extend(rows)
+            self.stats['accepted'] += len(rows)
+            if len(self._events) >= self.flush_size:
+                self._condition.notify()
+        self._ensure_thread()
+        return True
+
+    def depth(self):
+        with self._condition:
+            return len(self._events)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._condition:
+                batch = list(self._events)
+                self._events.clear()
+            if not batch:
+                return 0
+            try:
+                self.writer(batch)
+            except Exception as e:
+                print(f"⚠ Dropped {len(batch)} telemetry events: {e}")
+                with self._condition:
+                    self.stats['failed'] += len(batch)
+                return 0
+            with self._condition:
+                self.stats['written'] += len(batch)
+                self.stats['flushes'] += 1
+            return len(batch)
+
+    def snapshot(self):
+        with self._condition:
+            return dict(self.stats, buffered=len(self._events), capacity=self.capacity)
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name='telemetry-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_seconds
+                while len(self._events) < self.flush_size and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stopped:
+                    return
+            self.flush()
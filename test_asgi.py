@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test the ASGI serving mode for CalmFlow
+Drives asgi.application directly with ASGI messages and checks the native
+sound and mix event routes against the Flask routes they stand in for.
+"""
+
+import sys
+import os
+import asyncio
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+# Importing the app creates the SQL Server engine, which needs the ODBC driver
+pytest.importorskip('pyodbc', exc_type=ImportError)
+
+import asgi
+from app import app, mix_hub
+
+# Requests here must not start the background orphan sweeper against the database
+app.config['ORPHAN_SWEEP_SECONDS'] = 0
+
+SOUND = 'Forest.mp3'
+SOUND_PATH = os.path.join(asgi.SOUNDS_ROOT, SOUND)
+
+
+def _cookie(data):
+    value = app.session_interface.get_signing_serializer(app).dumps(data)
+    return f"{app.config['SESSION_COOKIE_NAME']}={value}"
+
+
+async def _run(path, method='GET', headers=(), until=None, query_string=b''):
+    """(status, headers, body) of one request; streams are cut off once until(body) holds"""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+             'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers]}
+    messages = []
+    progressed = asyncio.Event()
+    leave = asyncio.Event()
+
+    async def receive():
+        await leave.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+        progressed.set()
+
+    def body():
+        return b''.join(message.get('body', b'') for message in messages[1:])
+
+    task = asyncio.ensure_future(asgi.application(scope, receive, send))
+    if until is not None:
+        while not until(body()):
+            await asyncio.wait_for(progressed.wait(), 5)
+            progressed.clear()
+        leave.set()
+    await asyncio.wait_for(task, 5)
+
+    start = messages[0]
+    response_headers = {key.decode('latin-1').title(): value.decode('latin-1') for key, value in start['headers']}
+    return start['status'], response_headers, body()
+
+
+def request(*args, **kwargs):
+    return asyncio.run(_run(*args, **kwargs))
+
+
+@pytest.fixture(autouse=True)
+def sound_file():
+    if not os.path.isfile(SOUND_PATH):
+        pytest.skip(f'{SOUND} not present')
+
+
+def test_full_download_matches_flask():
+    status, headers, body = request(f'/sounds/{SOUND}')
+    flask_response = app.test_client().get(f'/sounds/{SOUND}')
+
+    assert status == 200
+    with open(SOUND_PATH, 'rb') as f:
+        assert body == f.read()
+    assert headers['Etag'] == flask_response.headers['ETag']
+    assert headers['Content-Length'] == str(os.path.getsize(SOUND_PATH))
+    assert headers['Accept-Ranges'] == 'bytes'
+
+
+def test_range_request_matches_flask():
+    status, headers, body = request(f'/sounds/{SOUND}', headers=[('Range', 'bytes=100-299')])
+    flask_response = app.test_client().get(f'/sounds/{SOUND}', headers={'Range': 'bytes=100-299'})
+
+    assert status == 206 == flask_response.status_code
+    assert headers['Content-Range'] == flask_response.headers['Content-Range']
+    assert body == flask_response.data and len(body) == 200
+
+
+def test_conditional_and_unsatisfiable_requests():
+    _, headers, _ = request(f'/sounds/{SOUND}', method='HEAD')
+    status, _, body = request(f'/sounds/{SOUND}', headers=[('If-None-Match', headers['Etag'])])
+    assert status == 304 and body == b''
+
+    size = os.path.getsize(SOUND_PATH)
+    status, headers, _ = request(f'/sounds/{SOUND}', headers=[('Range', f'bytes={size}-')])
+    assert status == 416 and headers['Content-Range'] == f'bytes */{size}'
+
+
+def test_head_sends_headers_only():
+    status, headers, body = request(f'/sounds/{SOUND}', method='HEAD')
+    assert status == 200 and body == b''
+    assert headers['Content-Length'] == str(os.path.getsize(SOUND_PATH))
+
+
+def test_missing_sound_is_404():
+    status, _, _ = request('/sounds/nope.mp3')
+    assert status == 404
+
+
+def test_session_user_id_reads_the_signed_cookie():
+    assert asgi.session_user_id({'Cookie': _cookie({'user_id': 42})}) == 42
+    assert asgi.session_user_id({'Cookie': _cookie({})}) is None
+    assert asgi.session_user_id({}) is None
+    forged = _cookie({'user_id': 42})[:-2] + 'xx'
+    assert asgi.session_user_id({'Cookie': forged}) is None
+
+
+def test_mix_events_requires_login():
+    status, _, body = request('/api/mix/events')
+    assert status == 401 and b'Not authenticated' in body
+
+
+def test_mix_events_delivers_published_events():
+    user_id = 9017
+    before = mix_hub.connections()
+
+    async def scenario():
+        async def publish_when_subscribed():
+            while mix_hub.connections() == before:
+                await asyncio.sleep(0.01)
+            mix_hub.publish(user_id, 'playlist.deleted', {'playlist_id': 3})
+
+        publisher = asyncio.ensure_future(publish_when_subscribed())
+        result = await _run('/api/mix/events', headers=[('Cookie', _cookie({'user_id': user_id}))],
+                            until=lambda body: b'playlist.deleted' in body)
+        await publisher
+        return result
+
+    status, headers, body = asyncio.run(scenario())
+    assert status == 200 and headers['Content-Type'] == 'text/event-stream'
+    assert body.startswith(b'retry: 3000\n\n')
+    assert b'event: playlist.deleted\ndata: {"playlist_id": 3}' in body
+    # The stream unsubscribed when the client left
+    assert mix_hub.connections() == before
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test the shared cache backends and version-key invalidation for CalmFlow
+Runs RedisCache against a small in-process stand-in for a Redis server, so
+two "workers" (two clients with their own registries) can be checked for
+seeing each other's invalidations.
+"""
+
+import sys
+import os
+import socket
+import socketserver
+import threading
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import cache
+import catalog
+from cache import CacheError, MemoryCache, RedisCache, VersionRegistry, from_url, _encode_command, _read_reply
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    """Just enough of the Redis protocol for cache.py"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.data = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+
+    def send(self, *replies):
+        self.wfile.write(b''.join(replies))
+
+    def bulk(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        data = value.encode('utf-8')
+        return b'$%d\r\n%s\r\n' % (len(data), data)
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                command = _read_reply(self.rfile)
+            except Exception:
+                return
+            name, args = command[0].upper(), command[1:]
+            with server.lock:
+                if name in ('SELECT', 'PING'):
+                    self.send(b'+OK\r\n')
+                elif name == 'GET':
+                    self.send(self.bulk(server.data.get(args[0])))
+                elif name == 'MGET':
+                    self.send(b'*%d\r\n' % len(args), *[self.bulk(server.data.get(key)) for key in args])
+                elif name == 'SET':
+                    server.data[args[0]] = args[1]
+                    self.send(b'+OK\r\n')
+                elif name == 'DEL':
+                    self.send(b':%d\r\n' % int(server.data.pop(args[0], None) is not None))
+                elif name == 'PUBLISH':
+                    message = _encode_command('message', args[0], args[1])
+                    targets = [wfile for channel, wfile in server.subscribers if channel == args[0]]
+                    for wfile in targets:
+                        wfile.write(message)
+                    self.send(b':%d\r\n' % len(targets))
+                elif name == 'SUBSCRIBE':
+                    server.subscribers.append((args[0], self.wfile))
+                    self.send(_encode_command('subscribe', args[0], 1))
+                else:
+                    self.send(b'-ERR unknown command\r\n')
+
+
+def _start_server():
+    server = StandInServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_memory_cache_get_set_delete_and_ttl():
+    cache = MemoryCache()
+    cache.set('a', '1')
+    cache.set('b', '2', ttl=0.05)
+    assert cache.get_many(['a', 'b', 'c']) == ['1', '2', None]
+    time.sleep(0.06)
+    assert cache.get('b') is None
+    cache.delete('a')
+    assert cache.get('a') is None
+
+
+def test_redis_cache_against_stand_in_server():
+    server = _start_server()
+    try:
+        cache = from_url(f'redis://127.0.0.1:{server.server_address[1]}/1')
+        assert isinstance(cache, RedisCache)
+        cache.set('greeting', 'hello')
+        assert cache.get('greeting') == 'hello'
+        assert cache.get_many(['greeting', 'missing']) == ['hello', None]
+        cache.delete('greeting')
+        assert cache.get('greeting') is None
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_version_bump_is_broadcast_to_other_workers():
+    server = _start_server()
+    try:
+        port = server.server_address[1]
+        # Long check interval: only the broadcast can deliver the new token in time
+        worker_a = VersionRegistry(RedisCache(port=port), check_seconds=3600)
+        worker_b = VersionRegistry(RedisCache(port=port), check_seconds=3600)
+        assert _wait_for(lambda: len(server.subscribers) == 2)
+
+        assert worker_b.current('catalog') == worker_b.epoch
+        token = worker_a.bump('catalog')
+        assert worker_a.current('catalog') == token
+        assert _wait_for(lambda: worker_b.current('catalog') == token)
+
+        # A worker that missed the message still picks the token up from the key
+        late = VersionRegistry(RedisCache(port=port), check_seconds=0)
+        assert late.current('catalog', 'playlists:1') == [token, late.epoch]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unreachable_backend_falls_back_to_local_versions():
+    with socketserver.TCPServer(('127.0.0.1', 0), socketserver.BaseRequestHandler) as probe:
+        port = probe.server_address[1]
+    registry = VersionRegistry(RedisCache(port=port), check_seconds=0)
+
+    assert registry.current('playlists:7') == registry.epoch
+    assert registry.available is False
+    token = registry.bump('playlists:7')
+    assert registry.current('playlists:7') == token
+
+
+def test_unbumped_and_lost_tokens_never_repeat_old_ones():
+    backend = MemoryCache()
+    first = VersionRegistry(backend, check_seconds=0)
+    assert first.current('playlists:1') == first.epoch
+    # A restarted worker does not reuse the old default
+    assert VersionRegistry(MemoryCache()).epoch != first.epoch
+
+    token = first.bump('playlists:1')
+    backend.delete(first._key('playlists:1'))
+    assert first.current('playlists:1') == token
+
+
+class FlakyCache(MemoryCache):
+    """MemoryCache whose reads fail while down is set, counting attempts"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = True
+        self.reads = 0
+
+    def get_many(self, keys):
+        self.reads += 1
+        if self.down:
+            raise CacheError('down')
+        return super().get_many(keys)
+
+
+def test_registry_backs_off_while_backend_is_down():
+    backend = FlakyCache()
+    registry = VersionRegistry(backend, check_seconds=0.05)
+
+    for _ in range(3):
+        assert registry.current('catalog') == registry.epoch
+    assert backend.reads == 1
+
+    time.sleep(0.06)
+    backend.down = False
+    registry.current('catalog')
+    assert backend.reads == 2 and registry.available is True
+
+
+def test_silent_server_costs_one_timeout_not_two(monkeypatch):
+    monkeypatch.setattr(cache, 'SOCKET_TIMEOUT', 0.2)
+    # Accepts connections (via the backlog) but never answers
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    try:
+        client = RedisCache(port=listener.getsockname()[1])
+        started = time.monotonic()
+        with pytest.raises(CacheError):
+            client.get('key')
+        assert time.monotonic() - started < 0.35
+    finally:
+        listener.close()
+
+
+def test_redis_cache_reconnects_after_idle_connection_drops():
+    server = _start_server()
+    try:
+        client = RedisCache(port=server.server_address[1])
+        client.set('greeting', 'hello')
+        # The server side of the pooled connection goes away
+        dropped, peer = socket.socketpair()
+        peer.close()
+        client._sock.close()
+        client._sock, client._stream = dropped, dropped.makefile('rb')
+        assert client.get('greeting') == 'hello'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_catalog_rebuilds_when_another_worker_invalidates(monkeypatch):
+    builds = []
+
+    def fake_build(generation=None):
+        builds.append(generation)
+        return catalog.CatalogSnapshot([{'id': len(builds)}], [], generation)
+
+    monkeypatch.setattr(catalog, 'build_catalog', fake_build)
+    shared = MemoryCache()
+    this_worker = VersionRegistry(shared, check_seconds=3600)
+    other_worker = VersionRegistry(shared, check_seconds=3600)
+    catalog.use_shared_cache(shared, this_worker)
+    try:
+        first = catalog.get_catalog()
+        assert catalog.get_catalog() is first
+
+        token = other_worker.bump('catalog')
+        second = catalog.get_catalog()
+        assert second is not first
+        assert builds == [this_worker.epoch, token]
+    finally:
+        catalog.use_shared_cache(None, None)
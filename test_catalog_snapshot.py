@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test the on-disk catalog snapshot and database circuit breaker for CalmFlow
+Checks the file round trip, rejection of damaged files, warm starts and
+serving the last good catalog while the database is failing.
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+import catalog
+from breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from models import db
+
+
+def _snapshot(name='Rain', source='db'):
+    sounds = [{'id': 1, 'name': name.lower(), 'display_name': name, 'groups': [1], 'is_premium': False},
+              {'id': 2, 'name': 'fan', 'display_name': 'Fan', 'groups': [1], 'is_premium': True}]
+    groups = [{'id': 1, 'name': 'Sleep', 'playlist_icon': 'static/icons/sleep.png', 'icon_url': '/static/icons/sleep.png'}]
+    return catalog.CatalogSnapshot(sounds, groups, '0', source)
+
+
+@pytest.fixture
+def app_context(monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    monkeypatch.setattr(catalog, '_state', dict(catalog._state, snapshot=None, group_summaries=None,
+                                                backend=None, versions=None, snapshot_path=None,
+                                                persisted_version=None, breaker=None, refreshing=False))
+    with app.app_context():
+        yield app
+
+
+def _database_down(generation=None):
+    raise OperationalError('SELECT', {}, Exception('connection refused'))
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    path = str(tmp_path / 'catalog.snapshot')
+    original = _snapshot()
+    catalog.write_snapshot_file(original, path)
+
+    loaded = catalog.read_snapshot_file(path, generation='0')
+    assert loaded.version == original.version
+    assert loaded.sounds == original.sounds
+    assert loaded.source == 'disk'
+
+
+def test_damaged_snapshot_files_are_ignored(tmp_path):
+    path = tmp_path / 'catalog.snapshot'
+    assert catalog.read_snapshot_file(str(path)) is None
+
+    catalog.write_snapshot_file(_snapshot(), str(path))
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+    assert catalog.read_snapshot_file(str(path)) is None
+
+    path.write_bytes(data.replace(b'Rain', b'Snow'))
+    assert catalog.read_snapshot_file(str(path)) is None
+
+
+def test_breaker_opens_after_failures_and_half_opens_for_one_trial():
+    breaker = CircuitBreaker('Test', failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_builds_are_persisted_and_warm_start_from_disk(app_context, tmp_path, monkeypatch):
+    path = str(tmp_path / 'catalog.snapshot')
+    built = _snapshot()
+    monkeypatch.setattr(catalog, 'build_catalog', lambda generation=None: built)
+    catalog.use_snapshot_file(path, CircuitBreaker('Test'))
+    assert catalog.get_catalog() is built
+
+    # A new worker: no database needed to serve its first request
+    catalog._state.update(snapshot=None, persisted_version=None)
+    monkeypatch.setattr(catalog, 'build_catalog', _database_down)
+    catalog.use_snapshot_file(path, CircuitBreaker('Test'))
+    warm = catalog.get_catalog()
+    assert warm.source == 'disk' and warm.version == built.version
+
+
+def test_serves_last_good_snapshot_while_database_fails(app_context, tmp_path, monkeypatch):
+    path = str(tmp_path / 'catalog.snapshot')
+    catalog.write_snapshot_file(_snapshot(), path)
+    breaker = CircuitBreaker('Test', failure_threshold=2, reset_seconds=60)
+    catalog._state.update(snapshot_path=path, breaker=breaker)
+    calls = []
+
+    def failing(generation=None):
+        calls.append(generation)
+        _database_down()
+
+    monkeypatch.setattr(catalog, 'build_catalog', failing)
+    for _ in range(5):
+        assert catalog.get_catalog().source == 'disk'
+    # The second attempt is the background refresh of the disk snapshot
+    while catalog._state['refreshing']:
+        time.sleep(0.01)
+    # The open circuit stops further attempts
+    assert len(calls) == 2 and breaker.state == OPEN
+
+    summaries = catalog.get_group_summaries()
+    assert summaries == [{'id': 1, 'name': 'Sleep', 'icon': 'static/icons/sleep.png',
+                          'total': 2, 'free': 1, 'premium': 1, 'sound_ids': [1, 2]}]
+
+
+def test_no_snapshot_and_no_database_raises(app_context, tmp_path, monkeypatch):
+    catalog._state.update(snapshot_path=str(tmp_path / 'missing.snapshot'), breaker=CircuitBreaker('Test'))
+    monkeypatch.setattr(catalog, 'build_catalog', _database_down)
+    with pytest.raises(catalog.CatalogUnavailable):
+        catalog.get_catalog()
+
+
+def test_requests_do_not_queue_behind_a_probe(app_context, monkeypatch):
+    stale = _snapshot()
+    breaker = CircuitBreaker('Test', failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    catalog._state.update(snapshot=stale, breaker=breaker)
+    probing, release = threading.Event(), threading.Event()
+
+    def slow_build(generation=None):
+        probing.set()
+        release.wait(5)
+        return _snapshot('Snow')
+
+    def probe():
+        with app_context.app_context():
+            catalog.get_catalog()
+
+    monkeypatch.setattr(catalog, 'build_catalog', slow_build)
+    prober = threading.Thread(target=probe)
+    prober.start()
+    try:
+        assert probing.wait(5)
+        # The half-open trial is taken: everyone else gets the last snapshot at once
+        started = time.monotonic()
+        assert catalog.get_catalog() is stale
+        assert time.monotonic() - started < 0.5
+    finally:
+        release.set()
+        prober.join()
+    assert catalog.get_catalog().sounds[0]['name'] == 'snow' and breaker.state == CLOSED
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test set-based deletes and the orphan sweeper for CalmFlow
+Deletes accounts, playlists and groups with plain DELETE statements, sweeps
+orphans left by the old delete paths in batches, and spots foreign keys
+whose ON DELETE action the migration needs to change.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect, text
+
+import deletion
+import migrations
+from models import db, Group, ListeningEvent, Playlist, Sound, User, playlist_sound_association, sound_group_association
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "calmflow.db"}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        sounds = [Sound(name=name, display_name=name.title(), icon='static/icons/x.png', file_path=f'{name}.mp3')
+                  for name in ('rain', 'fire', 'wind')]
+        db.session.add_all(sounds)
+        db.session.add_all([Group(name='Nature', sounds=sounds[:2]), Group(name='Animals', sounds=sounds[1:])])
+        for username in ('ana', 'ben'):
+            user = User(username=username, email=f'{username}@example.com')
+            user.set_password('secret')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all([Playlist(name=f'{username} {n}', user_id=user.id, sounds=sounds[:n + 1])
+                                for n in range(3)])
+            db.session.add(ListeningEvent(user_id=user.id, sound_id=sounds[0].id, event_type='play',
+                                          occurred_at=datetime(2026, 1, 1)))
+        db.session.commit()
+        yield app
+
+
+def _count(table):
+    return db.session.scalar(db.select(db.func.count()).select_from(table))
+
+
+def test_delete_user_removes_playlists_and_memberships(app):
+    ana = User.query.filter_by(username='ana').one().id
+    memberships = deletion.playlist_memberships(db.session, Playlist.user_id == ana)
+    assert sorted(len(sound_ids) for sound_ids in memberships.values()) == [1, 2, 3]
+
+    assert deletion.delete_user(db.session, ana) == 1
+    db.session.commit()
+
+    assert [user.username for user in User.query.all()] == ['ben']
+    assert Playlist.query.filter_by(user_id=ana).count() == 0
+    assert _count(playlist_sound_association) == 6
+    events = ListeningEvent.query.order_by(ListeningEvent.id).all()
+    assert [event.user_id for event in events] == [None, User.query.one().id]
+
+
+def test_delete_playlists_where_checks_owner(app):
+    ana, ben = (user.id for user in User.query.order_by(User.id))
+    playlist = Playlist.query.filter_by(user_id=ana).first().id
+
+    assert deletion.delete_playlists_where(db.session, Playlist.id == playlist, Playlist.user_id == ben) == 0
+    assert deletion.delete_playlists_where(db.session, Playlist.id == playlist, Playlist.user_id == ana) == 1
+    db.session.commit()
+
+    assert db.session.get(Playlist, playlist) is None
+    assert _count(playlist_sound_association) == 11
+
+
+def test_delete_groups_removes_sound_links(app):
+    assert deletion.delete_groups(db.session, ['Animals', 'Transport']) == 1
+    db.session.commit()
+
+    assert [group.name for group in Group.query.all()] == ['Nature']
+    assert _count(sound_group_association) == 2
+
+
+def test_sweep_removes_orphans_in_batches(app):
+    # What the old delete_account left behind: playlists without their user,
+    # and playlist_sound rows without their playlist
+    ben = User.query.filter_by(username='ben').one().id
+    db.session.execute(text('DELETE FROM users WHERE id = :id'), {'id': ben})
+    db.session.execute(text('DELETE FROM groups WHERE name = :name'), {'name': 'Animals'})
+    db.session.execute(playlist_sound_association.insert(), [{'playlist_id': 900 + n, 'sound_id': 1} for n in range(5)])
+    db.session.commit()
+
+    first = deletion.sweep_orphans(db.session, batch_size=2)
+    assert first['playlist_sound.playlist_id'] == 2
+    assert first['sound_group.group_id'] == 2
+    assert first['playlists.user_id'] == 2
+
+    totals = deletion.sweep_until_clean(lambda: deletion.sweep_orphans(db.session, batch_size=2), pause=0)
+    db.session.commit()
+
+    assert totals['playlist_sound.playlist_id'] == 3 and totals['playlists.user_id'] == 1
+    assert Playlist.query.count() == 3
+    assert _count(playlist_sound_association) == 6
+    assert _count(sound_group_association) == 2
+
+
+def test_migration_spots_foreign_keys_without_cascade(app):
+    db.session.execute(text('CREATE TABLE old_link (playlist_id INTEGER, sound_id INTEGER, '
+                            'FOREIGN KEY (playlist_id) REFERENCES playlists (id), '
+                            'FOREIGN KEY (sound_id) REFERENCES sounds (id) ON DELETE CASCADE)'))
+    db.session.commit()
+    inspector = inspect(db.engine)
+    old_link = db.Table('old_link', db.MetaData(),
+                        db.Column('playlist_id', db.Integer, db.ForeignKey(Playlist.id, ondelete='CASCADE')),
+                        db.Column('sound_id', db.Integer, db.ForeignKey(Sound.id, ondelete='CASCADE')))
+
+    stale = migrations._stale_foreign_keys(inspector, old_link)
+    assert [constraint.column_keys for _, constraint in stale] == [['playlist_id']]
+    # Tables created from the current models are already up to date
+    assert migrations._stale_foreign_keys(inspector, Playlist.__table__) == []
+    assert migrations.upgrade_foreign_keys(inspector) == []
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test group summaries for CalmFlow
+Checks the single GROUP BY query behind /api/groups against the summaries
+derived from a catalog snapshot, on a SQLite database.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+
+import catalog
+from models import db, Group, Sound
+
+
+@pytest.fixture
+def app_context(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'calmflow.db'}"
+    db.init_app(app)
+    monkeypatch.setattr(catalog, '_state', dict(catalog._state, snapshot=None, group_summaries=None,
+                                                backend=None, versions=None, snapshot_path=None,
+                                                persisted_version=None, breaker=None, refreshing=False))
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def _sound(name, is_premium=False):
+    return Sound(name=name, display_name=name.title(), icon='static/icons/x.png',
+                 file_path=f'{name}.mp3', is_premium=is_premium)
+
+
+def test_aggregate_query_matches_snapshot_summaries(app_context):
+    rain, fire, fan, owl = _sound('rain'), _sound('fire'), _sound('fan', True), _sound('owl', True)
+    db.session.add_all([
+        Group(name='Nature', playlist_icon='static/icons/leaf.png', sounds=[owl, rain, fire]),
+        Group(name='Sleep', playlist_icon='static/icons/night.png', sounds=[fan, rain]),
+        # Allowed but empty, and a group /api/groups never shows
+        Group(name='Focus', playlist_icon='static/icons/focus.png'),
+        Group(name='Animals', playlist_icon='static/icons/bird.png', sounds=[owl]),
+    ])
+    db.session.commit()
+
+    summaries = catalog.build_group_summaries()
+
+    assert summaries == catalog.summaries_from_snapshot(catalog.get_catalog())
+    by_name = {summary['name']: summary for summary in summaries}
+    assert sorted(by_name) == ['Focus', 'Nature', 'Sleep']
+    assert by_name['Nature']['total'] == 3 and by_name['Nature']['premium'] == 1
+    assert by_name['Nature']['sound_ids'] == sorted([owl.id, rain.id, fire.id])
+    assert by_name['Sleep']['free'] == 1
+    assert by_name['Focus'] == {'id': by_name['Focus']['id'], 'name': 'Focus', 'icon': 'static/icons/focus.png',
+                                'total': 0, 'free': 0, 'premium': 0, 'sound_ids': []}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test seamless-loop detection for CalmFlow
+Uses synthetic signals so no decoder is needed.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from loops import find_loop, find_repeat_period, is_stationary, crossfade_loop
+
+SAMPLE_RATE = 22050
+
+
+def _noise(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def test_repeating_signal_period_is_found():
+    """A tiled recording loops at its repeat period"""
+    period = _noise(6.3)
+    signal = np.tile(period, 5) + 0.05 * _noise(6.3 * 5, seed=1)
+    assert find_repeat_period(signal, SAMPLE_RATE) == len(period)
+
+    start, length = find_loop(signal, SAMPLE_RATE)
+    assert length == len(period)
+    assert start + length < len(signal)
+
+
+def test_stationary_noise_gets_short_loop():
+    """Steady broadband noise is loopable even without a repeat"""
+    noise = _noise(30)
+    assert find_repeat_period(noise, SAMPLE_RATE) is None
+    assert is_stationary(noise, SAMPLE_RATE)
+    assert find_loop(noise, SAMPLE_RATE) is not None
+
+
+def test_evolving_sound_has_no_loop():
+    """Sounds whose level changes over time are left alone"""
+    t = np.arange(30 * SAMPLE_RATE) / SAMPLE_RATE
+    swell = (np.sin(2 * np.pi * 0.05 * t) ** 8).astype(np.float32) * _noise(30)
+    assert find_loop(swell, SAMPLE_RATE) is None
+
+
+def test_crossfade_continues_into_loop_start():
+    """The loop head begins with the audio that follows the loop end"""
+    samples = np.stack([_noise(2), _noise(2, seed=2)], axis=1)
+    loop = crossfade_loop(samples, 100, 20000, 500)
+    assert loop.shape == (20000, 2)
+    assert np.allclose(loop[0], samples[20100])
+    assert np.allclose(loop[-1], samples[20099])
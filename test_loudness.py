@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test loudness measurement for CalmFlow
+Checks the BS.1770 implementation against reference tones.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from loudness import LOUDNESS_RATE, integrated_loudness, peak_dbfs, normalised_volume, REFERENCE_LUFS, BASE_VOLUME
+
+
+def _sine(level_dbfs, seconds=5, freq=997):
+    t = np.arange(int(seconds * LOUDNESS_RATE)) / LOUDNESS_RATE
+    return (10 ** (level_dbfs / 20) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_reference_tone_loudness():
+    """A full-scale 997 Hz sine measures -3.01 LUFS"""
+    assert abs(integrated_loudness(_sine(0)) - (-3.01)) < 0.05
+    assert abs(integrated_loudness(_sine(-20)) - (-23.01)) < 0.05
+
+
+def test_silence_is_gated():
+    """Silence falls below the absolute gate"""
+    assert integrated_loudness(np.zeros(LOUDNESS_RATE, dtype=np.float32)) == -70.0
+
+
+def test_peak_level():
+    """Sample peak is reported in dBFS"""
+    assert abs(peak_dbfs(_sine(-6)) - (-6)) < 0.01
+
+
+def test_normalised_volume_balances_loud_and_quiet():
+    """Louder sounds get a lower default volume, within bounds"""
+    assert normalised_volume(REFERENCE_LUFS) == BASE_VOLUME
+    assert normalised_volume(REFERENCE_LUFS + 6) < BASE_VOLUME < normalised_volume(REFERENCE_LUFS - 6)
+    assert normalised_volume(0) >= 0.05
+    assert normalised_volume(-90) <= 1.0
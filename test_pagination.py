@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test cursor pagination helpers for CalmFlow
+Checks cursor round trips, field projection and streamed page output.
+"""
+
+import sys
+import os
+import json
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pagination import (PaginationError, decode_cursor, encode_cursor, parse_fields,
+                        parse_limit, stream_array, stream_page, MAX_PAGE_SIZE)
+
+ITEMS = [{"id": i, "name": f"sound {i}", "is_premium": i % 2 == 0} for i in range(1, 6)]
+
+
+def test_cursor_round_trip():
+    """Cursors are opaque but decode back to the last id"""
+    cursor = encode_cursor(42)
+    assert "42" not in cursor
+    assert decode_cursor(cursor) == 42
+    assert decode_cursor("") is None
+    with pytest.raises(PaginationError):
+        decode_cursor("not a cursor!")
+
+
+def test_limit_and_fields_validation():
+    """Limits are capped and unknown fields rejected"""
+    assert parse_limit(None) is None
+    assert parse_limit("10") == 10
+    assert parse_limit("100000") == MAX_PAGE_SIZE
+    with pytest.raises(PaginationError):
+        parse_limit("0")
+    assert parse_fields("name", {"id", "name"}) == ["id", "name"]
+    assert parse_fields(None, {"id"}) is None
+    with pytest.raises(PaginationError):
+        parse_fields("password_hash", {"id", "name"})
+
+
+def test_stream_page_sets_next_cursor():
+    """The extra item beyond the limit becomes the next cursor, not output"""
+    page = json.loads("".join(stream_page("sounds", iter(ITEMS[:3]), 2, ["id"])))
+    assert page == {"sounds": [{"id": 1}, {"id": 2}], "next_cursor": encode_cursor(2)}
+
+    last = json.loads("".join(stream_page("sounds", iter(ITEMS[3:]), 2)))
+    assert [item["id"] for item in last["sounds"]] == [4, 5]
+    assert last["next_cursor"] is None
+
+
+def test_stream_array():
+    """Unpaginated output is a plain JSON list"""
+    assert json.loads("".join(stream_array(iter(ITEMS), ["id", "name"])))[0] == {"id": 1, "name": "sound 1"}
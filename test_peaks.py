@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test waveform peaks for CalmFlow
+Checks min/max reduction, the blob format round trip and batched responses.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+
+from peaks import HEADER, batch_version, compute_peaks, decode_batch, decode_peaks, encode_batch, encode_peaks
+
+
+def test_compute_peaks_takes_min_and_max_per_slice():
+    """Each slice contributes its minimum then its maximum, scaled to the sample type"""
+    samples = np.array([0.0, 1.0, -1.0, 0.5, -0.5, 0.25, 0.0, 0.0], dtype=np.float32)
+    assert compute_peaks(samples, resolution=4).tolist() == [0, 127, -127, 64, -64, 32, 0, 0]
+    assert compute_peaks(samples, resolution=2, bits=16).tolist() == [-32767, 32767, -16384, 8192]
+
+
+def test_compute_peaks_pads_short_and_empty_input():
+    """Fewer samples than slices repeats the last one; no samples gives silence"""
+    short = compute_peaks(np.array([0.5, -0.5], dtype=np.float32), resolution=4)
+    assert short.tolist() == [64, 64, -64, -64, -64, -64, -64, -64]
+    assert compute_peaks(np.array([], dtype=np.float32), resolution=3).tolist() == [0] * 6
+
+
+@pytest.mark.parametrize('bits', [8, 16])
+def test_encode_decode_round_trip(bits):
+    """A blob carries its bit depth and resolution and decodes to the same pairs"""
+    rng = np.random.default_rng(7)
+    pairs = compute_peaks(rng.uniform(-1, 1, 10_000).astype(np.float32), resolution=64, bits=bits)
+    blob = encode_peaks(pairs, bits)
+
+    assert len(blob) == HEADER.size + 64 * 2 * bits // 8
+    decoded = decode_peaks(blob)
+    assert decoded.dtype.itemsize == bits // 8
+    assert np.array_equal(decoded, pairs)
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_peaks(b'X\x08\x01\x00\x00\x00')
+
+
+def test_batch_round_trip_and_version():
+    """Batched blobs decode back per sound; the version tracks every member"""
+    blobs = {3: encode_peaks(np.array([-1, 1], dtype=np.int8)),
+             12: encode_peaks(np.array([-5, 5, -2, 2], dtype=np.int16), bits=16)}
+    body = encode_batch(sorted(blobs.items()))
+
+    assert decode_batch(body) == blobs
+    assert decode_batch(encode_batch([])) == {}
+    assert batch_version([(3, 'a'), (12, 'b')]) == batch_version([(3, 'a'), (12, 'b')])
+    assert batch_version([(3, 'a'), (12, 'b')]) != batch_version([(3, 'a'), (12, 'c')])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test decayed popularity counters for CalmFlow
+Checks window decay, pending increments and merging loaded totals.
+"""
+
+import sys
+import os
+import math
+import threading
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from popularity import BUCKET_SECONDS, PopularityCounters, bucket_start
+
+NOW = 1_700_000_400.0
+
+
+def test_recent_plays_outrank_old_ones_in_short_windows():
+    """A sound played a lot last week loses to one played now in the hour window"""
+    counters = PopularityCounters()
+    week_ago = bucket_start(NOW - 6 * 24 * 3600)
+    counters.load([(1, week_ago, 50)], now=NOW)
+    for _ in range(3):
+        counters.record(2, at=NOW)
+
+    assert [sound_id for sound_id, _ in counters.top("hour", now=NOW)] == [2, 1]
+    assert [sound_id for sound_id, _ in counters.top("week", now=NOW)] == [1, 2]
+
+
+def test_scores_decay_with_time():
+    """An hour later the hour-window score has dropped by about 1/e"""
+    counters = PopularityCounters()
+    counters.load([], now=NOW)
+    counters.record(1, at=NOW)
+    assert math.isclose(counters.score(1, "hour", now=NOW), 1.0)
+    assert math.isclose(counters.score(1, "hour", now=NOW + 3600), math.exp(-1))
+
+
+def test_pending_plays_survive_reload():
+    """Plays not yet flushed stay counted when other workers' totals are loaded"""
+    counters = PopularityCounters()
+    counters.load([], now=NOW)
+    counters.record(1, at=NOW)
+    counters.record(1, at=NOW)
+    assert counters.pending == {(1, bucket_start(NOW)): 2}
+
+    counters.load([(3, bucket_start(NOW), 1)], now=NOW + BUCKET_SECONDS / 2)
+    ranking = counters.ranking("day")
+    assert ranking[1] > ranking[3] > 0
+
+    flushed = counters.take_pending()
+    assert counters.pending == {}
+    counters.restore_pending(flushed)
+    assert counters.pending == flushed
+
+
+def test_first_load_runs_on_the_flusher_thread():
+    """ensure_started returns at once; scores stay empty until the slow first load lands"""
+    counters = PopularityCounters()
+    release = threading.Event()
+
+    def slow_flush():
+        release.wait(5)
+        counters.load([(7, bucket_start(NOW), 4)], now=NOW)
+
+    counters.ensure_started(slow_flush, interval=3600)
+    assert counters.ranking() == {} and not counters.ready.is_set()
+
+    release.set()
+    assert counters.ready.wait(5)
+    assert counters.ranking()[7] > 0
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test co-occurrence recommendations for CalmFlow
+Checks the vectorised build and that incremental updates match a rebuild.
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import recommendations
+from recommendations import CooccurrenceMatrix
+
+# playlist id -> sound ids
+PLAYLISTS = {
+    1: [10, 20, 30],
+    2: [10, 20],
+    3: [10, 40],
+    4: [20, 30],
+}
+
+
+def _pairs(playlists):
+    pairs = [(playlist_id, sound_id) for playlist_id, sounds in playlists.items() for sound_id in sounds]
+    return [p for p, _ in pairs], [s for _, s in pairs]
+
+
+def _dense(matrix, sound_ids):
+    rows = [matrix.index[sound_id] for sound_id in sound_ids]
+    return matrix.counts[np.ix_(rows, rows)]
+
+
+def test_build_counts_pairs():
+    """Off-diagonal cells count shared playlists, the diagonal playlist totals"""
+    matrix = CooccurrenceMatrix.from_pairs(*_pairs(PLAYLISTS))
+    assert _dense(matrix, [10, 20, 30, 40]).tolist() == [
+        [3, 2, 1, 1],
+        [2, 3, 2, 0],
+        [1, 2, 2, 0],
+        [1, 0, 0, 1],
+    ]
+
+
+def test_build_in_chunks(monkeypatch):
+    """Chunked incidence products give the same counts as one block"""
+    monkeypatch.setattr(recommendations, "BUILD_CHUNK_PLAYLISTS", 1)
+    chunked = CooccurrenceMatrix.from_pairs(*_pairs(PLAYLISTS))
+    monkeypatch.setattr(recommendations, "BUILD_CHUNK_PLAYLISTS", 4096)
+    whole = CooccurrenceMatrix.from_pairs(*_pairs(PLAYLISTS))
+    assert np.array_equal(chunked.counts, whole.counts)
+
+
+def test_incremental_updates_match_rebuild():
+    """add / remove / remove_playlist keep the matrix equal to a fresh build"""
+    matrix = CooccurrenceMatrix.from_pairs(*_pairs(PLAYLISTS))
+    matrix.top_k(10)
+
+    matrix.add(50, [10, 40])            # new sound joins playlist 3
+    matrix.remove(20, [10, 30])         # 20 leaves playlist 1
+    matrix.remove_playlist([20, 30])    # playlist 4 deleted
+
+    expected = {1: [10, 30], 2: [10, 20], 3: [10, 40, 50]}
+    rebuilt = CooccurrenceMatrix.from_pairs(*_pairs(expected))
+    ids = [10, 20, 30, 40, 50]
+    assert np.array_equal(_dense(matrix, ids), _dense(rebuilt, ids))
+    assert matrix.top_k(10) == rebuilt.top_k(10)
+
+
+def test_top_k_ranks_by_score():
+    """The strongest pairing comes first and the sound itself is excluded"""
+    matrix = CooccurrenceMatrix.from_pairs(*_pairs(PLAYLISTS))
+    top = matrix.top_k(30, k=2)
+    assert [sound_id for sound_id, _, _ in top] == [20, 10]
+    assert top[0][1] == 2
+    assert matrix.top_k(999) == []
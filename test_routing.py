@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test read-replica routing for CalmFlow
+Uses two SQLite files as primary and replica, seeded with different rows,
+so each response shows which database answered.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask, Response, jsonify, session, stream_with_context
+
+import routing
+from cache import MemoryCache
+from models import db, Group
+from routing import primary_only, replica_binds
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(f" sqlite:///{tmp_path / 'replica.db'} ,")
+    app.config['PRIMARY_PIN_SECONDS'] = 60
+    db.init_app(app)
+    backend = MemoryCache()
+    routing.init_app(app, db, backend)
+
+    with app.app_context():
+        for key, name in ((None, 'primary'), ('replica_1', 'replica')):
+            engine = db.engines[key]
+            db.metadata.create_all(engine, tables=[Group.__table__])
+            with engine.begin() as connection:
+                connection.execute(Group.__table__.insert(), {'name': name})
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        session['user_id'] = user_id
+        return 'ok'
+
+    @app.route('/where')
+    def where():
+        return jsonify(sorted(group.name for group in Group.query.all()))
+
+    @app.route('/write', methods=['POST'])
+    def write():
+        db.session.add(Group(name='written'))
+        db.session.commit()
+        return jsonify(sorted(group.name for group in Group.query.all()))
+
+    @app.route('/stream')
+    def stream():
+        def rows():
+            for group in Group.query.all():
+                yield group.name
+        return Response(stream_with_context(rows()))
+
+    @app.route('/admin')
+    @primary_only
+    def admin():
+        return jsonify(sorted(group.name for group in Group.query.all()))
+
+    with app.test_client() as test_client:
+        test_client.backend = backend
+        yield test_client
+    # init_app registered metadata for the replica bind on the shared db object
+    db.metadatas.pop('replica_1', None)
+
+
+def test_replica_binds_parses_url_list():
+    assert replica_binds('') == {}
+    assert replica_binds('sqlite:///a.db, sqlite:///b.db') == {
+        'replica_1': 'sqlite:///a.db',
+        'replica_2': 'sqlite:///b.db',
+    }
+
+
+def test_get_reads_from_replica(client):
+    assert client.get('/where').get_json() == ['replica']
+
+
+def test_streamed_responses_stay_on_replica(client):
+    assert client.get('/stream').get_data(as_text=True) == 'replica'
+
+
+def test_writes_go_to_primary_and_pin_the_writer(client):
+    client.get('/login/1')
+    assert client.get('/where').get_json() == ['replica']
+
+    # The write and the read after it in the same request both hit the primary
+    assert client.post('/write').get_json() == ['primary', 'written']
+    assert client.get('/where').get_json() == ['primary', 'written']
+
+
+def test_pin_expires_and_only_affects_the_writer(client):
+    client.get('/login/1')
+    client.post('/write')
+    routing.pin_to_primary(client.backend, 1, seconds=-1)
+    assert client.get('/where').get_json() == ['replica']
+
+    routing.pin_to_primary(client.backend, 2)
+    assert client.get('/where').get_json() == ['replica']
+
+
+def test_primary_only_views_skip_replicas(client):
+    assert client.get('/admin').get_json() == ['primary']
+
+
+def test_no_replicas_leaves_the_session_alone(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    db.init_app(app)
+    routing.init_app(app, db, MemoryCache())
+
+    @app.route('/public')
+    def public():
+        return 'same for everyone'
+
+    response = app.test_client().get('/public')
+    assert 'Cookie' not in response.headers.get('Vary', '')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the in-memory catalog search index for CalmFlow
+Checks text, group, category and premium filters and their combination.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from search import SearchIndex
+
+
+def _sound(sound_id, name, display_name, category, groups, is_premium=False):
+    return {
+        "id": sound_id,
+        "name": name,
+        "display_name": display_name,
+        "category": category,
+        "groups": groups,
+        "is_premium": is_premium,
+    }
+
+
+SOUNDS = [
+    _sound(1, "rain", "Rain", "Nature", [1, 2]),
+    _sound(2, "heavy_rain", "Heavy Rain", "Nature", [1], is_premium=True),
+    _sound(3, "fan", "Fan", "Objects", [2]),
+    _sound(4, "train", "Train", "Transport", [5]),
+    _sound(5, "brown_noise", "Brown Noise", "Noise", [3], is_premium=True),
+]
+
+
+def _ids(index, **filters):
+    sounds, total = index.search(**filters)
+    assert total == len(sounds)
+    return [sound["id"] for sound in sounds]
+
+
+def test_substring_search():
+    """Trigram matches are confirmed as real substrings"""
+    index = SearchIndex(SOUNDS)
+    assert _ids(index, query="rain") == [1, 2, 4]
+    assert _ids(index, query="heavy rain") == [2]
+    assert _ids(index, query="noise") == [5]
+    # 'ain' + 'rai' would match 'train' if only trigrams were checked for "rainx"
+    assert _ids(index, query="rainx") == []
+
+
+def test_short_prefix_search():
+    """One and two character queries match word prefixes"""
+    index = SearchIndex(SOUNDS)
+    assert _ids(index, query="f") == [3]
+    assert _ids(index, query="HE") == [2]
+
+
+def test_filters_intersect():
+    """Group, category and premium filters combine with text"""
+    index = SearchIndex(SOUNDS)
+    assert _ids(index, group=1) == [1, 2]
+    assert _ids(index, group=1, premium=False) == [1]
+    assert _ids(index, category="nature", query="heavy") == [2]
+    assert _ids(index, premium=True) == [2, 5]
+    assert _ids(index, group=99) == []
+
+
+def test_limit_keeps_total():
+    """Limited results still report the full match count"""
+    index = SearchIndex(SOUNDS)
+    sounds, total = index.search(query="rain", limit=1)
+    assert [sound["id"] for sound in sounds] == [1]
+    assert total == 3
+
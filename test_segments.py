@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test MP3 segmenting for CalmFlow
+Checks that segments are frame-aligned and cover the whole audio stream.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from segments import scan_frames, plan_segments, render_manifest, ensure_segments, MANIFEST_NAME
+
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+def _read_sound(name):
+    with open(os.path.join(STATIC_ROOT, "sounds", name), "rb") as f:
+        return f.read()
+
+
+def test_segments_are_frame_aligned():
+    """Every segment starts on a frame header and segments are contiguous"""
+    data = _read_sound("fan.mp3")
+    frames = scan_frames(data)
+    segments = plan_segments(frames)
+
+    frame_starts = {offset for offset, _, _ in frames}
+    for start, end, _ in segments:
+        assert start in frame_starts
+        assert data[start] == 0xFF
+    for (_, end, _), (start, _, _) in zip(segments, segments[1:]):
+        assert end == start
+
+    total = sum(duration for _, _, duration in frames)
+    assert abs(sum(duration for _, _, duration in segments) - total) < 1e-6
+
+
+def test_first_segment_is_short():
+    """The first segment is much smaller than the whole file"""
+    data = _read_sound("Forest.mp3")
+    segments = plan_segments(scan_frames(data))
+    start, end, duration = segments[0]
+    assert duration < 1.5
+    assert end - start < len(data) // 20
+
+
+def test_manifest_lists_every_segment():
+    """The HLS manifest has one entry per segment and is terminated"""
+    manifest = render_manifest([1.0, 4.0, 2.5])
+    assert manifest.startswith("#EXTM3U")
+    assert "#EXT-X-TARGETDURATION:4" in manifest
+    assert [line for line in manifest.splitlines() if line.endswith(".mp3")] == ["0.mp3", "1.mp3", "2.mp3"]
+    assert manifest.rstrip().endswith("#EXT-X-ENDLIST")
+
+
+def test_ensure_segments_writes_cache(tmp_path):
+    """Segments are written once and reassemble to the audio stream"""
+    sounds_dir = tmp_path / "sounds"
+    sounds_dir.mkdir()
+    data = _read_sound("rain.mp3")
+    (sounds_dir / "rain.mp3").write_bytes(data)
+
+    directory = ensure_segments(str(tmp_path), "rain.mp3")
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    mtime = os.path.getmtime(manifest_path)
+    assert ensure_segments(str(tmp_path), "rain.mp3") == directory
+    assert os.path.getmtime(manifest_path) == mtime
+
+    segments = plan_segments(scan_frames(data))
+    joined = b"".join(
+        open(os.path.join(directory, f"{i}.mp3"), "rb").read() for i in range(len(segments))
+    )
+    assert joined == data[segments[0][0]:segments[-1][1]]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test static/sounds scanning, sync planning and the directory watcher for CalmFlow
+Checks derived and sidecar fields, that curated rows are left alone, and
+that both inotify and polling modes notice a new file.
+"""
+
+import sys
+import os
+import json
+import threading
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from soundsync import DEFAULT_ICON, DirectoryWatcher, plan_changes, scan_sound_files
+
+
+@pytest.fixture
+def static_root(tmp_path):
+    (tmp_path / 'sounds' / 'loops').mkdir(parents=True)
+    (tmp_path / 'icons').mkdir()
+    (tmp_path / 'sounds' / 'leaf.mp3').write_bytes(b'ID3')
+    (tmp_path / 'sounds' / 'loops' / 'leaf.loop.mp3').write_bytes(b'ID3')
+    (tmp_path / 'icons' / 'leaf.png').write_bytes(b'PNG')
+    return tmp_path
+
+
+def _row(name, icon, **fields):
+    row = {'name': name, 'display_name': name.title(), 'icon': icon, 'category': 'nature',
+           'is_premium': False, 'default_volume': 0.5, 'groups': ['Nature']}
+    row.update(fields)
+    return row
+
+
+def test_scan_derives_fields_and_reads_sidecars(static_root):
+    (static_root / 'sounds' / 'Ocean_Waves.mp3').write_bytes(b'ID3')
+    (static_root / 'sounds' / 'thunder_storm.mp3').write_bytes(b'ID3')
+    (static_root / 'sounds' / 'thunder_storm.json').write_text(json.dumps(
+        {'display_name': 'Storm', 'is_premium': True, 'groups': ['Sleep', 'Nature', 'Sleep']}))
+    (static_root / 'sounds' / 'broken.mp3').write_bytes(b'ID3')
+    (static_root / 'sounds' / 'broken.json').write_text('{"is_premium": "yes"}')
+
+    files, icons, errors = scan_sound_files(str(static_root))
+
+    assert sorted(files) == ['Ocean_Waves.mp3', 'leaf.mp3', 'thunder_storm.mp3']
+    assert icons == {'leaf.png'}
+    assert errors == ['broken.json: is_premium must be true or false']
+    ocean = files['Ocean_Waves.mp3']
+    assert ocean['explicit'] == set()
+    assert ocean['fields']['name'] == 'ocean_waves'
+    assert ocean['fields']['display_name'] == 'Ocean Waves'
+    assert ocean['fields']['icon'] == DEFAULT_ICON
+    assert files['leaf.mp3']['fields']['icon'] == 'static/icons/leaf.png'
+    storm = files['thunder_storm.mp3']
+    assert storm['explicit'] == {'display_name', 'is_premium', 'groups'}
+    assert storm['fields']['groups'] == ['Nature', 'Sleep']
+
+
+def test_plan_adds_new_files_and_keeps_curated_rows(static_root):
+    (static_root / 'sounds' / 'rain.mp3').write_bytes(b'ID3')
+    files, icons, _ = scan_sound_files(str(static_root))
+    # Seeded row whose name differs from what the file name would give
+    rows = {'leaf.mp3': _row('leaves', 'static/icons/leaf.png')}
+
+    plan = plan_changes(files, rows, icons)
+
+    assert [fields['name'] for fields in plan['add']] == ['rain']
+    assert plan['update'] == [] and plan['missing'] == [] and plan['skipped'] == []
+
+
+def test_plan_updates_only_sidecar_fields_and_missing_icons(static_root):
+    (static_root / 'sounds' / 'leaf.json').write_text(json.dumps({'is_premium': True, 'groups': ['Nature']}))
+    files, icons, _ = scan_sound_files(str(static_root))
+    rows = {
+        'leaf.mp3': _row('leaves', 'static/icons/gone.png'),
+        'old.mp3': _row('old', 'static/icons/old.png'),
+    }
+
+    plan = plan_changes(files, rows, icons)
+
+    assert plan['update'] == [('leaf.mp3', {'is_premium': True, 'icon': 'static/icons/leaf.png'})]
+    assert plan['missing'] == ['old.mp3']
+
+
+def test_plan_skips_name_collisions(static_root):
+    (static_root / 'sounds' / 'Leaves.mp3').write_bytes(b'ID3')
+    files, icons, _ = scan_sound_files(str(static_root))
+    rows = {'leaf.mp3': _row('leaves', 'static/icons/leaf.png')}
+
+    plan = plan_changes(files, rows, icons)
+
+    assert plan['add'] == []
+    assert plan['skipped'] == ["Leaves.mp3: name 'leaves' already used by leaf.mp3"]
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_watcher_reports_new_files(static_root, use_inotify):
+    changed = threading.Event()
+    watcher = DirectoryWatcher([str(static_root / 'sounds'), str(static_root / 'icons')], changed.set,
+                               debounce_seconds=0.1, poll_seconds=0.05, use_inotify=use_inotify)
+    if use_inotify and watcher.mode != 'inotify':
+        watcher.close()
+        pytest.skip('inotify not available')
+    stop = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stop,), daemon=True)
+    thread.start()
+    try:
+        (static_root / 'icons' / 'rain.png').write_bytes(b'PNG')
+        assert changed.wait(5)
+    finally:
+        stop.set()
+        thread.join(5)
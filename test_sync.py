@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test cross-device mix sync for CalmFlow
+Checks delta publishing, bounded subscriber queues and Last-Event-ID replay.
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sync import MixHub, QUEUE_SIZE, SyncError, format_event, validate_ops
+
+KNOWN_SOUNDS = {1: {}, 2: {}}
+
+
+def test_ops_publish_deltas_and_skip_no_ops():
+    """Only ops that change the mix produce events"""
+    hub = MixHub()
+    subscriber = hub.subscribe(7)
+    ops = validate_ops([{"op": "play", "sound_id": 1, "volume": 0.4}], KNOWN_SOUNDS)
+    assert len(hub.apply(7, ops, origin="laptop")) == 1
+    assert hub.apply(7, ops) == []
+
+    events = hub.drain(7, subscriber)
+    assert [event["type"] for event in events] == ["mix.play"]
+    assert events[0]["data"] == {"sound_id": 1, "volume": 0.4, "origin": "laptop"}
+    assert hub.get_mix(7)["sounds"] == {1: {"volume": 0.4, "playing": True}}
+    assert format_event(events[0]).startswith("id: 1\nevent: mix.play\ndata: ")
+
+
+def test_users_are_isolated():
+    """Events only reach the user's own connections"""
+    hub = MixHub()
+    other = hub.subscribe(8)
+    hub.publish(7, "playlist.deleted", {"playlist_id": 3})
+    assert hub.drain(8, other) == []
+    assert not other.ready.is_set()
+
+
+def test_slow_subscriber_gets_resync():
+    """A full queue is replaced by a single resync event"""
+    hub = MixHub()
+    subscriber = hub.subscribe(7)
+    for volume in range(QUEUE_SIZE + 5):
+        hub.publish(7, "mix.volume", {"sound_id": 1, "volume": volume})
+    assert [event["type"] for event in hub.drain(7, subscriber)] == ["resync"]
+    assert len(subscriber.queue) == 0
+
+
+def test_reconnect_replays_missed_events():
+    """Last-Event-ID replays from history, or asks for a resync if too old"""
+    hub = MixHub()
+    for volume in range(3):
+        hub.publish(7, "mix.volume", {"sound_id": 1, "volume": volume})
+    replayed = hub.subscribe(7, last_event_id=1)
+    assert [event["id"] for event in hub.drain(7, replayed)] == [2, 3]
+
+    hub._channel(7).history.clear()
+    stale = hub.subscribe(7, last_event_id=1)
+    assert [event["type"] for event in hub.drain(7, stale)] == ["resync"]
+
+
+def test_idle_channels_are_dropped():
+    """Channels without connections go once empty or once their history ages out"""
+    hub = MixHub()
+    subscriber = hub.subscribe(7)
+    hub.unsubscribe(7, subscriber)
+    assert 7 not in hub._channels
+
+    hub = MixHub(history_seconds=0)
+    hub.publish(7, "playlist.deleted", {"playlist_id": 3})
+    hub.publish(8, "playlist.deleted", {"playlist_id": 4})
+    assert set(hub._channels) == {8}
+
+    # Ids carry on past the dropped channel, which a reconnect cannot replay
+    hub.publish(7, "playlist.deleted", {"playlist_id": 5})
+    assert hub._channel(7).seq > 1
+    late = hub.subscribe(8, last_event_id=5)
+    assert [event["type"] for event in hub.drain(8, late)] == ["resync"]
+
+
+def test_validation():
+    """Unknown sounds, ops and volumes are rejected"""
+    for ops in ([], [{"op": "stop", "sound_id": 1}], [{"op": "play", "sound_id": 9}],
+                [{"op": "volume", "sound_id": 1}], [{"op": "volume", "sound_id": 1, "volume": 2}]):
+        with pytest.raises(SyncError):
+            validate_ops(ops, KNOWN_SOUNDS)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test buffered telemetry ingestion for CalmFlow
+Checks event validation, size-triggered flushes and drop accounting.
+"""
+
+import sys
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telemetry import EventBuffer, TelemetryError, validate_event
+
+KNOWN_SOUNDS = {1: {}, 2: {}}
+
+
+def _row(sound_id=1):
+    return validate_event({"type": "play", "sound_id": sound_id}, KNOWN_SOUNDS)
+
+
+def test_validation():
+    """Unknown sounds, bad types and out-of-range volumes are rejected"""
+    row = validate_event({"type": "volume", "sound_id": 2, "value": 0.3}, KNOWN_SOUNDS, user_id=7)
+    assert row["sound_id"] == 2 and row["value"] == 0.3 and row["user_id"] == 7
+    for event in (
+        {"type": "play", "sound_id": 99},
+        {"type": "skip", "sound_id": 1},
+        {"type": "volume", "sound_id": 1, "value": 3},
+        {"type": "stop", "sound_id": 1, "value": -5},
+        {"type": "stop", "sound_id": 1, "value": float("nan")},
+        {"type": "stop", "sound_id": 1, "value": float("inf")},
+        "play",
+    ):
+        with pytest.raises(TelemetryError):
+            validate_event(event, KNOWN_SOUNDS)
+
+
+def test_unusable_timestamps_fall_back_to_server_time():
+    for ts in (float("nan"), float("inf"), 10 ** 400, "yesterday"):
+        row = validate_event({"type": "play", "sound_id": 1, "ts": ts}, KNOWN_SOUNDS, now=1_700_000_000)
+        assert row["occurred_at"] == datetime(2023, 11, 14, 22, 13, 20)
+
+
+def test_flush_on_size():
+    """The flusher writes as soon as flush_size events are waiting"""
+    batches = []
+    buffer = EventBuffer(batches.append, capacity=100, flush_size=5, flush_seconds=60)
+    assert buffer.offer([_row() for _ in range(5)])
+    deadline = time.monotonic() + 2
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    buffer.stop()
+    assert [len(batch) for batch in batches] == [5]
+    assert buffer.snapshot()["written"] == 5
+
+
+def test_full_buffer_drops_whole_batch():
+    """A batch that does not fit is refused and counted as dropped"""
+    buffer = EventBuffer(lambda rows: None, capacity=4, flush_size=100, flush_seconds=60)
+    assert buffer.offer([_row(), _row()])
+    assert not buffer.offer([_row(), _row(), _row()])
+    stats = buffer.snapshot()
+    assert stats["accepted"] == 2 and stats["dropped"] == 3 and stats["buffered"] == 2
+    buffer.stop()
+
+
+def test_writer_failure_is_counted():
+    """Rows lost to a failed write show up in the failed counter"""
+    def failing(rows):
+        raise RuntimeError("database unavailable")
+    buffer = EventBuffer(failing, capacity=10, flush_size=100, flush_seconds=60)
+    buffer.offer([_row()])
+    assert buffer.flush() == 0
+    assert buffer.snapshot()["failed"] == 1
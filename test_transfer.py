@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test NDJSON export and resumable import of users and playlists for CalmFlow
+Exports from one SQLite database and imports into another whose sound ids
+differ, including an import interrupted part way and resumed.
+"""
+
+import sys
+import os
+import json
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+
+import transfer
+from models import db, Playlist, Sound, User
+
+
+def _app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _add_sounds(names):
+    for name in names:
+        db.session.add(Sound(name=name, display_name=name.title(), icon='static/icons/x.png', file_path=f'{name}.mp3'))
+    db.session.commit()
+
+
+@pytest.fixture
+def export_file(tmp_path):
+    source = _app(tmp_path / 'source.db')
+    with source.app_context():
+        _add_sounds(['rain', 'fire', 'wind'])
+        sounds = Sound.query.order_by(Sound.id).all()
+        for number in range(7):
+            user = User(username=f'user{number}', email=f'user{number}@example.com', is_premium=number % 2 == 0)
+            user.set_password('secret')
+            db.session.add(user)
+            db.session.flush()
+            playlist = Playlist(name=f'Mix {number}', user_id=user.id, playlist_icon='static/icons/add.png')
+            playlist.sounds = sounds[:number % 4]
+            db.session.add(playlist)
+        db.session.commit()
+
+        path = tmp_path / 'export.ndjson'
+        with open(path, 'wb') as out:
+            counts = transfer.export_ndjson(db.session, out, chunk_size=3)
+    assert counts == {'users': 7, 'playlists': 7, 'playlist_sound': 9}
+    return path
+
+
+@pytest.fixture
+def target(tmp_path):
+    app = _app(tmp_path / 'target.db')
+    with app.app_context():
+        # Same sounds, different ids
+        _add_sounds(['wind', 'fire', 'rain'])
+        yield app
+
+
+def _memberships():
+    return sorted((playlist.name, sorted(sound.name for sound in playlist.sounds))
+                  for playlist in Playlist.query.all())
+
+
+def test_export_is_header_then_rows_in_foreign_key_order(export_file):
+    lines = [json.loads(line) for line in export_file.read_bytes().splitlines()]
+    assert lines[0]['format'] == transfer.FORMAT
+    tables = [line['table'] for line in lines[1:]]
+    assert tables == ['users'] * 7 + ['playlists'] * 7 + ['playlist_sound'] * 9
+    assert {'sound_name', 'playlist_id', 'table'} == set(lines[-1])
+
+
+def test_import_maps_sounds_by_name_and_removes_checkpoint(export_file, target, tmp_path):
+    checkpoint = str(tmp_path / 'import.checkpoint')
+    counts = transfer.import_ndjson(db.session, str(export_file), checkpoint, chunk_size=2)
+
+    assert counts['inserted'] == {'users': 7, 'playlists': 7, 'playlist_sound': 9}
+    assert not os.path.exists(checkpoint)
+    user = User.query.filter_by(email='user3@example.com').first()
+    assert user.check_password('secret') and user.created_at is not None
+    assert ('Mix 3', ['fire', 'rain', 'wind']) in _memberships()
+
+
+def test_interrupted_import_resumes_without_duplicates(export_file, target, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / 'import.checkpoint')
+    original = transfer.write_checkpoint
+    written = []
+
+    def crash_after_three(path, state):
+        if 'in_flight_until' not in state:
+            if len(written) == 3:
+                # Chunk committed but its end never recorded: replayed on resume
+                raise KeyboardInterrupt
+            written.append(state)
+        original(path, state)
+
+    monkeypatch.setattr(transfer, 'write_checkpoint', crash_after_three)
+    with pytest.raises(KeyboardInterrupt):
+        transfer.import_ndjson(db.session, str(export_file), checkpoint, chunk_size=2)
+    assert transfer.read_checkpoint(checkpoint)['counts']['inserted']['users'] == 6
+
+    monkeypatch.setattr(transfer, 'write_checkpoint', original)
+    counts = transfer.import_ndjson(db.session, str(export_file), checkpoint, chunk_size=2)
+
+    # The replayed chunk's users were already in and count as skipped
+    assert counts['inserted'] == {'users': 6, 'playlists': 7, 'playlist_sound': 9}
+    assert counts['skipped']['users'] == 1
+    assert User.query.count() == 7 and Playlist.query.count() == 7
+    assert len(_memberships()) == 7
+
+
+def test_existing_ids_outside_a_replay_are_refused(export_file, target, tmp_path):
+    # A target that already has its own first user
+    alice = User(username='alice', email='alice@example.com')
+    alice.set_password('secret')
+    db.session.add(alice)
+    db.session.commit()
+
+    checkpoint = str(tmp_path / 'import.checkpoint')
+    with pytest.raises(transfer.TransferError, match='users 1 already exist'):
+        transfer.import_ndjson(db.session, str(export_file), checkpoint, chunk_size=2)
+    assert [user.username for user in User.query.all()] == ['alice']
+    assert Playlist.query.count() == 0
+
+
+def test_rejects_foreign_files(tmp_path, target):
+    path = tmp_path / 'other.ndjson'
+    path.write_text('{"hello": "world"}\n')
+    with pytest.raises(transfer.TransferError):
+        transfer.import_ndjson(db.session, str(path), str(tmp_path / 'c'))
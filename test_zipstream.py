@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test streaming ZIP generation for CalmFlow
+Checks that archives are valid, sized up front and streamed in small chunks.
+"""
+
+import sys
+import os
+import io
+import zipfile
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zipstream import ZipEntry, archive_size, stream_zip, CHUNK_SIZE
+
+SOUNDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "sounds")
+
+
+def _entries():
+    return [
+        ZipEntry("manifest.json", data=b'{"name": "Test"}'),
+        ZipEntry("sounds/fan.mp3", path=os.path.join(SOUNDS_DIR, "fan.mp3")),
+        ZipEntry("sounds/Forest.mp3", path=os.path.join(SOUNDS_DIR, "Forest.mp3")),
+    ]
+
+
+def test_archive_is_valid_zip():
+    """The streamed bytes open with zipfile and match the source files"""
+    body = b"".join(stream_zip(_entries()))
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["manifest.json", "sounds/fan.mp3", "sounds/Forest.mp3"]
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    with open(os.path.join(SOUNDS_DIR, "fan.mp3"), "rb") as f:
+        assert archive.read("sounds/fan.mp3") == f.read()
+
+
+def test_archive_size_is_exact():
+    """Content-Length can be announced before streaming"""
+    entries = _entries()
+    assert archive_size(entries) == len(b"".join(stream_zip(entries)))
+
+
+def test_chunks_stay_small():
+    """No yielded chunk holds a whole sound file"""
+    largest = max(len(chunk) for chunk in stream_zip(_entries()))
+    assert largest <= CHUNK_SIZE
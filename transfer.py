@@ -0,0 +1,250 @@
+# transfer.py
+"""Streaming NDJSON export and import of users and playlists.
+
+The export is one JSON object per line: a header line, then every row of
+users, playlists and playlist_sound in that order (so foreign keys are
+always satisfied on import), each tagged with its table. Rows are read
+with yield_per, which streams from a server-side cursor, and written as
+they arrive, so memory use does not grow with the number of users.
+Playlist memberships carry the sound's unique name rather than its id,
+because sound ids differ between databases that were seeded separately.
+
+The import inserts rows in chunks of CHUNK_SIZE with executemany and
+commits each chunk. Before each commit it records the chunk's byte range
+in a checkpoint file as in flight, and after it the offset the chunk ended
+at, so a re-run with the same checkpoint continues from there. Only rows
+inside the in-flight range may already exist, and those are skipped:
+anywhere else an existing primary key belongs to someone else, and the
+import stops with a TransferError rather than attach exported playlists to
+the wrong account.
+
+Primary keys are kept as exported. SQL Server, MySQL and SQLite move their
+identity counters past explicit ids by themselves; on PostgreSQL the
+sequences are set after every chunk. Other backends are refused.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, select, text
+
+from models import Playlist, Sound, User, playlist_sound_association
+
+FORMAT = 'calmflow-export'
+FORMAT_VERSION = 1
+CHUNK_SIZE = 1000
+
+# Backends whose identity columns advance past explicitly inserted ids
+ADVANCES_IDENTITY = {'mssql', 'mysql', 'mariadb', 'sqlite'}
+
+TABLES = {
+    'users': User.__table__,
+    'playlists': Playlist.__table__,
+    'playlist_sound': playlist_sound_association,
+}
+
+
+class TransferError(ValueError):
+    """An export file that cannot be imported"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Cannot export {type(value).__name__}')
+
+
+def _dump(out, record):
+    out.write(json.dumps(record, default=_encode, separators=(',', ':')).encode('utf-8'))
+    out.write(b'\n')
+
+
+def export_ndjson(session, out, chunk_size=CHUNK_SIZE):
+    """Write every user, playlist and playlist sound to a binary stream; returns counts"""
+    _dump(out, {'format': FORMAT, 'version': FORMAT_VERSION,
+                'exported_at': datetime.now(timezone.utc).isoformat(timespec='seconds')})
+    counts = {}
+    for table_name in ('users', 'playlists'):
+        table = TABLES[table_name]
+        query = select(table).order_by(table.c.id).execution_options(yield_per=chunk_size)
+        counts[table_name] = 0
+        for row in session.execute(query):
+            _dump(out, dict(row._mapping, table=table_name))
+            counts[table_name] += 1
+
+    link = playlist_sound_association
+    query = (select(link.c.playlist_id, Sound.name.label('sound_name'))
+             .join(Sound, Sound.id == link.c.sound_id)
+             .order_by(link.c.playlist_id, link.c.sound_id)
+             .execution_options(yield_per=chunk_size))
+    counts['playlist_sound'] = 0
+    for row in session.execute(query):
+        _dump(out, dict(row._mapping, table='playlist_sound'))
+        counts['playlist_sound'] += 1
+    return counts
+
+
+# --- IMPORT ---
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, checkpoint):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+class _Importer:
+
+    def __init__(self, session):
+        self.session = session
+        self.sound_ids = dict(session.execute(select(Sound.name, Sound.id)).all())
+        dialect = session.get_bind().dialect.name
+        if dialect not in ADVANCES_IDENTITY and dialect != 'postgresql':
+            raise TransferError(f'Importing into {dialect} is not supported: its id counters would not '
+                                f'advance past the imported ids')
+        self.identity_insert = dialect == 'mssql'
+        self.reset_sequences = dialect == 'postgresql'
+
+    def _convert(self, table, record):
+        row = {}
+        for column in table.columns:
+            value = record.get(column.name)
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            row[column.name] = value
+        return row
+
+    def _conflict(self, table_name, keys):
+        shown = ', '.join(str(key) for key in sorted(keys)[:5])
+        return TransferError(f'{table_name} {shown} already exist in the target database; '
+                             f'import into an empty database')
+
+    def prepare(self, table_name, records, replaying=False):
+        """Rows to insert for a chunk plus the number skipped.
+
+        Rows that already exist are skipped only when replaying the chunk
+        that was in flight when an earlier run stopped; otherwise they raise
+        TransferError.
+        """
+        table = TABLES[table_name]
+        if table_name == 'playlist_sound':
+            rows = [{'playlist_id': record['playlist_id'], 'sound_id': self.sound_ids.get(record['sound_name'])}
+                    for record in records]
+            unknown = sum(1 for row in rows if row['sound_id'] is None)
+            rows = [row for row in rows if row['sound_id'] is not None]
+            keys = [(row['playlist_id'], row['sound_id']) for row in rows]
+            # By playlist rather than by (playlist, sound) pair: SQL Server has no row-value IN
+            playlist_ids = {row['playlist_id'] for row in rows}
+            existing = set(self.session.execute(
+                select(table.c.playlist_id, table.c.sound_id).where(table.c.playlist_id.in_(playlist_ids))
+            ).all()) & set(keys) if rows else set()
+            if existing and not replaying:
+                raise self._conflict(table_name, existing)
+            fresh = [row for row, key in zip(rows, keys) if key not in existing]
+            return fresh, unknown + len(rows) - len(fresh)
+
+        rows = [self._convert(table, record) for record in records]
+        existing = set(self.session.scalars(
+            select(table.c.id).where(table.c.id.in_([row['id'] for row in rows]))
+        ).all())
+        if existing and not replaying:
+            raise self._conflict(table_name, existing)
+        fresh = [row for row in rows if row['id'] not in existing]
+        return fresh, len(rows) - len(fresh)
+
+    def insert(self, table_name, rows):
+        if not rows:
+            return
+        table = TABLES[table_name]
+        # SQL Server only accepts explicit values for IDENTITY columns when asked to
+        explicit_ids = self.identity_insert and table_name != 'playlist_sound'
+        if explicit_ids:
+            self.session.execute(text(f'SET IDENTITY_INSERT {table.name} ON'))
+        self.session.execute(table.insert(), rows)
+        if explicit_ids:
+            self.session.execute(text(f'SET IDENTITY_INSERT {table.name} OFF'))
+        if self.reset_sequences and table_name != 'playlist_sound':
+            self.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), MAX(id)) FROM {table.name}"))
+
+
+def import_ndjson(session, path, checkpoint_path, chunk_size=CHUNK_SIZE, progress=None):
+    """Import an export file, resuming from checkpoint_path; returns counts.
+
+    progress(counts) is called after every committed chunk.
+    """
+    importer = _Importer(session)
+    size = os.path.getsize(path)
+    checkpoint = read_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint.get('size') != size:
+        raise TransferError(f'{checkpoint_path} belongs to a different export file; delete it to start over')
+
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline() or b'null')
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise TransferError(f'{path} is not a CalmFlow export')
+        if header.get('version') != FORMAT_VERSION:
+            raise TransferError(f"Unsupported export version {header.get('version')}")
+
+        counts = {'inserted': {name: 0 for name in TABLES}, 'skipped': {name: 0 for name in TABLES}}
+        # Rows before this offset may have been committed by a run that stopped before recording them
+        replay_until = f.tell()
+        if checkpoint is not None:
+            counts = checkpoint['counts']
+            f.seek(checkpoint['offset'])
+            replay_until = checkpoint.get('in_flight_until', checkpoint['offset'])
+
+        pending_table, pending = None, []
+        offset = f.tell()
+        start_offset = offset
+
+        def flush(end_offset):
+            try:
+                rows, skipped = importer.prepare(pending_table, pending, replaying=start_offset < replay_until)
+            except TransferError:
+                session.rollback()
+                raise
+            write_checkpoint(checkpoint_path, {'size': size, 'offset': start_offset,
+                                               'in_flight_until': end_offset, 'counts': counts})
+            importer.insert(pending_table, rows)
+            session.commit()
+            counts['inserted'][pending_table] += len(rows)
+            counts['skipped'][pending_table] += skipped
+            write_checkpoint(checkpoint_path, {'size': size, 'offset': end_offset, 'counts': counts})
+            if progress is not None:
+                progress(counts)
+
+        for line in f:
+            if not line.strip():
+                offset += len(line)
+                continue
+            record = json.loads(line)
+            table_name = record.pop('table', None)
+            if table_name not in TABLES:
+                raise TransferError(f'Unknown table {table_name!r} at byte {offset}')
+            # Chunks never straddle the end of the replayed range
+            if pending and (table_name != pending_table or offset == replay_until):
+                flush(offset)
+                pending = []
+                start_offset = offset
+            pending_table = table_name
+            pending.append(record)
+            offset += len(line)
+            if len(pending) >= chunk_size:
+                flush(offset)
+                pending = []
+                start_offset = offset
+        if pending:
+            flush(offset)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return counts
@@ -0,0 +1,128 @@
+# zipstream.py
+"""Stream ZIP archives of files on disk without temp files or buffering.
+
+Entries are stored uncompressed (audio is already compressed), so each
+file's size is known up front. CRC-32s are computed in a streaming pass and
+cached by (path, size, mtime), which lets every local header carry real
+values and the total archive length be announced before the first byte.
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+ZIP_LIMIT = 0xFFFFFFFF
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+
+_VERSION = 20
+_FLAG_UTF8 = 0x0800
+_METHOD_STORED = 0
+
+_crc_cache = {}
+_crc_lock = threading.Lock()
+
+
+class ZipEntry:
+    """One archive member, backed either by a file path or by small bytes."""
+
+    def __init__(self, name, path=None, data=None):
+        self.name = name
+        self.path = path
+        self.data = data
+        if path is not None:
+            stat = os.stat(path)
+            self.size = stat.st_size
+            self.mtime = stat.st_mtime
+        else:
+            self.size = len(data)
+            self.mtime = time.time()
+        if self.size > ZIP_LIMIT:
+            raise ValueError(f'{name} is too large for a non-ZIP64 archive')
+
+    @property
+    def encoded_name(self):
+        return self.name.encode('utf-8')
+
+    def crc32(self):
+        if self.data is not None:
+            return zlib.crc32(self.data)
+
+        key = (self.path, self.size, self.mtime)
+        with _crc_lock:
+            cached = _crc_cache.get(key)
+        if cached is not None:
+            return cached
+
+        crc = 0
+        for chunk in self.chunks():
+            crc = zlib.crc32(chunk, crc)
+        with _crc_lock:
+            _crc_cache[key] = crc
+        return crc
+
+    def chunks(self):
+        if self.data is not None:
+            yield self.data
+            return
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                yield chunk
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def archive_size(entries):
+    """Exact byte length of the archive stream_zip() will produce."""
+    total = _END_RECORD.size
+    for entry in entries:
+        name_length = len(entry.encoded_name)
+        total += _LOCAL_HEADER.size + name_length + entry.size
+        total += _CENTRAL_HEADER.size + name_length
+    if total > ZIP_LIMIT:
+        raise ValueError('Archive is too large for a non-ZIP64 archive')
+    return total
+
+
+def stream_zip(entries):
+    """Yield the bytes of a stored-entry ZIP archive containing entries."""
+    offset = 0
+    central = []
+
+    for entry in entries:
+        name = entry.encoded_name
+        crc = entry.crc32()
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+
+        header = _LOCAL_HEADER.pack(
+            0x04034B50, _VERSION, _FLAG_UTF8, _METHOD_STORED, dos_time, dos_date,
+            crc, entry.size, entry.size, len(name), 0,
+        ) + name
+        yield header
+
+        written = 0
+        for chunk in entry.chunks():
+            written += len(chunk)
+            yield chunk
+        if written != entry.size:
+            raise IOError(f'{entry.name} changed size while being archived')
+
+        central.append(_CENTRAL_HEADER.pack(
+            0x02014B50, _VERSION, _VERSION, _FLAG_UTF8, _METHOD_STORED, dos_time, dos_date,
+            crc, entry.size, entry.size, len(name), 0, 0, 0, 0, 0, offset,
+        ) + name)
+        offset += len(header) + entry.size
+
+    directory = b''.join(central)
+    yield directory
+    yield _END_RECORD.pack(0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0)